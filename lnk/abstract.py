@@ -6,17 +6,16 @@
 from __future__ import unicode_literals
 
 import ecstasy
-import requests
+import requests.utils
 import threading
 import sys
 
-try:
-	from Queue import Queue
-except ImportError:
-	from queue import Queue
-
 import lnk.config
 import lnk.errors
+import lnk.executor
+import lnk.limit
+import lnk.retry
+import lnk.session
 
 class AbstractCommand(object):
 	"""
@@ -24,16 +23,25 @@ class AbstractCommand(object):
 
 	This class' constructor handles the bulk of configuration every
 	command needs, such as fetching the service's API url, available
-	endpoints and default settings. It also gives each command a queue
-	and lock for threading, as well as a few other things most, if not
-	all, commands need. The class defines an interface all commands must
-	have, with some of AbstractCommand's methods, such as fetch(), not
-	being implemented and throwing a NotImplementedError if called directly.
+	endpoints and default settings. It also gives each command an executor
+	(a bounded pool of worker threads) and a lock for threading, as well
+	as a few other things most, if not all, commands need. The class
+	defines an interface all commands must have, with some of
+	AbstractCommand's methods, such as fetch(), not being implemented
+	and throwing a NotImplementedError if called directly.
 	An AbstractCommand must have knowledge about the service that the class
 	subclassing it uses (e.g. bit.ly or tinyurl), as well as about the
-	name of the command (e.g. 'link' or 'stats').
+	name of the command (e.g. 'link' or 'stats'). HTTP requests are made over
+	the keep-alive connections of the class' 'session' attribute, which each
+	service's base command-class overrides so that all commands of a service
+	(and all their threads) share one connection pool.
 
 	Attributes:
+		session (lnk.session.Session): Class-attribute holding the pooled HTTP
+									   session used for all requests.
+		transient (tuple): Class-attribute holding the exception classes for
+						   which requests are retried.
+		service (str): The name of the service (e.g. 'bitly').
 		url (str): The URL of the API.
 		api (str): The URL of the API, joined with its version. Endpoints can
 				   be joined to this string to form a full URL (without
@@ -44,22 +52,62 @@ class AbstractCommand(object):
 		sets (dict|None): If available, the data sets/categories that the
 						  command allows, else None if the command has no
 						  such thing (e.g. the 'link' command).
-		queue (Queue.Queue): A queue for thread-safe data-passing.
+		connections (dict): The connection-pool settings of the service
+							(empty if it has none, in which case the
+							defaults of lnk.session.Session apply).
+		limits (dict): The rate-limit settings of the service (empty if it
+					   has none or they are not enabled, in which case
+					   requests are not limited).
+		limiter (lnk.limit.Limiter|None): The limiter all requests of the
+										  command pass through, if any (set
+										  up by the service's base command-
+										  class per account, see limit()).
+		retry (lnk.retry.Policy): The policy for retrying requests that
+								  failed for transient reasons, shared by
+								  all commands of the service. Its settings
+								  are the 'retry' settings of the service.
+		replayable (bool): Class-attribute holding whether the command can
+						   run on the asyncio backend.
+		engine (lnk.aio.Engine|None): The event loop on which the command
+									  makes its requests, if the 'backend'
+									  setting of lnk is 'asyncio' (None with
+									  the default 'threads' backend, or if
+									  a proxy is configured for the API,
+									  which lnk.aio does not support).
+		executor (lnk.executor.Executor): The pool of worker threads on which
+										  the command runs its requests. Its
+										  size is the 'workers' setting of lnk.
+										  A lnk.aio.Executor (with the same
+										  interface) on the asyncio backend.
 		lock (threading.Lock): A lock object for thread-safe actions.
-		error (Exception): The last exception thrown by a thread started
-						   with the new_thread method. This is useful to
-						   see if a thread threw an exception which would
-						   otherwise not be properly handled (because you
-						   can't catch exceptions from a child-thread in the
-						   main thread).
+		flights (dict): The requests currently in flight (see coalesce()),
+						as lnk.executor.Tasks by the keys of the requests.
 		parameters (dict): Dictionary for the parameters of an HTTP request.
+		failures (lnk.failures.Failures|None): The failures of the items of
+											   the command, if it runs in
+											   partial mode (see tolerate()).
 		list_item (str): A string, formatted with ecstasy, that should be used
 						 to format a list-item (e.g. for the stats command).
 						 It already includes the necessary markup such that
 						 str.format() can be used on it directly with the
 						 string to be formatted.
 	"""
+
+	session = lnk.session.Session()
+
+	transient = lnk.retry.TRANSIENT
+
+	# Whether all requests are made through perform(), such that the
+	# command can run on the asyncio backend (see lnk.aio). Functions run
+	# on its executor are then called again until all their requests are
+	# answered, so they must not have side-effects before their last one
+	replayable = True
+
+	# Returned for items that failed in partial mode (see tolerate())
+	failed = object()
+
 	def __init__(self, service, command):
+		self.service = service
 		with lnk.config.Manager(service) as manager:
 			self.url = manager['url']
 			self.api = '{0}/v{1}'.format(self.url, manager['version'])
@@ -67,10 +115,31 @@ class AbstractCommand(object):
 			self.endpoints = self.config['endpoints']
 			self.settings = self.config.get('settings')
 			self.sets = self.config.get('sets')
-		self.queue = Queue()
+			self.connections = manager.config.get('connections', {})
+			self.limits = manager.config.get('limit', {})
+			if not self.limits.get('enabled', True):
+				self.limits = {}
+			self.retry = lnk.retry.Policy.shared(service,
+												 manager.config.get('retry'),
+												 self.transient)
+		self.engine = None
+		settings = lnk.config.get('lnk', 'settings')
+		if (settings.get('backend') == 'asyncio' and
+			self.replayable and
+			sys.version_info >= (3, 5) and
+			not requests.utils.get_environ_proxies(self.url)):
+			# Only imported when used, as it is not needed by default
+			from lnk import aio
+			concurrency = settings.get('concurrency', 256)
+			self.engine = aio.Engine.shared(concurrency)
+			self.executor = self.engine.executor()
+		else:
+			self.executor = lnk.executor.Executor(settings.get('workers', 16))
 		self.lock = threading.Lock()
-		self.error = None
+		self.flights = {}
+		self.limiter = None
 		self.parameters = {}
+		self.failures = None
 		self.list_item = ecstasy.beautify(' <+> {0}', ecstasy.Color.Red)
 
 	def fetch(self, *args):
@@ -97,12 +166,19 @@ class AbstractCommand(object):
 			The requests.Response object resulting from the request.
 		"""
 		url = '{0}/{1}'.format(self.api, endpoint)
-		if not parameters:
-			parameters = self.parameters
-		else:
-			parameters.update(self.parameters)
-
-		return requests.get(url, params=parameters, timeout=60)
+		# Merged into a new dictionary, since neither the caller's nor the
+		# command's parameters may be modified by concurrent requests
+		parameters = dict(parameters or {})
+		parameters.update(self.parameters)
+		# GET requests have no side-effects, so identical ones can share
+		key = ('GET', url, repr(sorted(parameters.items())))
+
+		return self.coalesce(key,
+							 self.perform,
+							 'GET',
+							 url,
+							 params=parameters,
+							 timeout=60)
 
 	def post(self, endpoint, authorization=None, data=None):
 		"""
@@ -119,69 +195,213 @@ class AbstractCommand(object):
 		"""
 		url = '{0}/{1}'.format(self.url, endpoint)
 
-		return requests.post(url, auth=authorization, data=data, timeout=60)
+		return self.perform('POST',
+							url,
+							auth=authorization,
+							data=data,
+							timeout=60)
 
-	def new_thread(self, function, *args, **kwargs):
+	def perform(self, method, url, **kwargs):
 		"""
-		Runs a function in a new thread and returns the thread.
+		Performs an HTTP request, retrying it if it failed transiently.
 
-		The function is run in a new thread in way that all positional
-		and keyword arguments can be forwarded to the function. Additionally,
-		extra measures are taken to wrap the function into another proxy
-		function that handles exceptions which would otherwise not be handled.
-		If the function to be called throws an exception, this is recorded
-		and the exception is assigned to 'error' attribute, where it can later
-		be checked.
+		Not named request(), since many commands define a request() method
+		of their own (for what they request, e.g. the info for a url).
 
 		Arguments:
-			function (func): The function to execute.
-			args (variadic): The positional arguments to pass to the function
-							 when calling it.
-			kwargs (variadic): The keyword arguments to pass to the function
-							   when calling it.
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			kwargs (variadic): Any keyword arguments accepted by
+							   requests.Session.request().
 
 		Returns:
-			The started (!) thread in which the function is being executed.
+			The requests.Response object resulting from the last attempt
+			(a lnk.aio.Response on the asyncio backend).
 		"""
-		def proxy(*args, **kwargs):
-			"""Proxy function for concurrent exception-handling."""
-			try:
-				function(*args, **kwargs)
-			except Exception:
-				_, self.error, _ = sys.exc_info()
-		thread = threading.Thread(target=proxy, args=args, kwargs=kwargs)
-		thread.daemon = True
-		thread.start()
+		if self.engine is not None:
+			return self.engine.perform(self, method, url, **kwargs)
+
+		return self.retry.call(self.send, (method, url), kwargs, self.status)
+
+	def send(self, method, url, **kwargs):
+		"""
+		Makes one attempt at an HTTP request over the service's pooled
+		connections, once the rate-limit allows it.
+
+		Arguments:
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			kwargs (variadic): Any keyword arguments accepted by
+							   requests.Session.request().
+
+		Returns:
+			The requests.Response object resulting from the request.
+		"""
+		self.throttle()
 
-		return thread
+		return self.session.request(method, url, self.connections, **kwargs)
 
-	def join(self, threads, timeout=120):
+	@staticmethod
+	def status(outcome):
 		"""
-		Joins a list of thread and checks for errors.
+		Returns the HTTP status of a response, for the retry policy.
 
-		Each thread is join with a timeout period as specified by the timeout
-		parameter of this function. If an error was found in the 'error'
-		attribute, it is re-raised so that it can be caught in the main thread.
+		Services reporting errors within the data of their responses
+		override this method, such that those errors can be retried too.
 
 		Arguments:
-			threads (list): The list of threading.Threads to join.
-			timeout (float): A floating-point number specifying the number of
-							 seconds to wait when joining. Defaults to 60
-							 seconds.
+			outcome (?): The response to a request, or the exception it raised.
+
+		Returns:
+			The HTTP status code, or None if the outcome has none.
+		"""
+		return lnk.retry.status(outcome)
+
+	def limit(self, account):
+		"""
+		Sets up the rate-limiting of the command's requests.
+
+		All commands of a service using the same account share one limiter
+		(see lnk.limit.Limiter), since the APIs limit requests per account.
+		Nothing is limited if the service has no 'limit' settings or they
+		are not enabled. The configuration files ship with an example
+		'limit' section, e.g. {"rate": 5, "burst": 10, "enabled": false},
+		which is enabled by setting 'enabled' to true.
+
+		Arguments:
+			account (str): The name of the account (see lnk.cache.account()).
+		"""
+		if self.limits:
+			name = '{0}/{1}'.format(self.service, account)
+			self.limiter = lnk.limit.Limiter.shared(name, self.limits)
+
+	def throttle(self):
+		"""Waits until the rate-limit (if any) allows another request."""
+		if self.limiter:
+			self.limiter.acquire()
+
+	def coalesce(self, key, function, *args, **kwargs):
+		"""
+		Makes a request, unless an identical one is already in flight.
+
+		If the same url appears many times in the input (e.g. in a piped
+		batch), each of its worker threads would otherwise make the same
+		request at the same time. Instead, only the first thread to arrive
+		makes the request, while all others with the same key wait for it
+		and share its response (or exception). Once the request finished,
+		the next request with the key is made anew.
+
+		Arguments:
+			key (hashable): The key identifying the request, e.g. made of its
+							endpoint and parameters.
+			function (func): The function making the request.
+			args (variadic): The positional arguments to pass to the function.
+			kwargs (variadic): The keyword arguments to pass to the function.
+
+		Returns:
+			The return value of the function (shared by all threads waiting).
 
 		Raises:
-			lnk.errors.InternalError: If a thread could not be joined in the given
-								  timeout period (i.e. if it is still alive after
-								  joining).
-			Other errors: If a thread threw an exception, this exception is
-						  re-raised in the main thread.
-		"""
-		for thread in threads:
-			thread.join(timeout=timeout)
-			if thread.is_alive():
-				raise lnk.errors.InternalError('Could not join thread.')
-		if self.error:
-			raise self.error
+			If the request threw an exception, this exception is re-raised
+			in all threads waiting.
+		"""
+		with self.lock:
+			task = self.flights.get(key)
+			leader = task is None
+			if leader:
+				task = lnk.executor.Task(function, args, kwargs)
+				self.flights[key] = task
+		if leader:
+			try:
+				task.run()
+			finally:
+				# Also when the request is pending on the asyncio backend
+				with self.lock:
+					del self.flights[key]
+
+		return task.result()
+
+	def map(self, function, items, *args, **kwargs):
+		"""
+		Calls a function for each item on the command's executor.
+
+		Arguments:
+			function (func): The function to call, with an item as its
+							 first argument.
+			items (iterable): The items (e.g. urls) to call the function for.
+			args (variadic): Further positional arguments for each call.
+			kwargs (variadic): Keyword arguments for each call.
+
+		Returns:
+			A list of the return values, in the order of the items (only
+			of the items that succeeded, in partial mode).
+
+		Raises:
+			If a call threw an exception, this exception is re-raised
+			in the calling thread (unless in partial mode).
+		"""
+		results = self.executor.map(self.tolerate(function),
+									items,
+									*args,
+									**kwargs)
+
+		return [i for i in results if i is not AbstractCommand.failed]
+
+	def imap(self, function, items, args=(), ordered=True):
+		"""
+		Lazily calls a function for each item on the command's executor.
+
+		Arguments:
+			function (func): The function to call, with an item as its
+							 first argument.
+			items (iterable): The items (e.g. urls) to call the function for.
+			args (tuple): Further positional arguments for each call.
+			ordered (bool): Whether to yield results in the order of the
+							items or as soon as any call finishes.
+
+		Returns:
+			A generator over the return values (only of the items that
+			succeeded, in partial mode), see lnk.executor.Executor.imap().
+		"""
+		results = self.executor.imap(self.tolerate(function),
+									 items,
+									 args,
+									 ordered)
+		for result in results:
+			if result is not AbstractCommand.failed:
+				yield result
+
+	def tolerate(self, function):
+		"""
+		Wraps a function such that its errors are recorded in partial mode.
+
+		In partial mode (i.e. if the command's 'failures' are set), an
+		item (e.g. a url) for which a call of map() or imap() fails does not
+		abort the command. Instead, its error is recorded in the failures
+		and only the results of the other items are returned.
+
+		Arguments:
+			function (func): The function to call, with an item as its
+							 first argument.
+
+		Returns:
+			The function itself if the command is not in partial mode, else
+			a function returning AbstractCommand.failed for items that failed.
+		"""
+		if self.failures is None:
+			return function
+		def tolerant(item, *args, **kwargs):
+			"""Records the error of an item rather than raising it."""
+			try:
+				return function(item, *args, **kwargs)
+			except lnk.errors.InternalError:
+				raise
+			except Exception:
+				_, error, _ = sys.exc_info()
+				self.failures.add(item, error)
+				return AbstractCommand.failed
+
+		return tolerant
 
 def filter_sets(all_sets, only, hide):
 	"""
@@ -0,0 +1,717 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""
+An asyncio backend, running the requests of commands on one event loop.
+
+Requires Python 3.5+ (commands fall back to the worker threads of
+lnk.executor otherwise, see AbstractCommand).
+
+The functions run on an Executor of this module are called again until
+all of their requests are answered (see Engine). Everything they do
+before their last request is thus done once per request, so they must not
+have side-effects before it (e.g. output, copying to the clipboard or
+storing in a cache), or only idempotent ones. Commands whose functions
+do are not 'replayable' and always run on the worker threads.
+
+Unlike the requests library behind the threaded backend, the Client of
+this module:
+
+	* does not follow redirects (a 3xx response is returned as it is),
+	* does not support proxies (commands fall back to the worker threads
+	  if the HTTP_PROXY/HTTPS_PROXY environment variables apply to the
+	  API of their service) and
+	* does not decode compressed bodies (it asks for none).
+
+None of these are used by the APIs of the services.
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import ssl
+import sys
+import threading
+
+from urllib.parse import urlencode, urlsplit
+
+import requests.exceptions
+import requests.structures
+
+import lnk.executor
+import lnk.retry
+
+class Pending(BaseException):
+	"""
+	Raised by Engine.perform() within a call replayed by an Executor, when
+	the response to the request is not yet known.
+
+	Derives from BaseException, such that it passes through the handlers of
+	commands (e.g. AbstractCommand.tolerate()) up to the Executor.
+
+	Attributes:
+		command (lnk.abstract.AbstractCommand): The command making the request.
+		key (tuple): The key identifying the request.
+		method (str): The HTTP method.
+		url (str): The full URL of the request.
+		kwargs (dict): The keyword arguments of the request.
+	"""
+	def __init__(self, command, key, method, url, kwargs):
+		super(Pending, self).__init__(key)
+		self.command = command
+		self.key = key
+		self.method = method
+		self.url = url
+		self.kwargs = kwargs
+
+class Response(object):
+	"""
+	The response to a request made by a Client.
+
+	Mimics the parts of a requests.Response which commands use.
+
+	Attributes:
+		url (str): The URL of the request.
+		status_code (int): The HTTP status code.
+		reason (str): The reason phrase of the status.
+		headers (requests.structures.CaseInsensitiveDict): The headers.
+		content (bytes): The body.
+	"""
+	def __init__(self, url, status_code, reason, headers, content):
+		self.url = url
+		self.status_code = status_code
+		self.reason = reason
+		self.headers = headers
+		self.content = content
+
+	@property
+	def ok(self):
+		return self.status_code < 400
+
+	@property
+	def encoding(self):
+		"""The charset of the content type (UTF-8 if none is given)."""
+		for parameter in self.headers.get('Content-Type', '').split(';')[1:]:
+			name, _, value = parameter.partition('=')
+			if name.strip().lower() == 'charset':
+				return value.strip().strip('"')
+		return 'utf-8'
+
+	@property
+	def text(self):
+		return self.content.decode(self.encoding, 'replace')
+
+	def json(self):
+		return json.loads(self.text)
+
+class Client(object):
+	"""
+	A minimal, non-blocking HTTP/1.1 client with keep-alive connections.
+
+	Only what the APIs of the services need is supported: GET and POST
+	requests with query parameters, form data and basic authorization,
+	answered with a length-delimited, chunked or connection-delimited body.
+	Connections are kept alive and re-used per host, up to 'size' idle
+	connections each. Errors are raised as the exceptions requests raises
+	(e.g. requests.exceptions.ConnectionError), such that the retry policies
+	and error handling of commands apply unchanged.
+
+	Attributes:
+		size (int): The maximum number of idle connections kept per host.
+		idle (dict): The idle connections, as lists of (reader, writer)
+					 pairs by (scheme, host, port).
+		context (ssl.SSLContext|None): The context of HTTPS connections,
+									   created with the first one.
+	"""
+
+	ports = {'http': 80, 'https': 443}
+
+	def __init__(self, size=10):
+		self.size = size
+		self.idle = {}
+		self.context = None
+
+	async def request(self,
+					  method,
+					  url,
+					  params=None,
+					  data=None,
+					  auth=None,
+					  timeout=None,
+					  headers=None):
+		"""
+		Makes an HTTP request.
+
+		Arguments:
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			params (dict): Optionally, the parameters of the query string.
+			data (dict): Optionally, form data to send in the body.
+			auth (tuple): Optionally, a (login, password) tuple for basic
+						  authorization.
+			timeout (float): Optionally, the number of seconds after which to
+							 give up on the request.
+			headers (dict): Optionally, further headers to send.
+
+		Returns:
+			The Response.
+
+		Raises:
+			requests.exceptions.Timeout: If the request timed out.
+			requests.exceptions.ConnectionError: If no connection could be
+												 made or it broke down.
+		"""
+		if params:
+			separator = '&' if '?' in url else '?'
+			url += separator + urlencode(params, doseq=True)
+		parts = urlsplit(url)
+		if parts.scheme not in Client.ports:
+			raise requests.exceptions.InvalidSchema(url)
+		target = parts.path or '/'
+		if parts.query:
+			target += '?' + parts.query
+		fields = requests.structures.CaseInsensitiveDict()
+		fields['Host'] = parts.netloc.rpartition('@')[2]
+		fields['User-Agent'] = 'lnk'
+		fields['Accept'] = '*/*'
+		fields['Accept-Encoding'] = 'identity'
+		body = b''
+		if data:
+			body = urlencode(data, doseq=True).encode('utf-8')
+			fields['Content-Type'] = 'application/x-www-form-urlencoded'
+		if body or method in ('POST', 'PUT', 'PATCH'):
+			fields['Content-Length'] = str(len(body))
+		if auth:
+			secret = '{0}:{1}'.format(*auth).encode('utf-8')
+			fields['Authorization'] = 'Basic {0}'.format(
+				base64.b64encode(secret).decode('ascii'))
+		fields.update(headers or {})
+		head = '{0} {1} HTTP/1.1\r\n'.format(method, target)
+		head += ''.join('{0}: {1}\r\n'.format(*i) for i in fields.items())
+		message = (head + '\r\n').encode('latin-1') + body
+		host = (parts.scheme,
+				parts.hostname,
+				parts.port or Client.ports[parts.scheme])
+		try:
+			return await asyncio.wait_for(self.exchange(host, message, url),
+										  timeout)
+		except asyncio.TimeoutError:
+			what = 'Request to {0} timed out.'.format(url)
+			raise requests.exceptions.Timeout(what)
+		except (OSError, asyncio.IncompleteReadError, ValueError) as error:
+			what = 'Request to {0} failed ({1}).'.format(url, error)
+			raise requests.exceptions.ConnectionError(what)
+
+	async def exchange(self, host, message, url):
+		"""
+		Sends a request and receives its response over a connection to a host.
+
+		An idle connection is re-used if there is one. Since the server may
+		have closed it meanwhile, a request failing on a re-used connection
+		is sent once more over a new connection.
+
+		Arguments:
+			host (tuple): The (scheme, host, port) to connect to.
+			message (bytes): The request.
+			url (str): The URL of the request.
+
+		Returns:
+			The Response.
+		"""
+		idle = self.idle.setdefault(host, [])
+		while True:
+			reused = bool(idle)
+			reader, writer = idle.pop() if reused else await self.connect(host)
+			try:
+				writer.write(message)
+				await writer.drain()
+				response, reusable = await self.receive(reader, url)
+			except (OSError, asyncio.IncompleteReadError):
+				writer.close()
+				if reused:
+					continue
+				raise
+			except BaseException:
+				# E.g. cancelled by a timeout, leaving the response unread
+				writer.close()
+				raise
+			if reusable and len(idle) < self.size:
+				idle.append((reader, writer))
+			else:
+				writer.close()
+
+			return response
+
+	async def connect(self, host):
+		"""
+		Opens a new connection to a host.
+
+		Arguments:
+			host (tuple): The (scheme, host, port) to connect to.
+
+		Returns:
+			The (asyncio.StreamReader, asyncio.StreamWriter) of the connection.
+		"""
+		scheme, hostname, port = host
+		context = None
+		if scheme == 'https':
+			if self.context is None:
+				self.context = ssl.create_default_context()
+			context = self.context
+
+		return await asyncio.open_connection(hostname,
+											 port,
+											 ssl=context,
+											 limit=2 ** 20)
+
+	async def receive(self, reader, url):
+		"""
+		Reads a response from a connection.
+
+		Arguments:
+			reader (asyncio.StreamReader): The reading end of the connection.
+			url (str): The URL of the request.
+
+		Returns:
+			The Response and whether the connection can be re-used.
+		"""
+		line = await reader.readline()
+		if not line:
+			raise ConnectionResetError('Connection closed by server')
+		version, status, reason = (line.decode('latin-1').rstrip('\r\n')
+									   .split(' ', 2) + [''])[:3]
+		status = int(status)
+		headers = requests.structures.CaseInsensitiveDict()
+		while True:
+			line = await reader.readline()
+			if line in (b'\r\n', b'\n', b''):
+				break
+			name, _, value = line.decode('latin-1').partition(':')
+			name, value = name.strip(), value.strip()
+			if name in headers:
+				value = '{0}, {1}'.format(headers[name], value)
+			headers[name] = value
+		reusable = (version == 'HTTP/1.1' and
+					headers.get('Connection', '').lower() != 'close')
+		if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+			content = await self.chunks(reader)
+		elif 'Content-Length' in headers:
+			content = await reader.readexactly(int(headers['Content-Length']))
+		elif status < 200 or status in (204, 304):
+			content = b''
+		else:
+			# Delimited by the end of the connection
+			content = await reader.read()
+			reusable = False
+
+		return Response(url, status, reason, headers, content), reusable
+
+	async def chunks(self, reader):
+		"""
+		Reads a body sent with the chunked transfer-encoding.
+
+		Arguments:
+			reader (asyncio.StreamReader): The reading end of the connection.
+
+		Returns:
+			The body, as bytes.
+		"""
+		content = []
+		while True:
+			line = await reader.readline()
+			size = int(line.split(b';', 1)[0].strip(), 16)
+			if not size:
+				break
+			content.append(await reader.readexactly(size))
+			await reader.readline()
+		# Trailers (if any) up to the blank line
+		while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+			pass
+
+		return b''.join(content)
+
+	def close(self):
+		"""Closes all idle connections."""
+		for connections in self.idle.values():
+			for _, writer in connections:
+				writer.close()
+		self.idle.clear()
+
+class Engine(object):
+	"""
+	Runs the requests of commands concurrently on one event loop.
+
+	With the threaded backend, each concurrent request occupies a worker
+	thread (and its stack) for as long as it waits for the network, such
+	that the number of requests in flight is bound by the number of threads
+	one can afford. The Engine instead makes all requests on a single
+	event loop with a non-blocking HTTP client (see Client), where a
+	waiting request costs little more than its connection, and bounds
+	their number with a semaphore ('concurrency').
+
+	The code of commands stays synchronous: their requests reach perform()
+	(from AbstractCommand.perform(), i.e. via get() and post()) as they
+	would otherwise reach their session. Within a call run by an Executor
+	of the Engine, perform() returns the response if it is known
+	already or raises Pending otherwise. The Executor collects the pending
+	requests of all its calls, which the Engine then makes at once (see
+	rounds()), and calls the functions again with the responses. Requests
+	are retried and rate-limited on the loop as by the command's policy
+	(see lnk.retry.Policy.decide()) and limiter, without blocking it.
+
+	Attributes:
+		concurrency (int): The maximum number of requests in flight.
+		loop (asyncio.AbstractEventLoop): The event loop.
+		client (Client): The HTTP client, keeping connections alive.
+		semaphore (asyncio.Semaphore|None): The semaphore bounding the
+											requests in flight (created on
+											the loop, with the first request).
+		lock (threading.Lock): The lock under which the loop is run (by one
+							   thread at a time).
+		local (threading.local): The call being replayed in each thread.
+		engines (dict): Class-attribute holding the engines returned by
+						shared(), by their concurrency.
+	"""
+
+	engines = {}
+	engines_lock = threading.Lock()
+
+	def __init__(self, concurrency):
+		"""
+		Constructs a new Engine, with a new event loop.
+
+		Arguments:
+			concurrency (int): The maximum number of requests in flight.
+		"""
+		self.concurrency = max(1, int(concurrency))
+		self.loop = asyncio.new_event_loop()
+		self.client = Client(self.concurrency)
+		self.semaphore = None
+		self.lock = threading.Lock()
+		self.local = threading.local()
+
+	@classmethod
+	def shared(cls, concurrency):
+		"""
+		Returns the process-wide engine for a concurrency.
+
+		Arguments:
+			concurrency (int): The maximum number of requests in flight.
+
+		Returns:
+			The one Engine for the concurrency, constructed on the first call.
+		"""
+		with cls.engines_lock:
+			if concurrency not in cls.engines:
+				cls.engines[concurrency] = cls(concurrency)
+
+		return cls.engines[concurrency]
+
+	def executor(self):
+		"""Returns a new Executor, running calls on the engine."""
+		return Executor(self)
+
+	def run(self, coroutine):
+		"""
+		Runs a coroutine on the loop until it is done.
+
+		Arguments:
+			coroutine (coroutine): The coroutine.
+
+		Returns:
+			The return value of the coroutine.
+		"""
+		with self.lock:
+			return self.loop.run_until_complete(coroutine)
+
+	def perform(self, command, method, url, **kwargs):
+		"""
+		Performs a request for a command.
+
+		Arguments:
+			command (lnk.abstract.AbstractCommand): The command making the
+													request, whose retry policy
+													and limiter apply.
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			kwargs (variadic): The keyword arguments of the request (see
+							   Client.request()).
+
+		Returns:
+			The Response to the request.
+
+		Raises:
+			Pending: Within a call replayed by an Executor, if the response
+					 is not yet known.
+			Other errors: The exception of the request, if it failed.
+		"""
+		call = getattr(self.local, 'call', None)
+		if call is None:
+			outcome = self.run(self.fetch(command, method, url, kwargs))
+		else:
+			key = (method, url, repr(sorted(kwargs.items())))
+			if key not in call.responses:
+				raise Pending(command, key, method, url, kwargs)
+			outcome = call.responses[key]
+		if isinstance(outcome, Exception):
+			raise outcome
+
+		return outcome
+
+	def rounds(self, calls):
+		"""
+		Runs calls until all are done, making their requests in rounds.
+
+		Each round calls the functions of all calls not yet done, collecting
+		the request each is waiting for, and then makes all those requests
+		concurrently (identical ones only once). Calls making one request
+		each are thus done within two rounds.
+
+		Arguments:
+			calls (list): The Calls to run.
+
+		Returns:
+			A generator over the calls, yielding each once it is done.
+		"""
+		while calls:
+			waiting = []
+			pending = {}
+			for call in calls:
+				call.run()
+				if call.done.is_set():
+					yield call
+				else:
+					waiting.append(call)
+					pending.setdefault(call.pending.key, call.pending)
+			if pending:
+				outcomes = self.run(self.gather(pending))
+				for call in waiting:
+					call.responses[call.pending.key] = outcomes[call.pending.key]
+			calls = waiting
+
+	async def gather(self, pending):
+		"""
+		Makes requests concurrently.
+
+		Arguments:
+			pending (dict): The Pending requests, by their keys.
+
+		Returns:
+			A dictionary mapping the key of each request to its outcome (the
+			Response or the exception it failed with).
+		"""
+		keys = list(pending)
+		outcomes = await asyncio.gather(*[self.fetch(i.command,
+													 i.method,
+													 i.url,
+													 i.kwargs)
+										  for i in pending.values()],
+										return_exceptions=True)
+
+		return dict(zip(keys, outcomes))
+
+	async def fetch(self, command, method, url, kwargs):
+		"""
+		Makes a request, retrying it as the command's retry policy allows.
+
+		Arguments:
+			command (lnk.abstract.AbstractCommand): The command making the
+													request.
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			kwargs (dict): The keyword arguments of the request.
+
+		Returns:
+			The Response of the last attempt, or the (transient) exception it
+			failed with.
+		"""
+		policy = command.retry
+		start = lnk.retry.monotonic()
+		attempt = 1
+		while True:
+			try:
+				outcome = await self.send(command.limiter, method, url, kwargs)
+				failed = command.status(outcome) in policy.statuses
+			except policy.errors as error:
+				outcome, failed = error, True
+			elapsed = lnk.retry.monotonic() - start
+			delay = policy.decide(attempt, outcome, failed, elapsed)
+			if delay is None:
+				return outcome
+			await asyncio.sleep(delay)
+			attempt += 1
+
+	async def send(self, limiter, method, url, kwargs):
+		"""
+		Makes one attempt at a request, once the rate-limit allows it and
+		fewer than 'concurrency' requests are in flight.
+
+		Arguments:
+			limiter (lnk.limit.Limiter|None): The limiter of the command.
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			kwargs (dict): The keyword arguments of the request.
+
+		Returns:
+			The Response.
+		"""
+		if limiter:
+			delay = limiter.reserve()
+			if delay > 0:
+				await asyncio.sleep(delay)
+		if self.semaphore is None:
+			self.semaphore = asyncio.Semaphore(self.concurrency)
+		async with self.semaphore:
+			return await self.client.request(method, url, **kwargs)
+
+	def close(self):
+		"""Closes the idle connections and the loop."""
+		with self.lock:
+			self.client.close()
+			self.loop.close()
+
+class Call(lnk.executor.Task):
+	"""
+	A function call submitted to an Executor, run until its requests are
+	answered.
+
+	Attributes:
+		executor (Executor): The executor the call was submitted to.
+		responses (dict): The outcomes of the requests made so far, by
+						  their keys.
+		lookups (set): The keys looked up by the call so far (see
+					   lnk.executor.first()).
+		pending (Pending|None): The request the call is waiting for.
+	"""
+	def __init__(self, executor, function, args, kwargs):
+		super(Call, self).__init__(function, args, kwargs)
+		self.executor = executor
+		self.responses = {}
+		self.lookups = set()
+		self.pending = None
+
+	def run(self):
+		"""
+		Calls the function, which is done unless it raises Pending.
+		"""
+		local = self.executor.engine.local
+		local.call = self
+		lnk.executor.local.lookups = self.lookups
+		try:
+			self.value = self.function(*self.args, **self.kwargs)
+		except Pending as pending:
+			self.pending = pending
+			return
+		except Exception:
+			_, self.error, _ = sys.exc_info()
+		finally:
+			local.call = None
+			lnk.executor.local.lookups = None
+		self.pending = None
+		self.done.set()
+
+	def result(self, timeout=None):
+		"""
+		Runs the calls submitted to the executor (if this one is not yet
+		done) and returns the result of this one.
+
+		Returns:
+			The return value of the function.
+
+		Raises:
+			If the function threw an exception, this exception is re-raised.
+		"""
+		if not self.done.is_set():
+			self.executor.drain()
+
+		return super(Call, self).result(timeout)
+
+class Executor(object):
+	"""
+	Runs the calls of a command on an Engine.
+
+	Has the interface of lnk.executor.Executor, such that commands need not
+	know which backend they run on. Rather than handing calls to worker
+	threads, it runs them in the calling thread, in rounds with the
+	requests of all calls made at once on the engine's loop (see
+	Engine.rounds()). Submitted calls are run once the result of any is
+	needed. A function run by the Executor may therefore be called several
+	times before it returns: it must make its requests through
+	AbstractCommand.perform() and have no other side-effects before its
+	last request (e.g. output).
+
+	Attributes:
+		engine (Engine): The engine making the requests.
+		workers (int): The number of requests made at once.
+		calls (list): The calls submitted and not yet run.
+		lock (threading.Lock): A lock for thread-safe submitting.
+	"""
+	def __init__(self, engine):
+		self.engine = engine
+		self.workers = engine.concurrency
+		self.calls = []
+		self.lock = threading.Lock()
+
+	def submit(self, function, *args, **kwargs):
+		"""
+		Schedules a function call, run once the result of any is needed.
+
+		Arguments:
+			function (func): The function to call.
+			args (variadic): The positional arguments to pass to the function.
+			kwargs (variadic): The keyword arguments to pass to the function.
+
+		Returns:
+			The Call.
+		"""
+		call = Call(self, function, args, kwargs)
+		with self.lock:
+			self.calls.append(call)
+
+		return call
+
+	def drain(self):
+		"""Runs all calls submitted so far until they are done."""
+		with self.lock:
+			calls, self.calls = self.calls, []
+		for _ in self.engine.rounds(calls):
+			pass
+
+	def map(self, function, items, *args, **kwargs):
+		"""
+		Calls a function for each item and returns all results, in order.
+
+		See lnk.executor.Executor.map().
+		"""
+		calls = [Call(self, function, (item,) + args, kwargs) for item in items]
+		for _ in self.engine.rounds(calls):
+			pass
+
+		return [call.result() for call in calls]
+
+	def imap(self, function, items, args=(), ordered=True, window=None):
+		"""
+		Lazily calls a function for each item, yielding results as they come.
+
+		Items are consumed in batches of 'window' (by default, twice the
+		concurrency), each run in rounds. See lnk.executor.Executor.imap().
+		"""
+		window = max(1, window or 2 * self.workers)
+		items = iter(items)
+		while True:
+			calls = [Call(self, function, (item,) + tuple(args), {})
+					 for item in itertools.islice(items, window)]
+			if not calls:
+				break
+			done = self.engine.rounds(calls)
+			if ordered:
+				for _ in done:
+					pass
+				done = calls
+			for call in done:
+				yield call.result()
+
+	def shutdown(self):
+		"""Runs the calls submitted so far (there are no threads to stop)."""
+		self.drain()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Batching of lookups for many keys into few requests."""
+
+import threading
+
+import lnk.errors
+
+class Batcher(object):
+	"""
+	Looks up many keys with requests for up to 'size' keys each.
+
+	Some API endpoints (e.g. bit.ly's /expand and /info) accept several
+	keys (e.g. short urls) per request. Rather than each url of a command
+	making its own request, the command hands all its urls to prefetch()
+	up-front, which groups those not yet known into batches and makes one
+	request per batch (concurrently, on the command's executor). The
+	results are split back per key, where the per-url code of the command
+	then finds them with get(). Keys a batch yields no result for (e.g.
+	because the key is invalid, or the whole batch failed) are not stored,
+	such that the per-url code makes its usual request for them and reports
+	its error as it would have without batching.
+
+	Attributes:
+		lookup (func): The function requesting a batch, taking a list of keys
+					   and returning a dictionary of the values found for them.
+		size (int): The maximum number of keys per request.
+		results (dict): The values found so far, by their keys.
+		lock (threading.Lock): A lock for thread-safe updating of the results.
+	"""
+	def __init__(self, lookup, size):
+		"""
+		Constructs a new Batcher.
+
+		Arguments:
+			lookup (func): The function requesting a batch of keys.
+			size (int): The maximum number of keys per request.
+		"""
+		self.lookup = lookup
+		self.size = max(1, int(size))
+		self.results = {}
+		self.lock = threading.Lock()
+
+	def prefetch(self, keys, map, known=None):
+		"""
+		Looks up all keys not known yet, in batches.
+
+		Arguments:
+			keys (iterable): The keys to look up (duplicates are looked up once).
+			map (func): The function with which to run the batches, e.g. an
+						executor's map().
+			known (func): Optionally, a function returning the value known for
+						  a key already (e.g. cached), or None. Keys with a
+						  value are not requested (but their value is stored).
+
+		Returns:
+			The number of requests made.
+		"""
+		missing = []
+		seen = set()
+		for key in keys:
+			if key in seen or self.get(key) is not None:
+				continue
+			seen.add(key)
+			value = known(key) if known else None
+			if value is None:
+				missing.append(key)
+			else:
+				with self.lock:
+					self.results[key] = value
+		batches = [missing[i:i + self.size]
+				   for i in range(0, len(missing), self.size)]
+		for found in map(self.attempt, batches):
+			with self.lock:
+				self.results.update(found)
+
+		return len(batches)
+
+	def attempt(self, batch):
+		"""
+		Requests a batch, ignoring its errors.
+
+		Arguments:
+			batch (list): The keys to request.
+
+		Returns:
+			The values found for the keys, or an empty dictionary if the
+			request failed (such that the keys are requested singly).
+		"""
+		try:
+			return self.lookup(batch)
+		except lnk.errors.InternalError:
+			raise
+		except Exception:
+			return {}
+
+	def get(self, key):
+		"""
+		Returns the value found for a key, or None if it has none.
+
+		Arguments:
+			key (str): The key.
+		"""
+		with self.lock:
+			return self.results.get(key)
@@ -15,17 +15,51 @@ from collections import namedtuple
 
 import lnk.errors
 
+# The maximum width of a box when not connected to a terminal
 MAX_WIDTH = 60 # 3/4 of 80
-# If we are connected to a terminal right now
-if sys.stdin.isatty():
-	with os.popen('stty size', 'r') as process:
-		output = process.read()
-	# Doesn't always work?
-	if output:
-		MAX_WIDTH = 3 * int(output.split()[1])//4
 
 Line = namedtuple('Line', ['raw', 'escaped'])
 
+def get_max_width():
+	"""
+	Returns the maximum width of a box.
+
+	If we are connected to a terminal, this is 3/4 of its width, else
+	MAX_WIDTH. The width is looked up on every call (it is only a system
+	call, not a subprocess), such that a resized terminal is respected.
+
+	Returns:
+		The maximum width of a box, in characters.
+	"""
+	if sys.stdin.isatty():
+		columns = get_terminal_width()
+		if columns:
+			return 3 * columns//4
+
+	return MAX_WIDTH
+
+def get_terminal_width():
+	"""
+	Returns the width of the terminal stdin is connected to.
+
+	Returns:
+		The number of columns of the terminal, or None if it
+		could not be determined.
+	"""
+	try:
+		descriptor = sys.stdin.fileno()
+		try:
+			return os.get_terminal_size(descriptor).columns
+		# Python < 3.3
+		except AttributeError:
+			import fcntl
+			import struct
+			import termios
+			packed = fcntl.ioctl(descriptor, termios.TIOCGWINSZ, b'\0' * 8)
+			return struct.unpack(str('hhhh'), packed)[1]
+	except (ImportError, EnvironmentError, ValueError):
+		return None
+
 def boxify(results):
 	"""
 	Formats results of command into a box.
@@ -160,7 +194,7 @@ def get_escaped(results):
 			lines.append(line)
 		escaped.append(lines)
 
-	return escaped, min([MAX_WIDTH, width])
+	return escaped, min([get_max_width(), width])
 
 def escape(line):
 	"""
@@ -3,8 +3,11 @@
 
 """Contains the base-class for all bit.ly commands."""
 
+import lnk.cache
 import lnk.config
 import lnk.errors
+import lnk.retry
+import lnk.session
 
 from lnk.abstract import AbstractCommand
 
@@ -15,12 +18,26 @@ class Command(AbstractCommand):
 	Configures the AbstractCommand base class for all commands in the
 	entire application, which needs information about the service being
 	used. Moreover sets up the necessary parameters needed for any request
-	to the bit.ly API (the OAuth2 access token). 
+	to the bit.ly API (the OAuth2 access token). All requests made with the
+	same access token share one rate-limit (see AbstractCommand.limit()).
+	All bit.ly commands are replayable (see AbstractCommand.replayable): on
+	the asyncio backend, the functions they run on their executor are called
+	again until all their requests are answered.
 
 	Attributes:
+		session (lnk.session.Session): Class-attribute holding the connection
+									   pool shared by all bit.ly commands.
 		parameters (dict): The necessary parameters for any request to the
 						   bit.ly API.
+		batch_size (int): Class-attribute holding the maximum number of short
+						  urls the API accepts per request to endpoints taking
+						  several (see lnk.batch.Batcher).
 	"""
+
+	session = lnk.session.Session()
+
+	batch_size = 15
+
 	def __init__(self, which):
 		"""
 		Raises:
@@ -32,6 +49,40 @@ class Command(AbstractCommand):
 			if not manager['key'] and which != 'key':
 				raise lnk.errors.AuthorizationError('bitly')
 			self.parameters = {'access_token': manager['key']}
+		self.limit(lnk.cache.account(self.parameters['access_token']))
+
+	@staticmethod
+	def status(outcome):
+		"""
+		Returns the status of a response from the bit.ly API.
+
+		The bit.ly API answers most errors with an HTTP status of 200 and the
+		actual status in the data. Those are returned instead, with the
+		rate-limit being exceeded mapped to 429 and bad arguments (which
+		bit.ly reports with a status of 500) mapped to 400, such that only
+		transient errors are retried.
+
+		Arguments:
+			outcome (?): The response to a request, or the exception it raised.
+
+		Returns:
+			The status code, or None if the outcome has none.
+		"""
+		code = lnk.retry.status(outcome)
+		if code != 200:
+			return code
+		try:
+			data = outcome.json()
+			code = int(data['status_code'])
+			text = data.get('status_txt', '')
+		except (ValueError, KeyError, TypeError):
+			return code
+		if text == 'RATE_LIMIT_EXCEEDED':
+			return 429
+		if code == 500 and text != 'UNKNOWN_ERROR':
+			return 400
+
+		return code
 
 	@staticmethod
 	def verify(response, what, inner=None):
@@ -6,22 +6,39 @@
 from __future__ import unicode_literals
 
 import click
+import functools
+import itertools
 import time
 
+from collections import namedtuple
+
 import lnk.beauty
-import lnk.bitly.link
+import lnk.cache
+import lnk.mirror
+import lnk.timeline
 
 from lnk.bitly.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a history command and echoes its output.
 
+	Plain output is echoed line by line, as the pages of the history
+	arrive, while pretty output needs all lines to build its box.
+
 	Arguments:
 		args (variadic): The arguments to pass to a
 						 History instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   History constructor (e.g. 'mirror').
 	"""
-	click.echo(History().fetch(*args))
+	history = History(**kwargs)
+	# The last argument is the 'pretty' flag
+	if args[-1]:
+		click.echo(history.fetch(*args))
+	else:
+		for line in history.lines(*args):
+			click.echo(line)
 
 class History(Command):
 	"""
@@ -32,18 +49,48 @@ class History(Command):
 	may, of course, be properly prettified if necessary. A nice feature
 	is that if the history is fetched with the 'plain' flag set to true
 	its output can be piped into other lnk commands, such as 'stat' or 'info'.
+	Only request_offset(), which has no side-effects, runs on the executor
+	(the asyncio backend calls it again until its page is answered), while
+	pages are consumed and mirrored by the generators of the calling thread.
 
 	Attributes:
 		raw (bool): Whether to prettify the output or
 					return it raw, for internal use.
-		link (bit.ly.link.Link): A link instance to expand short links.
+		mirror (lnk.mirror.Mirror|None): The local mirror of the history
+										 to answer time windows from, if
+										 any (see synchronize()).
+		limit (int|None): The maximum number of links per time window,
+						  or None to fetch the whole history.
+		page_size (int): Class-attribute holding the maximum number of
+						 links bit.ly returns per request.
 		seconds (dict): A mapping between string representations of time
 						and equivalent numbers of seconds for each unit.
 	"""
-	def __init__(self, raw=False):
+
+	Url = namedtuple('Url', ['short', 'long', 'created'])
+
+	Page = namedtuple('Page', ['urls', 'total'])
+
+	page_size = 50
+
+	def __init__(self, raw=False, mirror=None):
+		"""
+		Constructs a new History command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			mirror (bool): Whether to keep a local mirror of the history.
+						   Defaults to the 'mirror' setting.
+		"""
 		super(History, self).__init__('history')
 		self.raw = raw
-		self.link = lnk.bitly.link.Link(raw=True)
+		if mirror is None:
+			mirror = self.settings.get('mirror', False)
+		self.mirror = None
+		if mirror:
+			account = lnk.cache.account(self.parameters['access_token'])
+			self.mirror = lnk.mirror.Mirror('bitly', account=account)
+		self.limit = None
 		self.seconds = {
 			'minute': 60, 
 			'hour': 3600, 
@@ -78,14 +125,13 @@ class History(Command):
 			else the same plain list as for the first case, but joined to
 			a string.
 		"""
-		self.parameters['limit'] = limit
-		result = []
-		if forever:
-			result += self.forever(expanded, both, pretty)
-		if ranges:
-			result += self.ranges(set(ranges), expanded, both, pretty)
-		if last:
-			result += self.last(set(last), expanded, both, pretty)
+		result = list(self.lines(last,
+								 ranges,
+								 forever,
+								 limit,
+								 expanded,
+								 both,
+								 pretty))
 
 		# Remove last empty line
 		if pretty:
@@ -95,6 +141,24 @@ class History(Command):
 			return result
 		return lnk.beauty.boxify([result]) if pretty else '\n'.join(result)
 
+	def lines(self, last, ranges, forever, limit, expanded, both, pretty):
+		"""
+		Fetches the link history, yielding lines as soon as they arrive.
+
+		Takes the same arguments as fetch(), but returns a generator over
+		the lines (including the trailing empty line if pretty is set).
+		"""
+		self.limit = limit
+		windows = []
+		if forever:
+			windows += self.forever_windows()
+		if ranges:
+			windows += self.ranges_windows(set(ranges))
+		if last:
+			windows += self.last_windows(set(last))
+
+		return self.generate(windows, expanded, both, pretty)
+
 	def forever(self, expanded, both, pretty):
 		"""
 		Fetches and formats history since forever.
@@ -109,12 +173,9 @@ class History(Command):
 			same list of lines with a header ('Since forever:') plus
 			an empty line for padding.
 		"""
-		lines = []
-		for url in self.request():
-			line = self.lineify(url, expanded, both, pretty)
-			lines.append(line)
+		windows = self.forever_windows()
 
-		return ['Since forever:'] + lines + [''] if pretty else lines
+		return list(self.generate(windows, expanded, both, pretty))
 
 	def ranges(self, ranges, expanded, both, pretty):
 		"""
@@ -131,22 +192,9 @@ class History(Command):
 			same list of lines with a header (e.g. 'Between 7 months and
 			5 days ago:'), plus an empty line for padding.
 		"""
-		lines = []
-		for time_point in ranges:
-			before = time_point[2:]
-			after = time_point[:2]
-			parameters = self.parse_time(after, before)
-			urls = self.request(parameters)
-			if pretty:
-				header = self.ranges_header(after, before, urls)
-				lines.append(header)
-			for url in urls:
-				line = self.lineify(url, expanded, both, pretty)
-				lines.append(line)
-			if pretty:
-				lines.append('')
+		windows = self.ranges_windows(ranges)
 
-		return lines
+		return list(self.generate(windows, expanded, both, pretty))
 
 	def last(self, last, expanded, both, pretty):
 		"""
@@ -163,20 +211,196 @@ class History(Command):
 			same list of lines with a header (e.g. 'Last 4 weeks:'),
 			plus an empty line for padding.
 		"""
-		lines = []
+		windows = self.last_windows(last)
+
+		return list(self.generate(windows, expanded, both, pretty))
+
+	def forever_windows(self):
+		"""
+		Returns the time window for history since forever.
+
+		A time window is a (<header>, <after>, <before>) tuple, where the
+		header is a function returning the header for the window's urls
+		(see e.g. ranges_header()), and after and before are the UNIX
+		timestamps bounding the window (None if it is unbounded).
+		"""
+		return [(lambda urls: 'Since forever:', None, None)]
+
+	def ranges_windows(self, ranges):
+		"""Returns the time windows for time-ranges (see forever_windows())."""
+		windows = []
+		for time_point in ranges:
+			before = time_point[2:]
+			after = time_point[:2]
+			header = functools.partial(self.ranges_header, after, before)
+			windows.append((header,
+							self.timestamp(after),
+							self.timestamp(before)))
+
+		return windows
+
+	def last_windows(self, last):
+		"""Returns the time windows for time-points (see forever_windows())."""
+		windows = []
 		for time_point in last:
-			parameters = self.parse_time(time_point)
-			urls = self.request(parameters)
+			header = functools.partial(self.last_header, time_point)
+			windows.append((header, self.timestamp(time_point), None))
+
+		return windows
+
+	def generate(self, windows, expanded, both, pretty):
+		"""
+		Fetches and formats the history for time windows, as a generator.
+
+		The links of each window are taken from the mirror if there is one
+		(see answer_from_mirror()), else from the API (see answer_from_api()).
+
+		Arguments:
+			windows (list): The time windows (see forever_windows()).
+			expanded (bool): Whether to show expanded or short links.
+			both (bool): Whether to show both expanded and short links.
+			pretty (bool): Whether to prettify the output.
+
+		Returns:
+			A generator over the lines for each window, each preceded by a
+			header and followed by an empty line if pretty is set.
+		"""
+		if not windows:
+			return
+		if self.mirror:
+			answers = self.answer_from_mirror(windows)
+		else:
+			answers = self.answer_from_api(windows)
+		for header, urls in answers:
+			urls = iter(urls)
+			# The header tells whether there are any links at all
+			first = list(itertools.islice(urls, 1))
 			if pretty:
-				header = self.last_header(time_point, urls)
-				lines.append(header)
-			for url in urls:
-				line = self.lineify(url, expanded, both, pretty)
-				lines.append(line)
+				yield header(first)
+			for url in itertools.chain(first, urls):
+				yield self.lineify(url, expanded, both, pretty)
 			if pretty:
-				lines.append('')
+				yield ''
+
+	def answer_from_api(self, windows):
+		"""
+		Fetches the links of time windows from the API, as a generator.
 
-		return lines
+		Rather than requesting each window separately (windows usually
+		overlap heavily), the union of all windows is requested once. Since
+		links arrive from newest to oldest, each window's links are yielded
+		as their pages arrive (see answer_window()), while all links are
+		also added to a lnk.timeline.Timeline, from which the links of later
+		windows that arrived meanwhile are answered by bisection. No further
+		pages are requested once all windows are complete.
+
+		Arguments:
+			windows (list): The time windows (see forever_windows()).
+
+		Returns:
+			A generator over a (<header>, <urls>) tuple for each window,
+			where <urls> is an iterator over the links of the window, which
+			must be exhausted before the next tuple is requested.
+		"""
+		# Without upper bounds, the links of each window are the newest of
+		# the union, so no more than the limit are needed (nor if there is
+		# only one window, which then is the union)
+		unbounded = all(before is None for _, _, before in windows)
+		limit = self.limit if unbounded or len(windows) == 1 else None
+		arriving = self.paginate(self.get_union(windows), limit)
+		timeline = lnk.timeline.Timeline()
+		for header, after, before in windows:
+			yield header, self.answer_window(after, before, timeline, arriving)
+
+	def answer_window(self, after, before, timeline, arriving):
+		"""
+		Yields the links of a time window, as they arrive.
+
+		The links of the window that arrived for earlier windows are taken
+		from the timeline first. Further links are then taken from those
+		arriving (and added to the timeline) until the window is complete,
+		i.e. as soon as a link older than its lower bound arrived, or as
+		soon as it holds as many links as the limit allows.
+
+		Arguments:
+			after (int|None): The lower bound of the window, or None.
+			before (int|None): The upper bound of the window, or None.
+			timeline (lnk.timeline.Timeline): The links arrived so far.
+			arriving (iterator): The links still to arrive, from newest
+								 to oldest (see paginate()).
+
+		Returns:
+			A generator over the History.Url records of the window, from
+			newest to oldest.
+		"""
+		known = timeline.between(after, before, self.limit)
+		for url in known:
+			yield url
+		count = len(known)
+		oldest = timeline.oldest()
+		while self.limit is None or count < self.limit:
+			if after is not None and oldest is not None and oldest < after:
+				return
+			url = next(arriving, None)
+			if url is None:
+				return
+			timeline.add([url])
+			oldest = url.created
+			if ((after is None or url.created >= after) and
+			   (before is None or url.created <= before)):
+				count += 1
+				yield url
+
+	def answer_from_mirror(self, windows):
+		"""
+		Answers time windows from the local mirror, as a generator.
+
+		The mirror is synchronized first, after which each window is a
+		query on its index.
+
+		Arguments:
+			windows (list): The time windows (see forever_windows()).
+
+		Returns:
+			A generator over a (<header>, <urls>) tuple for each window.
+		"""
+		self.synchronize()
+		for header, after, before in windows:
+			yield header, self.mirror.between(after, before, self.limit)
+
+	def synchronize(self):
+		"""
+		Adds all links created since the last synchronization to the mirror.
+
+		Only links created at or after the mirror's high-water mark are
+		requested (links created within the same second as the newest
+		mirrored one are requested again, since bit.ly's timestamps are
+		not precise enough to tell them apart).
+		"""
+		mark = self.mirror.mark()
+		parameters = {}
+		if mark is not None:
+			parameters['created_after'] = mark - 1
+		self.mirror.update(self.paginate(parameters))
+
+	@staticmethod
+	def get_union(windows):
+		"""
+		Returns the request parameters for the union of time windows.
+
+		Arguments:
+			windows (list): The time windows (see forever_windows()).
+
+		Returns:
+			Parameters selecting all links of all windows, as a dictionary.
+		"""
+		afters = [after for _, after, _ in windows]
+		befores = [before for _, _, before in windows]
+
+		return {
+			'created_after': None if None in afters else min(afters),
+			'created_before': None if None in befores else max(befores)
+		}
 
 	def ranges_header(self, after, before, urls):
 		"""
@@ -274,10 +498,11 @@ class History(Command):
 		Returns an output-ready line for a given url.
 
 		The line may include only the short url, only the long/expanded
-		url or both, depending on the parameters passed.
+		url or both, depending on the parameters passed. The expanded url
+		is part of the link-history, so no further request is necessary.
 
 		Arguments:
-			url (str): The short url.
+			url (History.Url): The url, as returned by request().
 			expanded (bool): Whether or not to show the expanded link.
 			both (bool): Whether or not to show both the short and the
 						 expanded link (takes precedence over 'expanded').
@@ -291,28 +516,107 @@ class History(Command):
 			in a formatted fashion (with color), else in plain format.
 		"""
 		if both:
-			expanded = self.link.get_long(url)
-			url = '{0} => {1}'.format(url, expanded)
+			line = '{0} => {1}'.format(url.short, url.long)
 		elif expanded:
-			url = self.link.get_long(url)
+			line = url.long
+		else:
+			line = url.short
 
 		if pretty:
-			url = self.list_item.format(url)
+			line = self.list_item.format(line)
 
-		return url
+		return line
 
 	def request(self, parameters=None):
 		"""
 		Requests the link-history from the bit.ly API.
 
+		All pages of the history are requested, up to the limit passed to
+		fetch() (if any).
+
 		Arguments:
 			parameters (dict): Parameters to pass along with the request 
 							   (like created_after/created_before).
 
 		Returns:
-			A list of links.
+			A list of History.Url records, each holding the short link,
+			the long url it expands to and its creation timestamp.
+		"""
+		return list(self.paginate(parameters, self.limit))
+
+	def paginate(self, parameters=None, limit=None):
+		"""
+		Requests the pages of the link-history, yielding links as they come.
+
+		The first page tells how many links there are in total, such that
+		all further pages (by offset) can be requested in parallel. Pages
+		are only requested as the links are consumed.
+
+		Arguments:
+			parameters (dict): Parameters to pass along with each request.
+			limit (int): Optionally, the maximum number of links to request.
+
+		Returns:
+			A generator over History.Url records, from newest to oldest.
+		"""
+		size = self.page_size if limit is None else min(self.page_size, limit)
+		first_page = self.request_page(0, size, parameters)
+		total = first_page.total
+		if limit is not None:
+			total = min(total, limit)
+
+		for url in first_page.urls[:total]:
+			yield url
+
+		# A short first page means there are no more links
+		if len(first_page.urls) < size:
+			return
+
+		offsets = range(len(first_page.urls), total, self.page_size)
+		pages = self.executor.imap(self.request_offset,
+								   offsets,
+								   (total, parameters))
+		for page in pages:
+			for url in page.urls:
+				yield url
+
+	def request_offset(self, offset, total, parameters=None):
+		"""
+		Requests the page at an offset, not exceeding a total number of links.
+
+		Arguments:
+			offset (int): The offset of the page.
+			total (int): The number of links wanted in total.
+			parameters (dict): Parameters to pass along with the request.
+
+		Returns:
+			The History.Page.
+		"""
+		size = min(self.page_size, total - offset)
+
+		return self.request_page(offset, size, parameters)
+
+	def request_page(self, offset, size, parameters=None):
+		"""
+		Requests one page of the link-history from the bit.ly API.
+
+		Arguments:
+			offset (int): The offset of the first link of the page.
+			size (int): The (maximum) number of links on the page.
+			parameters (dict): Parameters to pass along with the request
+							   (like created_after/created_before).
+
+		Returns:
+			A History.Page with the page's History.Url records and the total
+			number of links in the history (for the given parameters).
 		"""
+		parameters = dict(parameters or {})
+		parameters['offset'] = offset
+		parameters['limit'] = size
 		response = self.get(self.endpoints['history'], parameters)
 		response = self.verify(response, 'retrieve history')
 
-		return [i['link'] for i in response['link_history']]
+		urls = [History.Url(i['link'], i['long_url'], i['created_at'])
+				for i in response['link_history']]
+
+		return History.Page(urls, response.get('result_count', len(urls)))
@@ -9,19 +9,22 @@ import click
 import time
 
 import lnk.abstract
+import lnk.batch
 import lnk.beauty
 
 from lnk.bitly.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes an info command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to an
 						 Info instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Info constructor (e.g. 'failures').
 	"""
-	click.echo(Info().fetch(*args))
+	click.echo(Info(**kwargs).fetch(*args))
 
 class Info(Command):
 	"""
@@ -33,6 +36,9 @@ class Info(Command):
 	list can be put into a box for terminal output, or can be returned raw
 	for internal use (such as by the stats command). Note that the information
 	retrieved combines data from the /info and user/link_history endpoints.
+	On the asyncio backend, request() is called again until both of its
+	requests are answered, so it only modifies a copy of the information
+	of the /info endpoint (which may also come from a batch).
 
 	Note:
 		A 'bitlink' is a link shortened with bit.ly.
@@ -42,14 +48,27 @@ class Info(Command):
 					or as a string, in a box.
 		sets (dict): A complete dictionary of the available sets of information.
 		reverse (dict): A reverse mapping of the above-mentioned sets.
+		infos (lnk.batch.Batcher): The information from the /info endpoint,
+								   requested in batches for the urls.
 	"""
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, failures=None):
+		"""
+		Constructs a new Info command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Info, self).__init__('info')
 
 		self.raw = raw
+		self.failures = failures
 		self.sets = self.config['sets']
 		# Dictionary comprehensions don't work for Python < 2.7
 		self.reverse = dict((value, key) for (key, value) in self.sets.items())
+		self.infos = lnk.batch.Batcher(self.request_infos, Command.batch_size)
 
 	def fetch(self, only, hide, hide_empty, urls):
 		"""
@@ -71,17 +90,13 @@ class Info(Command):
 		"""
 		sets = lnk.abstract.filter_sets(self.sets, only, hide)
 
-		result = []
-		threads = []
-		for url in urls:
-			self.queue.put(url.strip())
-			t = self.new_thread(self.request, sets.values(), result, hide_empty)
-			threads.append(t)
-		self.join(threads)
+		urls = [url.strip() for url in urls]
+		self.prefetch(urls)
+		result = self.map(self.request, urls, sets.values(), hide_empty)
 
 		return result if self.raw else lnk.beauty.boxify(result)
 
-	def request(self, sets, result, hide_empty):
+	def request(self, url, sets, hide_empty):
 		"""
 		Requests all information about a url.
 
@@ -89,34 +104,40 @@ class Info(Command):
 		retrieved from the /info endpoint, and the data retrieved from the
 		/user/link_history endpoint. Both these sets of information are
 		retrieved here and combined into one set of information for a URL.
-		This method is run in a separate thread for each URL, and as such
-		uses a queue to get a URL and then appends the information to the
-		list supplied in the argument. This is done in a thread-safe, locked
-		way.
+		This method is run on the command's executor for each URL.
 
 		Arguments:
+			url (str): The bitlink to request information for.
 			sets (dict): The sets of information to include in the data.
-			result (list): The list of results for each URL, to which to
-						   append the data requested.
 			hide_empty(bool): Whether or not to hide empty things, passed on
 							  to lineify.
+
+		Returns:
+			The list of lines for the URL (see lineify()).
 		"""
-		url = self.queue.get()
 		data = self.request_info(url)
 		data.update(self.request_history(url))
 
 		selection = dict((key, data[key]) for key in data if key in sets)
-		lines = self.lineify(url, selection, hide_empty)
 
-		with self.lock:
-			result.append(lines)
+		return self.lineify(url, selection, hide_empty)
+
+	def prefetch(self, urls):
+		"""
+		Requests the /info part of the information for many urls at once,
+		with up to 'batch_size' urls per request.
+
+		Arguments:
+			urls (iterable): The bitlinks to request information for.
+		"""
+		self.infos.prefetch(urls, self.executor.map)
 
 	def request_info(self, url):
 		"""
 		Requests information for a url.
 
 		Requests the part of the information that can be fetched from the /info
-		endpoint.
+		endpoint, unless it was requested in a batch already (see prefetch()).
 
 		Arguments:
 			url (str): The bitlink to request information for.
@@ -124,6 +145,10 @@ class Info(Command):
 		Returns:
 			The information for the bitlink supplied.
 		"""
+		data = self.infos.get(url)
+		if data is not None:
+			# A copy, since request() adds to it
+			return dict(data)
 		response = self.get(self.endpoints['info'], dict(shortUrl=url))
 		response = self.verify(response,
 							   "retrieve information for '{0}'".format(url),
@@ -131,6 +156,29 @@ class Info(Command):
 
 		return response
 
+	def request_infos(self, urls):
+		"""
+		Requests information for many urls at once.
+
+		The /info endpoint answers for every 'shortUrl' parameter of a
+		request (up to 'batch_size'). Urls the API answered with an error
+		are left out.
+
+		Arguments:
+			urls (list): The bitlinks to request information for.
+
+		Returns:
+			A dictionary mapping each url to its information.
+		"""
+		response = self.get(self.endpoints['info'], dict(shortUrl=urls))
+		response = self.verify(response, 'retrieve information for urls')
+		found = {}
+		for entry in response['info']:
+			if 'error' not in entry and entry.get('short_url') in urls:
+				found[entry['short_url']] = entry
+
+		return found
+
 	def request_history(self, url):
 		"""
 		Requests more information for a url.
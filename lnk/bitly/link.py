@@ -8,27 +8,49 @@ import ecstasy
 import pyperclip
 import re
 
+import lnk.batch
 import lnk.beauty
+import lnk.cache
+import lnk.config
 import lnk.errors
 
 from lnk.bitly.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a link command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to an
 						 Link instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
 	"""
-	click.echo(Link().fetch(*args))
+	click.echo(Link(**kwargs).fetch(*args))
+
+def stream(*args, **kwargs):
+	"""
+	Executes a link command in streaming mode, echoing lines as they come.
+
+	Arguments:
+		args (variadic): The arguments to pass to a
+						 Link instance's stream() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
+	"""
+	for line in Link(**kwargs).stream(*args):
+		click.echo(line)
 
 class Link(Command):
 	"""
 	Class to shorten or expand a url using bit.ly.
 
 	This class can shorten a long url to a shortened bit.ly url,
-	or expand a shortened bit.ly url to its original long url.
+	or expand a shortened bit.ly url to its original long url. On the
+	asyncio backend, shorten() and expand() are called again until their
+	request is answered, so they copy urls and store them in the caches
+	only afterwards. Warnings about prepended protocols are issued by
+	prepend(), before the urls are submitted.
 
 	Attributes:
 		raw (bool): Whether to prettify the output or
@@ -38,12 +60,43 @@ class Link(Command):
 							   is copied.
 		http (regex): A compiled regular-expression object matching a
 					  HTTP(S) protocol, for URL-checking.
+		shortened (lnk.cache.Cache|None): The persistent cache of short urls
+										  for long urls, if enabled.
+		expanded (lnk.cache.Cache|None): The persistent cache of long urls
+										 for short urls, if enabled.
+		expansions (lnk.batch.Batcher): The long urls requested in batches
+										for the short urls to expand.
 	"""
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, cache=None, failures=None):
+		"""
+		Constructs a new Link command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			cache (bool): Whether to look up (and store) short and long urls
+						  in the persistent caches. Defaults to the 'cache'
+						  setting of lnk.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Link, self).__init__('link')
 		self.raw = raw
+		self.failures = failures
 		self.already_copied = False
 		self.http = re.compile(r'https?://')
+		if cache is None:
+			cache = lnk.config.get('lnk', 'settings')['cache']
+		self.shortened = None
+		self.expanded = None
+		if cache:
+			account = lnk.cache.account(self.parameters['access_token'])
+			namespace = 'bitly/shorten/{0}'.format(account)
+			self.shortened = lnk.cache.Cache.shared(namespace)
+			# What a short url expands to is the same for every account
+			self.expanded = lnk.cache.Cache.shared('bitly/expand')
+		self.expansions = lnk.batch.Batcher(self.request_expansions,
+											Command.batch_size)
 
 	def fetch(self, copy, quiet, expand, shorten, pretty):
 		"""
@@ -86,17 +139,57 @@ class Link(Command):
 		Returns:
 			A list of lines for output.
 		"""
-		lines = []
-		threads = []
-		for url in urls:
-			if not self.http.match(url):
-				url = 'http://{0}'.format(url)
-				if not quiet:
-					lnk.errors.warn("Prepending 'http://' to '{0}'".format(url))
-			self.queue.put(url)
-			threads.append(self.new_thread(self.shorten, lines, copy))
-		self.join(threads)
-		return lines
+		prepended = [self.prepend(url, quiet) for url in urls]
+
+		return self.map(self.shorten, prepended, copy)
+
+	def stream(self, copy, quiet, urls, ordered=True):
+		"""
+		Shortens urls as they are read, yielding each line once it is ready.
+
+		Unlike fetch(), this method does not collect all results before
+		returning, but consumes the urls lazily and yields their lines as
+		soon as they were shortened, with only a bounded number of requests
+		in flight. It is thus suited for very large inputs, e.g. piped from
+		stdin, for which nothing would be output until the very end otherwise.
+
+		Arguments:
+			copy (bool): Whether or not to copy the first url to the clipboard.
+			quiet (bool): Whether or not to swallow warnings about urls
+						  having to be modified because they do not have
+						  a protocol specified (i.e. no 'http://').
+			urls (iterable): The long urls to shorten (e.g. an open file).
+							 Surrounding whitespace and blank lines are
+							 ignored.
+			ordered (bool): Whether to yield the lines in the order of the
+							urls or in the order in which they finish.
+
+		Returns:
+			A generator over lines of the schema '<url> => <short>'.
+		"""
+		self.already_copied = False
+		urls = (self.prepend(url.strip(), quiet) for url in urls if url.strip())
+
+		return self.imap(self.shorten, urls, (copy,), ordered)
+
+	def prepend(self, url, quiet):
+		"""
+		Prepends the HTTP protocol to a url if it has none.
+
+		Arguments:
+			url (str): The url to check.
+			quiet (bool): Whether or not to swallow the warning issued
+						  when the url has to be modified.
+
+		Returns:
+			The url, starting with a protocol.
+		"""
+		if not self.http.match(url):
+			url = 'http://{0}'.format(url)
+			if not quiet:
+				lnk.errors.warn("Prepending 'http://' to '{0}'".format(url))
+
+		return url
 
 	def expand_urls(self, copy, urls):
 		"""
@@ -109,85 +202,134 @@ class Link(Command):
 		Returns:
 			A list of lines for output.
 		"""
-		lines = []
-		threads = []
-		for url in urls:
-			self.queue.put(url)
-			threads.append(self.new_thread(self.expand, lines, copy))
-		self.join(threads)
+		# Up to 'batch_size' urls are expanded per request
+		known = self.expanded.get if self.expanded else None
+		self.expansions.prefetch(urls, self.executor.map, known)
 
-		return lines
+		return self.map(self.expand, urls, copy)
 
-	def shorten(self, lines, copy):
+	def shorten(self, url, copy):
 		"""
-		Requests a shortend link and appends it to a given list.
+		Requests a shortend link and returns a line for it.
 
 		A shortened link is retrieved via get_short(), then (possibly)
-		copied to the clipboard via copy(), then appended to the given
-		list in a thread-safe (locked) way.
+		copied to the clipboard via copy(). This method is run on the
+		command's executor for each url.
 
 		Arguments:
-			lines (list): The list of lines to append the url to.
+			url (str): The long url to shorten.
 			copy (bool): Whether or not to copy the link to the clipboard
 						 (if no other link has already been copied).
+
+		Returns:
+			A line of the schema '<url> => <short>'.
 		"""
-		url = self.queue.get()
 		short = self.get_short(url)
 		formatted = self.copy(copy, short)
-		with self.lock:
-			lines.append('{0} => {1}'.format(url, formatted))
 
-	def expand(self, lines, copy):
+		return '{0} => {1}'.format(url, formatted)
+
+	def expand(self, url, copy):
 		"""
-		Requests an expanded link and appends it to a given list.
+		Requests an expanded link and returns a line for it.
 
 		An expanded link is retrieved via get_long(), then (possibly)
-		copied to the clipboard via copy(), then appended to the given
-		list in a thread-safe (locked) way.
+		copied to the clipboard via copy(). This method is run on the
+		command's executor for each url.
 
 		Arguments:
-			lines (list): The list of lines to append the url to.
+			url (str): The short url to expand.
 			copy (bool): Whether or not to copy the link to the clipboard
 						 (if no other link has already been copied).
+
+		Returns:
+			A line of the schema '<url> => <expanded>'.
 		"""
-		url = self.queue.get()
 		expanded = self.get_long(url)
 		formatted = self.copy(copy, expanded)
-		with self.lock:
-			lines.append('{0} => {1}'.format(url, formatted))
+
+		return '{0} => {1}'.format(url, formatted)
 
 	def get_short(self, url):
 		"""
 		Requests and returns a short url for a long one.
 
+		The url is first looked up in the cache (if enabled), such that urls
+		shortened before are not requested again.
+
 		Arguments:
 			url (str): The long url to shorten.
 
 		Returns:
 			The shortened link.
 		"""
+		if self.shortened:
+			short = self.shortened.get(url)
+			if short is not None:
+				return short
 		response = self.get(self.endpoints['shorten'], dict(longUrl=url))
 		response = self.verify(response, "shorten url '{0}'".format(url))
-		
+		if self.shortened:
+			self.shortened.put(url, response['url'])
+
 		return response['url']
 
 	def get_long(self, url):
 		"""
 		Requests and returns an expanded url for a short one.
 
+		If the cache is enabled, short urls expanded before are not
+		requested again (a bitlink always expands to the same url). Neither
+		are urls expanded in a batch already (see expand_urls()).
+
 		Arguments:
 			url (str): The short bit.ly link (bitlink) to expand.
 
 		Returns:
 			The expanded link.
 		"""
+		expanded = self.expansions.get(url)
+		if expanded is not None:
+			return expanded
+		if self.expanded:
+			expanded = self.expanded.get(url)
+			if expanded is not None:
+				return expanded
 		response = self.get(self.endpoints['expand'], dict(shortUrl=url))
 		response = self.verify(response,
 							   "expand url '{0}'".format(url),
 							   'expand')
+		if self.expanded:
+			self.expanded.put(url, response['long_url'])
 
 		return response['long_url']
 
+	def request_expansions(self, urls):
+		"""
+		Requests the expanded urls for many short urls at once.
+
+		The bit.ly API expands every 'shortUrl' parameter of a request
+		(up to 'batch_size'). Expanded urls are stored in the cache (if
+		enabled), while urls the API answered with an error are left out.
+
+		Arguments:
+			urls (list): The short bit.ly links (bitlinks) to expand.
+
+		Returns:
+			A dictionary mapping each short url that could be expanded to
+			its expanded url.
+		"""
+		response = self.get(self.endpoints['expand'], dict(shortUrl=urls))
+		response = self.verify(response, 'expand urls')
+		found = {}
+		for entry in response['expand']:
+			if 'error' not in entry and entry.get('short_url') in urls:
+				found[entry['short_url']] = entry['long_url']
+		if self.expanded:
+			self.expanded.update(found.items())
+
+		return found
+
 	def copy(self, copy, url):
 		"""
 		Copies a url to the clipboard if possible.
@@ -208,9 +350,11 @@ class Link(Command):
 			to fetch(), else the url, formatted with ecstasy to appear bold
 			in the terminal.
 		"""
-		if copy and not self.already_copied:
+		with self.lock:
+			if not copy or self.already_copied:
+				return url
 			self.already_copied = True
-			pyperclip.copy(url)
-			url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
+		pyperclip.copy(url)
+		url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
 
 		return url
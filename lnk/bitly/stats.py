@@ -19,15 +19,17 @@ import lnk.errors
 
 from lnk.bitly.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a stats command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to a
 						 Stats instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Stats constructor (e.g. 'failures').
 	"""
-	click.echo(Stats().fetch(*args))
+	click.echo(Stats(**kwargs).fetch(*args))
 
 class Stats(Command):
 	"""
@@ -42,7 +44,9 @@ class Stats(Command):
 	the 'info' command, thereby making the stats command the ultimate
 	destination for link statistics *and* information. Output may, as always,
 	be in raw format for internal use or in a pretty box. Multiple URLs are
-	fully supported.
+	fully supported. Only request(), which has no side-effects, runs on the
+	executor (the asyncio backend calls it again until it is answered), as
+	all requests are submitted by fetch() itself.
 
 	Attributes:
 		raw (bool): Whether to return the output in raw format for internal use,
@@ -53,10 +57,22 @@ class Stats(Command):
 
 	Timespan = namedtuple('Timespan', ['span', 'unit'])
 
-	def __init__(self, raw=False):
+	Request = namedtuple('Request', ['url', 'endpoint', 'timespan'])
+
+	def __init__(self, raw=False, failures=None):
+		"""
+		Constructs a new Stats command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Stats, self).__init__('stats')
 
 		self.raw = raw
+		self.failures = failures
 		self.info = lnk.bitly.info.Info(raw=True)
 		self.parameters['timezone'] = time.tzname[0]
 
@@ -89,22 +105,54 @@ class Stats(Command):
 
 		sets = lnk.abstract.filter_sets(self.sets, only, hide)
 		timespans = self.get_timespans(times, forever)
+
+		# All requests, for all urls, are submitted up-front as one batch,
+		# such that the executor (and thus the concurrency limit) is shared
+		# by every url rather than urls being processed one after another.
+		# Additional info is fetched concurrently on the info command's own
+		# executor, overlapping with the statistics requests (its requests
+		# to the /info endpoint are batched for all urls, see Info.prefetch()).
+		batch = [self.submit_stats(url, timespans, sets) for url in urls]
 		info = []
 		if add_info:
-			info = self.info.fetch([], [], False, urls)
-			if not info:
-				raise lnk.errors.InternalError('Could not fetch additional info.')
+			self.info.prefetch([url.strip() for url in urls])
+			info = [self.submit_info(url) for url in urls]
 
+		# In partial mode, a url whose requests failed is left out
+		assemble = self.tolerate(self.assemble)
 		results = []
 		for n, url in enumerate(urls):
-			header = info[n] if add_info else ['URL: {0}'.format(url)]
-			data = self.get_stats(url, timespans, sets)
-			lines = self.lineify(data, full)
-
-			results.append(header + lines)
+			lines = assemble(url, batch[n], info[n] if add_info else None, full)
+			if lines is not lnk.abstract.AbstractCommand.failed:
+				results.append(lines)
 
 		return results if self.raw else lnk.beauty.boxify(results)
 
+	def assemble(self, url, tasks, info, full):
+		"""
+		Waits for the requests submitted for a url and returns its lines.
+
+		Arguments:
+			url (str): The url.
+			tasks (dict): The tasks returned by submit_stats() for the url.
+			info (lnk.executor.Task|None): The task returned by submit_info()
+										   for the url, if information was
+										   requested too.
+			full (bool): Whether to show full country names, or short ISO
+						 abbreviations.
+
+		Returns:
+			The list of lines for the url, headed by its information (or
+			only the url, if no information was requested).
+		"""
+		if info is None:
+			header = ['URL: {0}'.format(url)]
+		else:
+			header = info.result()
+		data = self.collect(tasks)
+
+		return header + self.lineify(data, full)
+
 	def get_stats(self, url, timespans, sets):
 		"""
 		Retrieves the statistics for a single url.
@@ -113,9 +161,8 @@ class Stats(Command):
 		according to the sets of statistics wanted.
 
 		Note:
-			This method works with threads. For each category and each
-			timespan, a new request must be made. Each request is made
-			in a separate thread.
+			For each category and each timespan, a new request must be made.
+			All requests are run concurrently on the command's executor.
 
 		Arguments:
 			url (str): The relevant URL to fetch statistics for.
@@ -138,53 +185,112 @@ class Stats(Command):
 			data-point. A data-point also has another key, which depends on the
 			category, e.g. 'country' for the 'countries' category.
 		"""
-		parameters = {'link': url}
-		result = {}
-		threads = []
+		return self.collect(self.submit_stats(url, timespans, sets))
+
+	def submit_stats(self, url, timespans, sets):
+		"""
+		Submits the requests for a url's statistics to the executor.
+
+		One request is submitted for each combination of set and timespan.
+
+		Arguments:
+			url (str): The relevant URL to fetch statistics for.
+			timespans (tuple): The Timespans to fetch statistics for.
+			sets (tuple): The sets of statistics wanted.
+
+		Returns:
+			A dictionary mapping each set to its list of tasks (one per
+			timespan), to be passed to collect().
+		"""
+		tasks = {}
 		for endpoint in sets:
-			result[endpoint] = []
+			tasks[endpoint] = []
 			for timespan in timespans:
+				spec = Stats.Request(url, endpoint, timespan)
+				tasks[endpoint].append(self.executor.submit(self.request, spec))
 
-				parameters['unit'] = timespan.unit
+		return tasks
 
-				if timespan.unit.endswith('s'):
-					# Get rid of the plural s in e.g. 'weeks'
-					parameters['unit'] = timespan.unit[:-1]
+	@staticmethod
+	def collect(tasks):
+		"""
+		Waits for submitted statistics requests and groups their results.
 
-				parameters['units'] = timespan.span
+		Arguments:
+			tasks (dict): The tasks returned by submit_stats().
 
-				self.queue.put((url, endpoint, timespan, parameters))
-				threads.append(self.new_thread(self.request, result))
-		self.join(threads)
+		Returns:
+			The statistics, in the format described for get_stats().
+		"""
+		result = {}
+		for endpoint, pending in tasks.items():
+			result[endpoint] = [task.result() for task in pending]
 
 		return result
 
-	def request(self, results):
+	def submit_info(self, url):
 		"""
-		Requests statistics for a given configuration.
+		Submits the request for additional information about a url.
 
-		The URL, endpoint (set/category) and timespan are all fetched from
-		a queue, because this method is always run in a separate thread for
-		each configuration of the above parameters. The dictionary to which
-		to insert the data must be passed as an argument. The data is
-		inserted in a thread-safe, locked way.
+		The request is run on the executor of the info command, not on
+		the stats command's own, such that it neither competes with nor
+		waits for the statistics requests.
 
 		Arguments:
-			results (dict): The results dictionary for the URL, to which to
-							insert the retrieved statistics.
+			url (str): The bitlink to request information for.
+
+		Returns:
+			The task, whose result is the list of lines of information.
 		"""
-		url, endpoint, timespan, parameters = self.queue.get()
+		return self.info.executor.submit(self.info.request,
+										 url.strip(),
+										 self.info.sets.values(),
+										 False)
+
+	def request(self, spec):
+		"""
+		Requests statistics for a given configuration.
+
+		This method is run on the command's executor for each configuration
+		of URL, endpoint (set/category) and timespan. Since the configuration
+		is an immutable Request and the parameters of the HTTP request are
+		built from it here, nothing is shared between concurrent requests.
 
-		response = self.get(self.endpoints[endpoint], parameters)
-		what = "retrieve {0} for '{1}'".format(endpoint, url)
+		Arguments:
+			spec (Stats.Request): The URL, endpoint and timespan to
+								  request statistics for.
+
+		Returns:
+			A dictionary with a 'timespan' key for the timespan and a 'data'
+			key for the statistics retrieved.
+		"""
+		response = self.get(self.endpoints[spec.endpoint],
+							self.get_parameters(spec))
+		what = "retrieve {0} for '{1}'".format(spec.endpoint, spec.url)
 		response = self.verify(response, what)
 
 		# For 'clicks' the key has a different name than the endpoint
-		e = endpoint if endpoint != 'clicks' else 'link_clicks'
-		data = {'timespan': timespan, 'data': response[e]}
+		e = spec.endpoint if spec.endpoint != 'clicks' else 'link_clicks'
+
+		return {'timespan': spec.timespan, 'data': response[e]}
+
+	@staticmethod
+	def get_parameters(spec):
+		"""
+		Returns the parameters of the HTTP request for a Request.
+
+		Arguments:
+			spec (Stats.Request): The configuration of the request.
+
+		Returns:
+			A new dictionary of parameters.
+		"""
+		unit = spec.timespan.unit
+		if unit.endswith('s'):
+			# Get rid of the plural s in e.g. 'weeks'
+			unit = unit[:-1]
 
-		with self.lock:
-			results[endpoint].append(data)
+		return {'link': spec.url, 'unit': unit, 'units': spec.timespan.span}
 
 	def get_timespans(self, times, forever):
 		"""
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""A persistent (SQLite) cache of the results of API requests."""
+
+import click
+import collections
+import ecstasy
+import hashlib
+import os.path
+import sqlite3
+import threading
+import time
+
+import lnk.config
+import lnk.executor
+
+def account(secret):
+	"""
+	Returns a name for an account, to keep the caches of accounts apart.
+
+	The name is derived from a secret of the account (such as its access
+	token), which is not stored itself.
+
+	Arguments:
+		secret (str): The secret, or None if there is no account.
+
+	Returns:
+		A short hexadecimal digest of the secret, or 'anonymous'.
+	"""
+	if not secret:
+		return 'anonymous'
+
+	return hashlib.sha1(secret.encode('utf-8')).hexdigest()[:16]
+
+def statistics():
+	"""
+	Returns the hit/miss counters of all shared caches, for monitoring.
+
+	Returns:
+		A dictionary mapping the namespace of each cache returned by
+		Cache.shared() (so far) to its Cache.Statistics.
+	"""
+	with Cache.caches_lock:
+		caches = list(Cache.caches.values())
+	statistics = {}
+	for cache in caches:
+		statistics[cache.namespace] = cache.statistics()
+
+	return statistics
+
+def report():
+	"""
+	Outputs the hit/miss counters of all shared caches that were used
+	(to stderr, so as not to mix with the output of commands).
+	"""
+	# Only the label is styled, as ecstasy would parse the namespaces
+	label = ecstasy.beautify('<Cache>', ecstasy.Color.Yellow)
+	for namespace, counters in sorted(statistics().items()):
+		if not counters.hits and not counters.misses:
+			continue
+		what = '{0}: {1.hits} hits and {1.misses} misses in {2}'
+		click.echo(what.format(label, counters, namespace), err=True)
+
+class Cache(object):
+	"""
+	A bounded, persistent mapping, kept in an SQLite database.
+
+	Caches are used to remember the results of requests whose result does
+	not change when repeated (e.g. the short url for a long url), such that
+	they need not be repeated, neither within one command nor across many.
+	All caches share one database file, but each keeps its entries in its
+	own namespace (e.g. per service, request and account). When a
+	namespace holds more entries than its size allows, the least recently
+	used entries are evicted.
+
+	The database may be used by several lnk processes at once (SQLite locks
+	the file while writing, and the connection waits for such locks).
+	Within a process, the connection is shared by all threads under a lock.
+	The most recently used entries are also kept in memory, such that
+	repeated lookups within a process need no query at all (their use is
+	only written to the database with the next write). Commands should
+	use the process-wide cache for a namespace (see shared()), such that
+	all commands of a service share these entries.
+
+	Attributes:
+		namespace (str): The namespace of the cache's entries.
+		path (str): The path to the database file.
+		size (int): The maximum number of entries in the namespace.
+		connection (sqlite3.Connection): The connection to the database.
+		lock (threading.Lock): The lock under which the connection (and the
+							   in-memory entries) are used.
+		memory (collections.OrderedDict): The entries kept in memory, from
+										  least to most recently used.
+		touched (dict): The times at which entries were last used in memory,
+						not yet written to the database.
+		hits (int): The number of lookups that found their key.
+		misses (int): The number of lookups that did not.
+		memory_size (int): Class-attribute holding the maximum number of
+						   entries kept in memory.
+		Statistics (namedtuple): Class-attribute namedtuple holding the
+								 number of hits and misses of a cache.
+	"""
+
+	Statistics = collections.namedtuple('Statistics', ['hits', 'misses'])
+
+	caches = {}
+	caches_lock = threading.Lock()
+
+	memory_size = 1024
+
+	# Write-ahead logging lets other processes read while one writes,
+	# and (with synchronous = NORMAL) commits need not wait for the disk
+	schema = '''
+		PRAGMA journal_mode = WAL;
+		PRAGMA synchronous = NORMAL;
+		CREATE TABLE IF NOT EXISTS entries (
+			namespace TEXT NOT NULL,
+			key TEXT NOT NULL,
+			value TEXT NOT NULL,
+			used REAL NOT NULL,
+			PRIMARY KEY (namespace, key)
+		);
+		CREATE INDEX IF NOT EXISTS entries_used ON entries (namespace, used);
+	'''
+
+	def __init__(self, namespace, path=None, size=None):
+		"""
+		Opens (and, if necessary, creates) a cache.
+
+		Arguments:
+			namespace (str): The namespace of the cache's entries.
+			path (str): Optionally, the path to the database file. The one
+						at lnk/config/.cache will be chosen by default.
+			size (int): Optionally, the maximum number of entries. Defaults
+						to the 'cache-size' setting of lnk.
+		"""
+		self.namespace = namespace
+		self.path = path or os.path.join(lnk.config.CONFIG_PATH, '.cache')
+		if size is None:
+			size = lnk.config.get('lnk', 'settings')['cache-size']
+		# Settings may hold numbers as strings (e.g. set via 'lnk config')
+		self.size = int(size)
+		self.connection = sqlite3.connect(self.path,
+										  timeout=30,
+										  check_same_thread=False)
+		self.lock = threading.Lock()
+		self.memory = collections.OrderedDict()
+		self.touched = {}
+		self.hits = 0
+		self.misses = 0
+		with self.lock, self.connection:
+			self.connection.executescript(Cache.schema)
+
+	@classmethod
+	def shared(cls, namespace, path=None, size=None):
+		"""
+		Returns the process-wide cache for a namespace.
+
+		Arguments:
+			namespace (str): The namespace of the cache's entries.
+			path (str): Optionally, the path to the database file.
+			size (int): Optionally, the maximum number of entries (only used
+						when the cache is opened by this call).
+
+		Returns:
+			The one Cache instance for the namespace and (absolute) path.
+		"""
+		path = os.path.abspath(path or
+							   os.path.join(lnk.config.CONFIG_PATH, '.cache'))
+		with cls.caches_lock:
+			if (namespace, path) not in cls.caches:
+				cls.caches[(namespace, path)] = cls(namespace, path, size)
+
+		return cls.caches[(namespace, path)]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def get(self, key):
+		"""
+		Looks up the value for a key (and marks it as recently used).
+
+		Arguments:
+			key (str): The key.
+
+		Returns:
+			The value, or None if the key is not cached.
+		"""
+		# Lookups repeated by calls replayed on the asyncio backend count once
+		counted = int(lnk.executor.first((self.namespace, key)))
+		with self.lock:
+			if key in self.memory:
+				self.hits += counted
+				value = self.memory.pop(key)
+				self.memory[key] = value
+				self.touched[key] = time.time()
+				return value
+			with self.connection:
+				row = self.connection.execute('SELECT value FROM entries '
+											  'WHERE namespace = ? AND key = ?',
+											  (self.namespace, key)).fetchone()
+				if row is None:
+					self.misses += counted
+					return None
+				self.connection.execute('UPDATE entries SET used = ? '
+										'WHERE namespace = ? AND key = ?',
+										(time.time(), self.namespace, key))
+			self.hits += counted
+			self.remember(key, row[0])
+
+		return row[0]
+
+	def put(self, key, value):
+		"""
+		Stores the value for a key, evicting the least recently used entries
+		if the namespace is full.
+
+		Arguments:
+			key (str): The key.
+			value (str): The value.
+		"""
+		self.update([(key, value)])
+
+	def update(self, items):
+		"""
+		Stores many values at once (in one transaction).
+
+		Arguments:
+			items (iterable): The (<key>, <value>) pairs to store.
+		"""
+		items = list(items)
+		if not items:
+			return
+		with self.lock:
+			with self.connection:
+				self.flush()
+				now = time.time()
+				rows = [(self.namespace, key, value, now) for key, value in items]
+				self.connection.executemany('INSERT OR REPLACE INTO entries '
+											'VALUES (?, ?, ?, ?)', rows)
+				self.connection.execute('DELETE FROM entries '
+										'WHERE namespace = ? AND key IN ('
+										'SELECT key FROM entries '
+										'WHERE namespace = ? '
+										'ORDER BY used DESC '
+										'LIMIT -1 OFFSET ?)',
+										(self.namespace,
+										 self.namespace,
+										 self.size))
+			for key, value in items[-Cache.memory_size:]:
+				self.remember(key, value)
+
+	def flush(self):
+		"""
+		Writes the uses of entries found in memory to the database, such that
+		the least recently used entries are evicted. Must be called under the
+		lock (and within a transaction).
+		"""
+		if self.touched:
+			self.connection.executemany('UPDATE entries SET used = ? '
+										'WHERE namespace = ? AND key = ?',
+										[(used, self.namespace, key) for key, used
+										 in self.touched.items()])
+			self.touched.clear()
+
+	def remember(self, key, value):
+		"""
+		Keeps an entry in memory, forgetting the least recently used one
+		if there are too many (never more than the database keeps). Must be
+		called under the lock.
+
+		Arguments:
+			key (str): The key.
+			value (str): The value.
+		"""
+		self.memory.pop(key, None)
+		self.memory[key] = value
+		if len(self.memory) > min(Cache.memory_size, self.size):
+			self.memory.popitem(last=False)
+
+	def statistics(self):
+		"""Returns the numbers of hits and misses as Cache.Statistics."""
+		with self.lock:
+			return Cache.Statistics(self.hits, self.misses)
+
+	def clear(self):
+		"""Removes all entries of the namespace."""
+		with self.lock, self.connection:
+			self.connection.execute('DELETE FROM entries WHERE namespace = ?',
+									(self.namespace,))
+			self.memory.clear()
+			self.touched.clear()
+
+	def close(self):
+		"""Closes the connection to the database."""
+		with self.lock:
+			if self.touched:
+				with self.connection:
+					self.flush()
+			self.connection.close()
@@ -9,6 +9,7 @@ import sys
 
 import lnk.config
 import lnk.errors
+import lnk.retry
 
 class Main(click.MultiCommand):
 	"""
@@ -23,11 +24,14 @@ class Main(click.MultiCommand):
 	extract the necessary functions so that click can execute each
 	subcommand as if it lived in this file. It also handles argument
 	forwarding and some string-handling (e..g so that googl and goo.gl both
-	mean the same thing from the CLI). Its all a bit of a hack.
+	mean the same thing from the CLI). Its all a bit of a hack. Commands are
+	only loaded once they are requested, such that only the modules (and
+	third-party libraries) of the service actually invoked are imported.
 
 	Attributes:
-		commands (dict): A mapping between the names of commands and their
-						 respective functions.
+		names (list): The names of all available commands.
+		commands (dict): A mapping between the names of the commands loaded
+						 so far and their respective functions.
 		default (str): The name of the default service (e.g. 'bitly').
 	"""
 	def __init__(self):
@@ -36,9 +40,9 @@ class Main(click.MultiCommand):
 		self.commands = {}
 		with lnk.config.Manager('lnk') as manager:
 			self.default = manager['settings']['service']
-			for command in manager['services'] + ['config']:
-				command = command.replace('.', '') # goo.gl -> googl
-				self.commands[command] = self.get_function(command)
+			services = manager['services'] + ['config']
+			# goo.gl -> googl
+			self.names = [command.replace('.', '') for command in services]
 
 	def format_usage(self, context, *args):
 		# Hack to make the main script's name
@@ -57,7 +61,7 @@ class Main(click.MultiCommand):
 		goo.gl and gool).
 		"""
 		escaped = context.args[0].replace('.', '')
-		if escaped not in self.commands.keys():
+		if escaped not in self.names:
 			context.args.insert(0, self.default.replace('.', ''))
 		else:
 			context.args[0] = escaped
@@ -65,11 +69,11 @@ class Main(click.MultiCommand):
 
 	def list_commands(self, context):
 		"""Returns the names of all available subcommands."""
-		return self.commands.keys()
+		return self.names
 
 	def get_command(self, context, name):
-		"""Returns the function for a given subcommand-name."""
-		if name not in self.commands:
+		"""Returns the function for a given subcommand-name, loading it once."""
+		if name not in self.names:
 			clue = lnk.errors.Message('Did you mess up the default settings?',
 									  level=0)
 			try_message = lnk.errors.Message("See what 'lnk config -k service'"
@@ -77,6 +81,9 @@ class Main(click.MultiCommand):
 			raise lnk.errors.UsageError('Invalid default service.',
 										Clue=clue,
 										Try=try_message)
+		if name not in self.commands:
+			self.commands[name] = self.get_function(name)
+
 		return self.commands[name]
 
 	@staticmethod
@@ -100,11 +107,15 @@ class Main(click.MultiCommand):
 
 		return namespace['main']
 
+# The verbosity of the command run, once resolved (see get_verbosity())
+verbosity = 0
+
 def get_verbosity(count, level):
 	"""
 	Returns the appropriate verbosity level.
 
-	Defined here for use by all cli modules (e.g. bitly.cli).
+	Defined here for use by all cli modules (e.g. bitly.cli). The level
+	is also remembered as the module's 'verbosity', for main().
 
 	Arguments:
 		count (int): The verbosity count (from the -vvv flags).
@@ -114,29 +125,101 @@ def get_verbosity(count, level):
 		The default verbosity if both count and level are zero, else
 		the level and only if the level is also zero, the count.
 	"""
+	global verbosity
 	if count == 0 and not level:
-		return lnk.config.get('lnk', 'settings')['verbosity']
+		verbosity = lnk.config.get('lnk', 'settings')['verbosity']
 	elif level:
-		return level
-	return count
+		verbosity = level
+	else:
+		verbosity = count
+
+	return verbosity
+
+def parse(command, args):
+	"""
+	Parses command-line arguments with the parser of a click command.
+
+	The command is not invoked and no values are converted (e.g. no files
+	are opened), such that this can be done ahead of invoking it.
+
+	Arguments:
+		command (click.Command): The command.
+		args (list): The command-line arguments for the command.
+
+	Returns:
+		A dictionary of the raw values of the options and arguments given,
+		by their names.
+	"""
+	context = click.Context(command, **command.context_settings)
+	options, _, _ = command.make_parser(context).parse_args(list(args))
+
+	return options
+
+def streams(main, args):
+	"""
+	Returns whether the command-line arguments request streaming input.
+
+	When urls are streamed (via the --input option of link commands),
+	stdin must not be read up-front, since the command reads it lazily.
+	The arguments are parsed as click will parse them (see parse()), with
+	the options of the actual commands, such that combined short flags
+	(e.g. '-qi'), values given with '=' and other commands' options with
+	the same flag (e.g. '-i' for --info of stats commands) are told apart.
+
+	Arguments:
+		main (Main): The main command-group.
+		args (list): The command-line arguments.
+
+	Returns:
+		True if the arguments give the invoked command a source to stream
+		urls from (its -i/--input option), else False.
+	"""
+	args = list(args)
+	service = main.default.replace('.', '')
+	if args and args[0].replace('.', '') in main.names:
+		service = args.pop(0).replace('.', '')
+	if service == 'config':
+		return False
+	group = main.get_command(None, service)
+	with lnk.config.Manager(service) as manager:
+		name = manager['settings']['command']
+	try:
+		# The options of the service's main(), then the command's
+		args = parse(group, args).get('args')
+		args = list(args) if isinstance(args, (list, tuple)) else []
+		if args and args[0] in group.commands:
+			name = args.pop(0)
+		options = parse(group.commands[name], args)
+	except (click.ClickException, KeyError):
+		# Reported once the command is actually invoked
+		return False
+
+	return 'source' in options
 
 def main():
 	"""
 	Insantiates a Main object and executes it.
 
 	The 'standalone_mode' is so that click doesn't handle usage-exceptions
-	itself, but bubbles them up.
+	itself, but bubbles them up. Requests that had to be retried (if any)
+	are reported at the end of the run, as are the hits and misses of the
+	caches used (only with verbose output).
 
 	Arguments:
 		args (tuple): The command-line arguments.
 	"""
 	args = sys.argv[1:]
-	# If stdin is not empty (being piped to)
-	if not sys.stdin.isatty():
-		args += sys.stdin.readlines()
 	command = Main()
+	# If stdin is not empty (being piped to) and not streamed by the command
+	if not sys.stdin.isatty() and not streams(command, args):
+		args += sys.stdin.readlines()
 	catch = lnk.errors.Catch(1)
 	catch.catch(command.main, args, standalone_mode=False)
+	lnk.retry.report()
+	# Not imported otherwise, if no command used a cache
+	cache = sys.modules.get('lnk.cache')
+	if cache is not None and verbosity:
+		cache.report()
 
 if __name__ == '__main__':
 	main()
@@ -3,6 +3,13 @@
 
 import os
 import json
+import tempfile
+import threading
+
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
 
 import lnk.errors
 
@@ -13,7 +20,30 @@ def get(which, key):
 	"""
 	return Manager(which)[key]
 
+# os.rename() cannot replace existing files on Windows
+replace = getattr(os, 'replace', os.rename)
+
 class Manager(object):
+	"""
+	Reads and writes the JSON configuration files of lnk and its services.
+
+	Parsed configurations are cached for the whole process, keyed by the
+	path of the file and invalidated whenever the file's modification time
+	(or size or inode) changes, such that a file is not re-opened and
+	re-parsed for every Manager created during a single command. Since
+	callers may modify the configuration they get, each Manager receives
+	its own copy, unpickled from the cache (which is much cheaper than
+	parsing the JSON again). Writes go to a temporary file that is then
+	renamed over the original, so readers never see a partial file.
+
+	Attributes:
+		cache (dict): Class-attribute mapping the path of each file to a
+					  (<stamp>, <pickled configuration>) tuple.
+		cache_lock (threading.Lock): Class-attribute lock for the cache.
+	"""
+
+	cache = {}
+	cache_lock = threading.Lock()
 
 	def __init__(self, which=None, write=False):
 
@@ -30,18 +60,65 @@ class Manager(object):
 
 	def open(self, which):
 		self.file = os.path.join(self.path, '{0}.json'.format(which))
-		with open(self.file) as source:
-			self.config = json.load(source)
+		self.config = Manager.load(self.file)
 		return self.config
 
+	@staticmethod
+	def load(path):
+		"""
+		Returns a copy of the configuration stored at a path.
+
+		The file is only read and parsed if it is not yet cached,
+		or if it was modified since it was cached.
+		"""
+		stamp = Manager.stamp(path)
+		with Manager.cache_lock:
+			cached = Manager.cache.get(path)
+		if cached is None or cached[0] != stamp:
+			with open(path) as source:
+				config = json.load(source)
+			pickled = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+			with Manager.cache_lock:
+				Manager.cache[path] = (stamp, pickled)
+			return config
+
+		return pickle.loads(cached[1])
+
+	@staticmethod
+	def stamp(path):
+		"""Returns what identifies the current version of a file."""
+		status = os.stat(path)
+		return (status.st_mtime, status.st_size, status.st_ino)
+
+	@staticmethod
+	def invalidate(path=None):
+		"""Drops a file (or, if path is None, all files) from the cache."""
+		with Manager.cache_lock:
+			if path is None:
+				Manager.cache.clear()
+			else:
+				Manager.cache.pop(path, None)
+
 	def close(self):
 		self.assert_open()
 		self.file = self.config = None
 
 	def write(self):
 		self.assert_open()
-		with open(self.file, 'wt') as destination:
-			json.dump(self.config, destination, indent=4)
+		directory, name = os.path.split(self.file)
+		descriptor, temporary = tempfile.mkstemp(prefix='.{0}.'.format(name),
+												 dir=directory)
+		try:
+			with os.fdopen(descriptor, 'wt') as destination:
+				json.dump(self.config, destination, indent=4)
+			if os.path.exists(self.file):
+				# mkstemp() creates files readable only by their owner
+				os.chmod(temporary, os.stat(self.file).st_mode & 0o777)
+			replace(temporary, self.file)
+		finally:
+			if os.path.exists(temporary):
+				os.remove(temporary)
+			Manager.invalidate(self.file)
 
 	def assert_open(self):
 		if not self.file:
@@ -9,7 +9,6 @@ All non-standard errors raised by lnk should be defined here.
 
 import click
 import ecstasy
-import googleapiclient.errors
 import re
 import requests
 import sys
@@ -99,8 +98,14 @@ class HTTPError(Error):
 	Usually because the data provided by the user was ill-formed
 	(such as an expanded url where a shortened one is expected).
 	Additionally may have a code and status information.
+
+	Attributes:
+		code (int|None): The HTTP status code, if known.
+		status (str|None): The HTTP status (reason), if known.
 	"""
 	def __init__(self, what, code=None, status=None, **additional):
+		self.code = code
+		self.status = status
 		super(HTTPError, self).__init__(what,
 										Code=code,
 										Status=status,
@@ -224,7 +229,7 @@ class Catch(object):
 			except click.ClickException:
 				error = self.get_error()
 				raise UsageError(error.message)
-			except googleapiclient.errors.HttpError:
+			except google_errors():
 				self.handle_google_error()
 			except requests.exceptions.ConnectionError:
 				error = self.get_error()
@@ -279,6 +284,23 @@ class Catch(object):
 
 		return error
 
+def google_errors():
+	"""
+	Returns the exception classes of the goo.gl api client, if it is in use.
+
+	The api client is only imported by the goo.gl commands and takes long
+	to import, so it is not imported here: its exceptions can only have been
+	raised if it was imported already.
+
+	Returns:
+		A tuple holding googleapiclient.errors.HttpError if the module was
+		imported, else an empty tuple (for which an except clause matches
+		nothing).
+	"""
+	module = sys.modules.get('googleapiclient.errors')
+
+	return (module.HttpError,) if module else ()
+
 def catch(function, *args, **kwargs):
 	"""
 	Convenience function for a Catch object with default settings.
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""A bounded pool of worker threads to run the requests of a command."""
+
+import collections
+import sys
+import threading
+
+try:
+	from Queue import Queue
+except ImportError:
+	from queue import Queue
+
+import lnk.errors
+
+# The keys looked up so far by the call running in each thread (see first())
+local = threading.local()
+
+def first(key):
+	"""
+	Returns whether the call running in the thread looks up a key for the
+	first time.
+
+	Calls on the asyncio backend (see lnk.aio.Call) are run again until all
+	their requests are answered, repeating the lookups made before, which
+	must then be counted (e.g. as cache misses) only once. Outside of such
+	calls, every lookup is a first one.
+
+	Arguments:
+		key (hashable): The key looked up.
+
+	Returns:
+		False if the running call looked up the key before, else True.
+	"""
+	lookups = getattr(local, 'lookups', None)
+	if lookups is None:
+		return True
+	if key in lookups:
+		return False
+	lookups.add(key)
+
+	return True
+
+class Task(object):
+	"""
+	A function call submitted to an Executor, holding its outcome.
+
+	Attributes:
+		function (func): The function to call.
+		args (tuple): The positional arguments to pass to the function.
+		kwargs (dict): The keyword arguments to pass to the function.
+		value (?): The return value of the call, once done.
+		error (Exception|None): The exception raised by the call, if any.
+		done (threading.Event): Set once the call has finished.
+		callback (func|None): Optionally, a function called with the task
+							  once it has finished.
+	"""
+	def __init__(self, function, args, kwargs, callback=None):
+		self.function = function
+		self.args = args
+		self.kwargs = kwargs
+		self.value = None
+		self.error = None
+		self.done = threading.Event()
+		self.callback = callback
+
+	def run(self):
+		"""Calls the function and records its return value or exception."""
+		try:
+			self.value = self.function(*self.args, **self.kwargs)
+		except Exception:
+			_, self.error, _ = sys.exc_info()
+		finally:
+			self.done.set()
+			if self.callback:
+				self.callback(self)
+
+	def result(self, timeout=None):
+		"""
+		Waits for the task to finish and returns its result.
+
+		Arguments:
+			timeout (float): Optionally, the number of seconds to wait for.
+
+		Returns:
+			The return value of the function.
+
+		Raises:
+			lnk.errors.InternalError: If the task did not finish in time.
+			Other errors: If the function threw an exception, this exception
+						  is re-raised in the calling thread.
+		"""
+		self.done.wait(timeout)
+		# Event.wait() returns None for Python < 2.7
+		if not self.done.is_set():
+			raise lnk.errors.InternalError('Could not finish task in time.')
+		if self.error:
+			raise self.error
+
+		return self.value
+
+class Executor(object):
+	"""
+	Runs tasks on a fixed maximum number of (daemon) worker threads.
+
+	Rather than starting one thread per URL, commands submit their work to
+	an Executor, whose worker threads are started lazily (never more than
+	there were tasks submitted) up to the given maximum and then re-used for
+	all further tasks. Concurrency therefore stays fixed no matter how large
+	the input is. Each submitted call is wrapped into a Task, from which its
+	result (or exception) can be retrieved.
+
+	Note:
+		A task must never wait for other tasks of the same Executor, as all
+		workers could end up waiting. Commands using other commands (e.g.
+		bit.ly stats using bit.ly info) thus each use their own Executor.
+
+	Attributes:
+		workers (int): The maximum number of worker threads.
+		tasks (Queue.Queue): The queue of tasks waiting for a worker.
+		threads (list): The worker threads started so far.
+		lock (threading.Lock): A lock for thread-safe starting of workers.
+	"""
+	def __init__(self, workers):
+		self.workers = max(1, int(workers))
+		self.tasks = Queue()
+		self.threads = []
+		self.lock = threading.Lock()
+
+	def submit(self, function, *args, **kwargs):
+		"""
+		Schedules a function call on a worker thread.
+
+		Arguments:
+			function (func): The function to call.
+			args (variadic): The positional arguments to pass to the function.
+			kwargs (variadic): The keyword arguments to pass to the function.
+
+		Returns:
+			The Task for the call.
+		"""
+		return self.schedule(Task(function, args, kwargs))
+
+	def schedule(self, task):
+		"""
+		Schedules a task on a worker thread, starting a new worker if allowed.
+
+		Arguments:
+			task (Task): The task to run.
+
+		Returns:
+			The task.
+		"""
+		with self.lock:
+			if len(self.threads) < self.workers:
+				thread = threading.Thread(target=self.work)
+				thread.daemon = True
+				thread.start()
+				self.threads.append(thread)
+		self.tasks.put(task)
+
+		return task
+
+	def map(self, function, items, *args, **kwargs):
+		"""
+		Calls a function for each item and returns all results, in order.
+
+		Arguments:
+			function (func): The function to call, with an item as its
+							 first argument.
+			items (iterable): The items to call the function for.
+			args (variadic): Further positional arguments for each call.
+			kwargs (variadic): Keyword arguments for each call.
+
+		Returns:
+			A list of the return values, in the order of the items.
+
+		Raises:
+			The first exception thrown by any of the calls (in the
+			order of the items), after all calls have finished.
+		"""
+		tasks = [self.submit(function, item, *args, **kwargs) for item in items]
+		for task in tasks:
+			task.done.wait()
+
+		return [task.result() for task in tasks]
+
+	def imap(self, function, items, args=(), ordered=True, window=None):
+		"""
+		Lazily calls a function for each item, yielding results as they come.
+
+		Unlike map(), items are consumed only as workers become available:
+		at most 'window' calls are in flight (or finished, but not yet
+		yielded) at any time. Memory therefore stays bounded no matter how
+		many items the iterable produces (e.g. lines of a large file).
+
+		Arguments:
+			function (func): The function to call, with an item as its
+							 first argument.
+			items (iterable): The items to call the function for.
+			args (tuple): Further positional arguments for each call.
+			ordered (bool): Whether to yield results in the order of the
+							items (True) or as soon as any call finishes.
+			window (int): The maximum number of pending calls. Defaults
+						  to twice the number of workers.
+
+		Returns:
+			A generator over the return values of the calls.
+
+		Raises:
+			The exception thrown by a call, when its result is reached.
+		"""
+		window = max(1, window or 2 * self.workers)
+		if ordered:
+			pending = collections.deque()
+			for item in items:
+				if len(pending) >= window:
+					yield pending.popleft().result()
+				pending.append(self.submit(function, item, *args))
+			while pending:
+				yield pending.popleft().result()
+		else:
+			finished = Queue()
+			pending = 0
+			for item in items:
+				if pending >= window:
+					yield finished.get().result()
+					pending -= 1
+				self.schedule(Task(function, (item,) + tuple(args), {},
+								   finished.put))
+				pending += 1
+			while pending:
+				yield finished.get().result()
+				pending -= 1
+
+	def work(self):
+		"""The loop of each worker thread, running tasks until shut down."""
+		while True:
+			task = self.tasks.get()
+			if task is None:
+				break
+			task.run()
+
+	def shutdown(self):
+		"""Stops all worker threads once the tasks submitted so far are done."""
+		with self.lock:
+			for _ in self.threads:
+				self.tasks.put(None)
+			self.threads = []
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Collection of the failures of a command run in partial mode."""
+
+import click
+import ecstasy
+import json
+import threading
+
+from collections import namedtuple
+
+class Failures(object):
+	"""
+	The failed items (e.g. urls) of a command run in partial mode.
+
+	Normally, the first url that could not be shortened aborts the whole
+	command, such that the results of all other urls are lost too. In
+	partial mode, a command instead records the error of each failed url
+	here and goes on with the others, only outputting the results of the
+	urls that succeeded. The failures are reported separately: each one
+	is output to stderr as soon as it happened, or, if a path is given,
+	all are written to a JSON file (a list of objects with the keys of
+	Failures.Failure) at the end of the run.
+
+	Attributes:
+		path (str|None): The path to the JSON file to write the failures to,
+						 or None to output them to stderr.
+		failures (list): The failures so far, as Failures.Failure records.
+		lock (threading.Lock): A lock for thread-safe recording.
+		Failure (namedtuple): Class-attribute namedtuple to represent the
+							  failure of an item, with the type and message
+							  of its error (and the HTTP code and status,
+							  if any).
+	"""
+
+	Failure = namedtuple('Failure', ['item',
+									 'error',
+									 'message',
+									 'code',
+									 'status'])
+
+	def __init__(self, path=None):
+		"""
+		Constructs a new (empty) Failures object.
+
+		Arguments:
+			path (str): Optionally, the path to a JSON file to write the
+						failures to (see report()).
+		"""
+		self.path = path
+		self.failures = []
+		self.lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.failures)
+
+	def add(self, item, error):
+		"""
+		Records the failure of an item.
+
+		Arguments:
+			item (str): The item that failed (e.g. a url).
+			error (Exception): The error it failed with.
+
+		Returns:
+			The failure, as a Failures.Failure record.
+		"""
+		message = getattr(error, 'what', None) or str(error)
+		failure = Failures.Failure(item,
+								   type(error).__name__,
+								   message,
+								   getattr(error, 'code', None),
+								   getattr(error, 'status', None))
+		with self.lock:
+			self.failures.append(failure)
+			if self.path is None:
+				# Only the label is formatted, as messages may contain
+				# characters with a meaning to ecstasy (e.g. parentheses)
+				label = ecstasy.beautify('<Failed>', ecstasy.Color.Red)
+				click.echo('{0}: {1} ({2})'.format(label, item, message),
+						   err=True)
+
+		return failure
+
+	def report(self):
+		"""
+		Reports the failures at the end of a run.
+
+		Writes the failures to the JSON file, if a path was given (the file
+		is written even if nothing failed, such that a stale file is never
+		mistaken for the report of the run), then outputs the number of
+		failures to stderr, if any.
+		"""
+		with self.lock:
+			failures = list(self.failures)
+		if self.path is not None:
+			with open(self.path, 'wt') as destination:
+				json.dump([dict(failure._asdict()) for failure in failures],
+						  destination,
+						  indent=4)
+		if failures:
+			label = ecstasy.beautify('<Failures>', ecstasy.Color.Red)
+			what = '{0}: {1}'.format(label, len(failures))
+			if self.path is not None:
+				what += " (see '{0}')".format(self.path)
+			click.echo(what, err=True)
@@ -4,10 +4,12 @@
 """The command-line interface to the goo.gl client."""
 
 import click
+import itertools
 
 import lnk.cli
 import lnk.config
 import lnk.errors
+import lnk.failures
 
 import lnk.googl.link
 import lnk.googl.info
@@ -94,12 +96,62 @@ def main(context, verbose, level, args):
 @click.option('--pretty/--plain',
 			  default=link_config['settings']['pretty'],
 			  help='Whether to show the links in a pretty box or as a plain list.')
+@click.option('-i',
+			  '--input',
+			  'source',
+			  type=click.File('r'),
+			  metavar='FILE',
+			  help="Stream urls to shorten from a file ('-' for stdin).")
+@click.option('--ordered/--unordered',
+			  default=True,
+			  help='Whether to stream results in input or completion order.')
+@click.option('--cache/--no-cache',
+			  default=lnk_config['cache'],
+			  help='Whether to look up short urls in (and add them to) the '
+				   'local cache, rather than always requesting them.')
+@click.option('--partial/--strict',
+			  default=False,
+			  help='Whether to output the links that succeeded (as plain '
+				   'lines, as they complete) and report the urls that '
+				   'failed separately, or to abort at the first failure.')
+@click.option('--errors',
+			  type=click.Path(dir_okay=False, writable=True),
+			  metavar='FILE',
+			  help='Write the urls that failed to this JSON file (implies '
+				   '--partial).')
 @click.argument('urls', nargs=-1)
-def link(copy, quiet, expand, shorten, urls, pretty):
+def link(copy, quiet, expand, shorten, source, ordered, urls, pretty,
+		 cache, partial, errors):
 	"""Link shortening and expansion."""
-	if not urls and not expand and not shorten:
+	if not urls and not expand and not shorten and source is None:
 		raise lnk.errors.UsageError('Please supply at least one URL.')
-	lnk.googl.link.echo(copy, quiet, expand, shorten + urls, pretty)
+	failures = None
+	if partial or errors:
+		failures = lnk.failures.Failures(errors)
+	# In partial mode, the links that succeeded are output as they
+	# complete, rather than once all urls were (or failed to be) requested
+	if source is None and failures is None:
+		lnk.googl.link.echo(copy,
+							quiet,
+							expand,
+							shorten + urls,
+							pretty,
+							cache=cache)
+	else:
+		# Streamed output is always plain, since a box needs all lines
+		if expand:
+			lnk.googl.link.echo(copy, quiet, expand, (), False,
+								cache=cache,
+								failures=failures)
+		urls = itertools.chain(shorten + urls, source or ())
+		lnk.googl.link.stream(copy and not expand,
+							  quiet,
+							  urls,
+							  ordered,
+							  cache=cache,
+							  failures=failures)
+	if failures is not None:
+		failures.report()
 
 @main.command()
 @click.option('-o',
@@ -114,14 +166,29 @@ def link(copy, quiet, expand, shorten, urls, pretty):
 			  multiple=True,
 			  type=click.Choice(info_config['sets']),
 			  help='Hide this/these set(s) of information.')
+@click.option('--partial/--strict',
+			  default=False,
+			  help='Whether to output the links that succeeded and report '
+				   'the urls that failed separately, or to abort at the '
+				   'first failure.')
+@click.option('--errors',
+			  type=click.Path(dir_okay=False, writable=True),
+			  metavar='FILE',
+			  help='Write the urls that failed to this JSON file (implies '
+				   '--partial).')
 @click.argument('urls', nargs=-1)
-def info(only, hide, urls):
+def info(only, hide, partial, errors, urls):
 	"""Information about links."""
 	# Its' horrible to handle the missing parameter when click
 	# throws an exception (doesn't make it accessible), so just do it here.
 	if not urls:
 		raise lnk.errors.UsageError('Please supply at least one URL.')
-	lnk.googl.info.echo(only, hide, urls)
+	failures = None
+	if partial or errors:
+		failures = lnk.failures.Failures(errors)
+	lnk.googl.info.echo(only, hide, urls, failures=failures)
+	if failures is not None:
+		failures.report()
 
 @main.command()
 @click.option('-o',
@@ -160,13 +227,37 @@ def info(only, hide, urls):
 			  '--full/--short',
 			  default=stats_config['settings']['full-countries'],
 			  help='Whether to show full or short (abbreviated) country names.')
+@click.option('--partial/--strict',
+			  default=False,
+			  help='Whether to output the links that succeeded and report '
+				   'the urls that failed separately, or to abort at the '
+				   'first failure.')
+@click.option('--errors',
+			  type=click.Path(dir_okay=False, writable=True),
+			  metavar='FILE',
+			  help='Write the urls that failed to this JSON file (implies '
+				   '--partial).')
 @click.argument('urls', nargs=-1)
-def stats(only, hide, last, forever, limit, no_limit, info, full, urls):
+def stats(only, hide, last, forever, limit, no_limit, info, full, partial,
+		  errors, urls):
 	"""Statistics and metrics for links."""
 	if not urls:
 		raise lnk.errors.UsageError('Please supply at least one URL.')
 	limit = None if no_limit else limit
-	lnk.googl.stats.echo(only, hide, last, forever, limit, info, full, urls)
+	failures = None
+	if partial or errors:
+		failures = lnk.failures.Failures(errors)
+	lnk.googl.stats.echo(only,
+						 hide,
+						 last,
+						 forever,
+						 limit,
+						 info,
+						 full,
+						 urls,
+						 failures=failures)
+	if failures is not None:
+		failures.report()
 
 @main.command()
 @click.option('-g',
@@ -215,7 +306,12 @@ def key(generate):
 @click.option('--pretty/--plain',
 			  default=history_config['settings']['pretty'],
 			  help='Whether to show the history in a pretty box or as a plain list.')
-def history(last, time_range, forever, limit, no_limit, expanded, both, pretty):
+@click.option('--mirror/--no-mirror',
+			  default=history_config['settings']['mirror'],
+			  help='Whether to keep a local mirror of the history, fetching '
+				   'only links created since the last run.')
+def history(last, time_range, forever, limit, no_limit, expanded, both, pretty,
+			mirror):
 	"""Retrieve link history."""
 	if not last and not time_range:
 		forever = True
@@ -223,4 +319,11 @@ def history(last, time_range, forever, limit, no_limit, expanded, both, pretty):
 	if not both and expanded is None:
 		both = True
 	limit = None if no_limit else limit
-	lnk.googl.history.echo(last, time_range, forever, limit, expanded, both, pretty)
+	lnk.googl.history.echo(last,
+						   time_range,
+						   forever,
+						   limit,
+						   expanded,
+						   both,
+						   pretty,
+						   mirror=mirror)
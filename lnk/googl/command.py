@@ -6,13 +6,18 @@
 import apiclient.discovery
 import googleapiclient.errors
 import httplib2
-import oauth2client.file
+import json
 import os
+import socket
+import threading
 
+import lnk.cache
 import lnk.config
 import lnk.errors
+import lnk.retry
 
 from lnk.abstract import AbstractCommand
+from lnk.googl.credentials import Credentials
 
 class Command(AbstractCommand):
 	"""
@@ -21,13 +26,35 @@ class Command(AbstractCommand):
 	Configures the AbstractCommand base class for all commands in the
 	entire application, which needs information about the service being
 	used. Moreover fetches the oauth2 credentials for any HTTP request.
+	The API-object used for requests is built only once per command, from
+	a discovery document that is cached on disk (see get_discovery()), and
+	is then shared by all threads the command starts. All requests made with
+	the same credentials share one rate-limit (see AbstractCommand.limit()).
 
 	Attributes:
-		credentials (oauth2client.file.Storage): An object from Google's
-												 API-library used to interact
-												 with the oauth2 credentials
-												 file.
+		credentials (lnk.googl.credentials.Credentials): The process-wide
+								holder of the oauth2 credentials, shared by
+								all commands using the same credentials file.
+		local (threading.local): Thread-local storage for each thread's
+								 authorized HTTP object.
+		version (str): The version of the API (e.g. 'v1').
+		discovery_path (str): The path to the file caching the discovery
+							  document of the API.
+		resource (googleapiclient.discovery.Resource|None): The url() resource
+								of the API, once built by get_api().
+		resource_lock (threading.Lock): A lock such that the resource is only
+										built once, even by many threads.
 	"""
+
+	discovery_lock = threading.Lock()
+
+	# The API client makes requests via httplib2, which raises socket errors
+	transient = lnk.retry.TRANSIENT + (socket.error,)
+
+	# Requests are made by the API client, not AbstractCommand.perform(),
+	# so goo.gl commands always run on worker threads
+	replayable = False
+
 	def __init__(self, which, credentials_path=None):
 		"""
 		Constructs a new Command.
@@ -44,20 +71,81 @@ class Command(AbstractCommand):
 		else:
 			self.credentials_path = os.path.join(lnk.config.CONFIG_PATH,
 												 '.credentials')
-		self.credentials = oauth2client.file.Storage(self.credentials_path)
+		self.credentials = Credentials.shared(self.credentials_path)
+		self.local = threading.local()
+		with lnk.config.Manager('googl') as manager:
+			self.version = 'v{0}'.format(manager['version'])
+		self.discovery_path = os.path.join(lnk.config.CONFIG_PATH, '.discovery')
+		self.resource = None
+		self.resource_lock = threading.Lock()
+		if self.limits:
+			# The stored credentials, not (possibly) refreshed ones
+			stored = self.credentials.storage.get()
+			self.limit(lnk.cache.account(stored and stored.refresh_token))
 
 	def get_api(self):
 		"""
 		Returns an API-object used to perform any request.
 
+		The API-object is built only on the first call and then re-used for
+		all further calls (also from other threads). Note that it is not bound
+		to any authorized HTTP object, which is instead passed with each request
+		by execute() (httplib2.Http objects cannot be shared between threads).
+
 		Returns:
 			An API object from Google API-library, used to perform any
 			HTTP request for the url-shortening API.
 		"""
-		http = self.authorize()
-		api = apiclient.discovery.build('urlshortener', 'v1', http=http)
+		if self.resource is None:
+			with self.resource_lock:
+				if self.resource is None:
+					document = self.get_discovery()
+					api = apiclient.discovery.build_from_document(
+						document,
+						http=httplib2.Http())
+					self.resource = api.url()
+
+		return self.resource
+
+	def get_discovery(self):
+		"""
+		Returns the discovery document describing the url-shortening API.
 
-		return api.url()
+		The document is fetched from Google only if it is not yet cached in the
+		discovery file, where documents are stored under a key of the API name
+		and version (e.g. 'urlshortener-v1'), such that a new document is
+		fetched whenever the configured version of the API changes.
+
+		Returns:
+			The discovery document, as a JSON string.
+
+		Raises:
+			errors.HTTPError: If the document could not be fetched.
+		"""
+		key = 'urlshortener-{0}'.format(self.version)
+		with Command.discovery_lock:
+			cache = {}
+			if os.path.exists(self.discovery_path):
+				with open(self.discovery_path) as source:
+					cache = json.load(source)
+			if key not in cache:
+				uri = apiclient.discovery.DISCOVERY_URI.format(
+					api='urlshortener',
+					apiVersion=self.version)
+				response = self.session.request('GET',
+												uri,
+												self.connections,
+												timeout=60)
+				if not str(response.status_code).startswith('2'):
+					raise lnk.errors.HTTPError('Could not retrieve the goo.gl '
+											   'API description.',
+											   response.status_code,
+											   response.reason)
+				cache[key] = response.text
+				with open(self.discovery_path, 'wt') as destination:
+					json.dump(cache, destination)
+
+		return cache[key]
 
 	def get(self, url, projection=None, what=None):
 		"""
@@ -77,11 +165,10 @@ class Command(AbstractCommand):
 		Return:
 			The requested data.
 		"""
-		api = self.get_api()
-		request = api.get(shortUrl=url, projection=projection)
-		response = self.execute(request, what)
+		request = self.get_api().get(shortUrl=url, projection=projection)
+		key = ('url.get', url, projection)
 
-		return response
+		return self.coalesce(key, self.execute, request, what)
 
 	def authorize(self):
 		"""
@@ -91,9 +178,11 @@ class Command(AbstractCommand):
 		library, authorized to fetch user-specifc data by using the credentials
 		that were configured for the user. There are two other cases: The oauth2
 		access-token used to make oauth2 requests expires around-about every
-		hour, so if that is the case this method will first refresh the token;
-		if there are no credentials at all (i.e. the user did not run the 'key'
-		command yet), this method throws an exception.
+		hour, so if that is the case the token is first refreshed (once for all
+		threads, see lnk.googl.credentials.Credentials); if there are no
+		credentials at all (i.e. the user did not run the 'key' command yet),
+		this method throws an exception. Each thread re-uses its own HTTP object
+		for as long as the credentials object stays the same.
 
 		Returns:
 			If all goes well, an oauth2-authorized httplib2.HTTP object.
@@ -104,27 +193,40 @@ class Command(AbstractCommand):
 									   was not yet performed).
 		"""
 		credentials = self.credentials.get()
-		if not credentials:
-			raise lnk.errors.AuthorizationError('goo.gl')
-		http = httplib2.Http()
-		if credentials.access_token_expired:
-			credentials.refresh(http)
-			self.credentials.put(credentials)
-		credentials.authorize(http)
-
-		return http
-
-	@staticmethod
-	def execute(request, what=None):
+		if getattr(self.local, 'credentials', None) is not credentials:
+			self.local.http = credentials.authorize(httplib2.Http())
+			self.local.credentials = credentials
+
+		return self.local.http
+
+	def execute(self, request, what=None):
 		"""
 		Execute an HTTP request.
 
-		The main point of this method is to catch HTTP errors raised by Google's
-		API-library and re-raise them as lnk.errorrs.HTTPErrors.
+		The request is executed with an authorized HTTP object retrieved
+		via authorize(), once the rate-limit allows it, and retried if it
+		failed transiently (see lnk.retry.Policy). The main point of this
+		method is to catch HTTP errors raised by Google's API-library and
+		re-raise them as lnk.errorrs.HTTPErrors.
 		"""
 		try:
-			response = request.execute()
+			response = self.retry.call(self.attempt, (request,), None, self.status)
 		except googleapiclient.errors.HttpError:
 			raise lnk.errors.HTTPError('Could not {0}.'.format(what))
 
 		return response
+
+	def attempt(self, request):
+		"""
+		Makes one attempt at executing a request, once the rate-limit
+		allows it.
+
+		Arguments:
+			request (googleapiclient.http.HttpRequest): The request.
+
+		Returns:
+			The data of the response.
+		"""
+		self.throttle()
+
+		return request.execute(http=self.authorize())
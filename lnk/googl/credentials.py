@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Process-wide, thread-safe handling of the goo.gl oauth2 credentials."""
+
+import httplib2
+import oauth2client.file
+import os
+import threading
+
+import lnk.errors
+
+class Credentials(object):
+	"""
+	In-memory holder for the oauth2 credentials stored in a credentials file.
+
+	There is only one holder per credentials file and process (see shared()),
+	such that the file is read only once, rather than once per request. When
+	the access-token has expired, it is refreshed exactly once: the first
+	thread to notice refreshes the token under a lock and writes the new
+	credentials back to disk, while all other threads wait for that refresh
+	and then use its result. The file is re-read only if it was modified by
+	someone else (e.g. by the 'key' command).
+
+	Attributes:
+		path (str): The path to the credentials file.
+		storage (oauth2client.file.Storage): The object from Google's
+											 API-library used to read and
+											 write the credentials file.
+		credentials (oauth2client.client.OAuth2Credentials|None): The
+								credentials, once loaded from disk.
+		modified (float|None): The modification time of the credentials file
+							   when it was last read or written by the holder.
+		lock (threading.Lock): The lock under which credentials are loaded
+							   and refreshed.
+	"""
+
+	holders = {}
+	holders_lock = threading.Lock()
+
+	def __init__(self, path):
+		self.path = path
+		self.storage = oauth2client.file.Storage(path)
+		self.credentials = None
+		self.modified = None
+		self.lock = threading.Lock()
+
+	@classmethod
+	def shared(cls, path):
+		"""
+		Returns the process-wide holder for a credentials file.
+
+		Arguments:
+			path (str): The path to the credentials file.
+
+		Returns:
+			The one Credentials instance for the (absolute) path.
+		"""
+		path = os.path.abspath(path)
+		with cls.holders_lock:
+			if path not in cls.holders:
+				cls.holders[path] = cls(path)
+
+		return cls.holders[path]
+
+	def get(self):
+		"""
+		Returns valid (non-expired) credentials.
+
+		Returns:
+			The oauth2 credentials, refreshed if they had expired.
+
+		Raises:
+			errors.AuthorizationError: If there are no credentials for this user
+									   yet (the initial authorization-procedure
+									   was not yet performed).
+		"""
+		credentials = self.credentials
+		# Fast path: no lock needed when nothing is to be done
+		if (credentials is not None and
+		   not credentials.access_token_expired and
+		   not self.changed()):
+			return credentials
+
+		with self.lock:
+			if self.credentials is None or self.changed():
+				self.load()
+			if self.credentials.access_token_expired:
+				self.credentials.refresh(httplib2.Http())
+				self.put(self.credentials)
+
+			return self.credentials
+
+	def put(self, credentials):
+		"""
+		Writes credentials to disk and remembers them.
+
+		Arguments:
+			credentials (oauth2client.client.OAuth2Credentials): The
+								credentials to store.
+		"""
+		self.storage.put(credentials)
+		self.credentials = credentials
+		self.modified = self.get_modified()
+
+	def load(self):
+		"""
+		(Re-)loads the credentials from disk.
+
+		Raises:
+			errors.AuthorizationError: If there are no stored credentials.
+		"""
+		self.modified = self.get_modified()
+		self.credentials = self.storage.get() if self.modified else None
+		if not self.credentials:
+			raise lnk.errors.AuthorizationError('goo.gl')
+
+	def changed(self):
+		"""Returns whether the file was modified since it was last read."""
+		return self.get_modified() != self.modified
+
+	def get_modified(self):
+		"""Returns the modification time of the file (None if it is missing)."""
+		try:
+			return os.path.getmtime(self.path)
+		except OSError:
+			return None
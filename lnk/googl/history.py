@@ -5,7 +5,6 @@
 
 from __future__ import unicode_literals
 
-import apiclient.discovery
 import click
 import ecstasy
 import warnings
@@ -14,22 +13,28 @@ from collections import namedtuple
 from datetime import datetime, timedelta
 
 import lnk.beauty
+import lnk.cache
 import lnk.config
 import lnk.errors
+import lnk.mirror
+import lnk.timeline
+import lnk.timestamps
 
 from lnk.googl.command import Command
 
 warnings.filterwarnings('ignore', module=r'ecstasy\.parser')
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a history command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to a
 						 History instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   History constructor (e.g. 'mirror').
 	"""
-	click.echo(History().fetch(*args))
+	click.echo(History(**kwargs).fetch(*args))
 
 class History(Command):
 
@@ -45,6 +50,9 @@ class History(Command):
 	Attributes:
 		raw (bool): Whether to prettify the output or
 					return it raw, for internal use.
+		mirror (lnk.mirror.Mirror|None): The local mirror of the history
+										 to answer time-ranges from, if
+										 any (see synchronize()).
 		delta (dict): A mapping between string representations of time
 						and equivalent datetime.timedelta objects.
 		Url (namedtuple): Class-attribute namedtuple to represent a link
@@ -60,9 +68,27 @@ class History(Command):
 
 	Url = namedtuple('Url', ['short', 'long', 'created'])
 
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, mirror=None):
+		"""
+		Constructs a new History command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			mirror (bool): Whether to keep a local mirror of the history.
+						   Defaults to the 'mirror' setting.
+		"""
 		super(History, self).__init__('history')
 		self.raw = raw
+		if mirror is None:
+			mirror = self.settings.get('mirror', False)
+		self.mirror = None
+		if mirror:
+			stored = self.credentials.storage.get()
+			account = lnk.cache.account(stored and stored.refresh_token)
+			self.mirror = lnk.mirror.Mirror('googl',
+											encode=lnk.timestamps.isoformat,
+											decode=lnk.timestamps.parse,
+											account=account)
 		self.delta = {
 			'minute': timedelta(minutes=1), 
 			'hour': timedelta(hours=1), 
@@ -97,8 +123,18 @@ class History(Command):
 			else the same plain list as for the first case, but joined to
 			a string.
 		"""
-		data = self.request()
-		urls = self.process(data)
+		if self.mirror:
+			self.synchronize()
+			urls = self.mirror
+		else:
+			windows = self.get_windows(last, ranges, forever)
+			counts = [0] * len(windows)
+			urls = lnk.timeline.Timeline()
+			for page in self.pages():
+				page = self.process(page)
+				urls.add(page)
+				if self.complete(page, windows, counts, limit):
+					break
 
 		result = []
 		if forever:
@@ -121,7 +157,8 @@ class History(Command):
 		Formats history for all possible time-ranges.
 
 		Arguments:
-			urls (list|tuple): The original/full list of urls.
+			urls (lnk.timeline.Timeline|lnk.mirror.Mirror): The original/full
+														  history.
 			limit (int): A limit to the number of links to pick.
 			expanded (bool): Whether to show expanded or short links.
 			both (bool): Whether to show both expanded and short links.
@@ -132,12 +169,8 @@ class History(Command):
 			same list of lines with a header ('Since forever:') plus
 			an empty line for padding.
 		"""
-		lines = []
-		for n, url in enumerate(urls):
-			if n == limit:
-				break
-			line = self.lineify(url, expanded, both, pretty)
-			lines.append(line)
+		filtered = self.filter(urls, None, None, limit)
+		lines = self.listify(filtered, limit, expanded, both, pretty)
 
 		return ['Since forever:'] + lines + [''] if pretty else lines
 
@@ -146,7 +179,8 @@ class History(Command):
 		Formats and filters history for certain time ranges.
 
 		Arguments:
-			urls (list|tuple): The original/full list of urls.
+			urls (lnk.timeline.Timeline|lnk.mirror.Mirror): The original/full
+														  history.
 			ranges (tuple): The time-ranges of schema (span1, unit1, span2, unit2).
 			limit (int): A limit to the number of links to pick for each time-range.
 			expanded (bool): Whether to show expanded or short links.
@@ -161,7 +195,7 @@ class History(Command):
 		lines = []
 		for time_range in ranges:
 			begin, end = self.get_boundaries(time_range)
-			filtered = self.filter(urls, begin, end)
+			filtered = self.filter(urls, begin, end, limit)
 			if pretty:
 				header = self.ranges_header(time_range, filtered)
 				lines.append(header)
@@ -176,7 +210,8 @@ class History(Command):
 		Fetches and formats history after a given time-point.
 
 		Arguments:
-			urls (list|tuple): The original/full list of urls.
+			urls (lnk.timeline.Timeline|lnk.mirror.Mirror): The original/full
+														  history.
 			last (tuple): The open-ended time-ranges of schema (span, unit).
 			limit (int): A limit to the number of links to pick for each
 						 time-range.
@@ -192,7 +227,7 @@ class History(Command):
 		lines = []
 		for time_point in last:
 			begin = self.get_date(time_point)
-			filtered = self.filter(urls, begin, datetime.now())
+			filtered = self.filter(urls, begin, datetime.now(), limit)
 			if pretty:
 				header = self.last_header(time_point, filtered)
 				lines.append(header)
@@ -299,24 +334,135 @@ class History(Command):
 			raise lnk.errors.UsageError(what)
 		return begin, end
 
+	def get_windows(self, last, ranges, forever):
+		"""
+		Returns the boundaries of all time-ranges requested.
+
+		Arguments:
+			last (tuple): The open-ended time-ranges of schema (span, unit).
+			ranges (tuple): The time-ranges of schema (span1, unit1, span2, unit2).
+			forever (bool): Whether all links were requested.
+
+		Returns:
+			A list of (<begin>, <end>) tuples of datetime objects, where
+			either may be None if the time-range has no such bound.
+
+		Raises:
+			errors.UsageError: If any of the ranges is invalid.
+		"""
+		windows = [(None, None)] if forever else []
+		for time_range in ranges or ():
+			windows.append(self.get_boundaries(time_range))
+		for time_point in last or ():
+			windows.append((self.get_date(time_point), None))
+
+		return windows
+
+	@staticmethod
+	def complete(urls, windows, counts, limit):
+		"""
+		Checks whether the history fetched so far answers all time-ranges.
+
+		Since the API lists links from newest to oldest, a time-range is
+		complete once the limit is reached within it, or once links older
+		than its lower bound were fetched (no later page can hold any of
+		its links).
+
+		Arguments:
+			urls (list): The urls of the page fetched last.
+			windows (list): The (<begin>, <end>) boundaries of the
+							time-ranges (see get_windows()).
+			counts (list): The number of urls fetched so far within each
+						   time-range, updated in place for the new urls.
+			limit (int): The limit on the number of links per time-range,
+						 or None.
+
+		Returns:
+			True if no further page needs to be fetched, else False.
+		"""
+		oldest = min(url.created for url in urls) if urls else None
+		complete = True
+		for n, (begin, end) in enumerate(windows):
+			for url in urls:
+				if ((begin is None or url.created >= begin) and
+				   (end is None or url.created <= end)):
+					counts[n] += 1
+			if begin is not None and oldest is not None and oldest < begin:
+				continue
+			if limit is None or counts[n] < limit:
+				complete = False
+
+		return complete
+
+	def synchronize(self):
+		"""
+		Adds all links created since the last synchronization to the mirror.
+
+		Since the API lists links from newest to oldest, pages are only
+		requested until a link created before the mirror's high-water mark
+		arrives.
+		"""
+		mark = self.mirror.mark()
+		urls = []
+		for page in self.pages():
+			page = self.process(page)
+			urls += [url for url in page if mark is None or url.created >= mark]
+			if mark is not None and any(url.created < mark for url in page):
+				break
+		self.mirror.update(urls)
+
 	def request(self):
 		"""
-		Requests the link-history from the bit.ly API.
+		Requests the (whole) link-history from the goo.gl API.
 
 		Returns:
 			A list of links.
 		"""
-		api = self.get_api()
-
 		data = []
-		response = {'nextPageToken': None}
-		while 'nextPageToken' in response:
-			request = api.list(start_token=response['nextPageToken'])
-			response = self.execute(request, 'retrieve history')
-			data += response['items']
+		for page in self.pages():
+			data += page
 
 		return data
 
+	def pages(self):
+		"""
+		Lazily requests the link-history from the goo.gl API, page by page.
+
+		The next page is requested (on the executor) as soon as the token
+		for it is known, i.e. before the current page is yielded, such that
+		it is fetched while the current one is processed. When the consumer
+		stops early, at most that one page was requested in vain.
+
+		Returns:
+			A generator over the pages, each a list of links (as returned by
+			the API, from newest to oldest).
+		"""
+		api = self.get_api()
+		task = self.executor.submit(self.request_page, api, None)
+		while task is not None:
+			response = task.result()
+			task = None
+			if 'nextPageToken' in response:
+				task = self.executor.submit(self.request_page,
+											api,
+											response['nextPageToken'])
+			yield response.get('items', [])
+
+	def request_page(self, api, token):
+		"""
+		Requests a single page of the link-history.
+
+		Arguments:
+			api (googleapiclient.discovery.Resource): The API-object.
+			token (str): The token of the page, None for the first page.
+
+		Returns:
+			The response of the API.
+		"""
+		request = api.list(start_token=token)
+
+		return self.execute(request, 'retrieve history')
+
 	def listify(self, urls, limit, expanded, both, pretty):
 		"""
 		Returns a list of lines for a list of urls.
@@ -379,30 +525,31 @@ class History(Command):
 		return line
 
 	@staticmethod
-	def filter(urls, begin, end):
+	def filter(urls, begin, end, limit=None):
 		"""
-		Filters a list of urls according to a lower and upper-bound time-point.
+		Filters the history according to a lower and upper-bound time-point.
+
+		The history is kept sorted by time of creation (in a timeline, or
+		in the index of a mirror), such that the urls within the time-range
+		are found by bisection rather than by scanning all urls, i.e. in
+		O(log n + limit) time.
 
 		Arguments:
-			urls (list|tuple): A list/tuple of urls to filter.
-			begin (int): The lower-bound datetime object (all links mus be
-						 created at or after this point in time).
-			end (int): The upper-bound datetime object (all links mus be
-						 created at or before this point in time).
+			urls (lnk.timeline.Timeline|lnk.mirror.Mirror): The history
+														  to filter.
+			begin (datetime.datetime): The lower-bound datetime object (all
+									   links must be created at or after this
+									   point in time), or None for no bound.
+			end (datetime.datetime): The upper-bound datetime object (all
+									 links must be created at or before this
+									 point in time), or None for no bound.
+			limit (int): Optionally, the maximum number of (the most recent)
+						 urls to return.
 
 		Returns:
-			A list of filtered urls.
-
-		Note:
-			The passed list of urls is not modified directly, i.e.
-			the filtered list is a new list.
+			A new list of the filtered urls, from newest to oldest.
 		"""
-		filtered = []
-		for url in urls:
-			if url.created >= begin and url.created <= end:
-				filtered.append(url)
-
-		return filtered
+		return urls.between(begin, end, limit)
 
 	@staticmethod
 	def process(data):
@@ -422,8 +569,7 @@ class History(Command):
 		"""
 		urls = []
 		for item in data:
-			relevant = item['created'].split('.')[0]
-			created = datetime.strptime(relevant, '%Y-%m-%dT%H:%M:%S')
+			created = lnk.timestamps.parse(item['created'])
 			url = History.Url(item['id'], item['longUrl'], created)
 			urls.append(url)
 
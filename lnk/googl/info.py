@@ -7,22 +7,23 @@ from __future__ import unicode_literals
 
 import click
 
-from datetime import datetime
-
 import lnk.abstract
 import lnk.beauty
+import lnk.timestamps
 
 from lnk.googl.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes an info command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to an
 						 Info instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Info constructor (e.g. 'failures').
 	"""
-	click.echo(Info().fetch(*args))
+	click.echo(Info(**kwargs).fetch(*args))
 
 class Info(Command):
 	"""
@@ -42,10 +43,20 @@ class Info(Command):
 		sets (dict): A complete dictionary of the available sets of information.
 		reverse (dict): A reverse mapping of the above-mentioned sets.
 	"""
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, failures=None):
+		"""
+		Constructs a new Info command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Info, self).__init__('info')
 
 		self.raw = raw
+		self.failures = failures
 		self.sets = self.config['sets']
 		# Dictionary comprehensions not available for Python < 2.7
 		self.reverse = dict((value, key) for key, value in self.sets.items())
@@ -67,36 +78,28 @@ class Info(Command):
 			else a boxified, pretty string.
 		"""
 		sets = lnk.abstract.filter_sets(self.sets, only, hide)
-		result = []
-		threads = []
-		for url in urls:
-			self.queue.put(url.strip())
-			t = self.new_thread(self.get_info, sets.values(), result)
-			threads.append(t)
-		self.join(threads)
+		urls = [url.strip() for url in urls]
+		result = self.map(self.get_info, urls, sets.values())
 
 		return result if self.raw else lnk.beauty.boxify(result)
 
-	def get_info(self, sets, result):
+	def get_info(self, url, sets):
 		"""
 		Requests all information about a url.
 
-		This method is run in a separate thread for each URL, and as such
-		uses a queue to get a URL and then appends the information to the
-		list supplied in the argument. This is done in a thread-safe, locked
-		way.
+		This method is run on the command's executor for each URL.
 
 		Arguments:
+			url (str): The goo.gl link to request information for.
 			sets (dict): The sets of information to include in the data.
-			result (list): The list of results for each URL, to which to
-						   append the data requested.
+
+		Returns:
+			The list of lines for the URL (see lineify()).
 		"""
-		url = self.queue.get()
 		data = self.request(url)
 		selection = dict((key, data[key]) for key in data if key in sets)
-		lines = self.lineify(url, selection)
-		with self.lock:
-			result.append(lines)
+
+		return self.lineify(url, selection)
 
 	def request(self, url):
 		"""
@@ -149,9 +152,6 @@ class Info(Command):
 		"""
 		key = self.reverse[key]
 		if key == 'created':
-			# Ignore the irrelevant part of the ISO format
-			relevant = value[:value.find('.')]
-			parsed = datetime.strptime(relevant, '%Y-%m-%dT%H:%M:%S')
-			value = parsed.ctime()
+			value = lnk.timestamps.parse(value).ctime()
 
 		return '{0}: {1}'.format(key.title(), value)
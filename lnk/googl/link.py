@@ -3,26 +3,42 @@
 
 """Link shortening and expansion for the goo.gl client."""
 
-import apiclient.discovery
 import click
 import ecstasy
 import pyperclip
 import re
 
 import lnk.beauty
+import lnk.cache
+import lnk.config
 import lnk.errors
 
 from lnk.googl.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a Link command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to a
 						 Link instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
 	"""
-	click.echo(Link().fetch(*args))
+	click.echo(Link(**kwargs).fetch(*args))
+
+def stream(*args, **kwargs):
+	"""
+	Executes a link command in streaming mode, echoing lines as they come.
+
+	Arguments:
+		args (variadic): The arguments to pass to a
+						 Link instance's stream() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
+	"""
+	for line in Link(**kwargs).stream(*args):
+		click.echo(line)
 
 class Link(Command):
 	"""
@@ -39,13 +55,42 @@ class Link(Command):
 							   is copied.
 		http (regex): A compiled regular-expression object matching a
 					  HTTP(S) protocol, for URL-checking.
+		shortened (lnk.cache.Cache|None): The persistent cache of short urls
+										  for long urls, if enabled.
+		expanded (lnk.cache.Cache|None): The persistent cache of long urls
+										 for short urls, if enabled.
 	"""
 
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, cache=None, failures=None):
+		"""
+		Constructs a new Link command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			cache (bool): Whether to look up (and store) short and long urls
+						  in the persistent caches. Defaults to the 'cache'
+						  setting of lnk.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Link, self).__init__('link')
 		self.raw = raw
+		self.failures = failures
 		self.already_copied = False
 		self.http = re.compile(r'https?://')
+		if cache is None:
+			cache = lnk.config.get('lnk', 'settings')['cache']
+		self.shortened = None
+		self.expanded = None
+		if cache:
+			# The stored credentials, not (possibly) refreshed ones
+			stored = self.credentials.storage.get()
+			account = lnk.cache.account(stored and stored.refresh_token)
+			namespace = 'googl/shorten/{0}'.format(account)
+			self.shortened = lnk.cache.Cache.shared(namespace)
+			# What a short url expands to is the same for every account
+			self.expanded = lnk.cache.Cache.shared('googl/expand')
 
 	def fetch(self, copy, quiet, expand, shorten, pretty):
 		"""
@@ -88,18 +133,57 @@ class Link(Command):
 		Returns:
 			A list of lines for output.
 		"""
-		lines = []
-		threads = []
-		for url in urls:
-			if not self.http.match(url):
-				url = 'http://{0}'.format(url)
-				if not quiet:
-					lnk.errors.warn("Prepending 'http://' to '{0}'".format(url))
-			self.queue.put(url)
-			threads.append(self.new_thread(self.shorten, lines, copy))
-		self.join(threads)
+		prepended = [self.prepend(url, quiet) for url in urls]
+
+		return self.map(self.shorten, prepended, copy)
+
+	def stream(self, copy, quiet, urls, ordered=True):
+		"""
+		Shortens urls as they are read, yielding each line once it is ready.
+
+		Unlike fetch(), this method does not collect all results before
+		returning, but consumes the urls lazily and yields their lines as
+		soon as they were shortened, with only a bounded number of requests
+		in flight. It is thus suited for very large inputs, e.g. piped from
+		stdin, for which nothing would be output until the very end otherwise.
+
+		Arguments:
+			copy (bool): Whether or not to copy the first url to the clipboard.
+			quiet (bool): Whether or not to swallow warnings about urls
+						  having to be modified because they do not have
+						  a protocol specified (i.e. no 'http://').
+			urls (iterable): The long urls to shorten (e.g. an open file).
+							 Surrounding whitespace and blank lines are
+							 ignored.
+			ordered (bool): Whether to yield the lines in the order of the
+							urls or in the order in which they finish.
+
+		Returns:
+			A generator over lines of the schema '<url> => <short>'.
+		"""
+		self.already_copied = False
+		urls = (self.prepend(url.strip(), quiet) for url in urls if url.strip())
 
-		return lines
+		return self.imap(self.shorten, urls, (copy,), ordered)
+
+	def prepend(self, url, quiet):
+		"""
+		Prepends the HTTP protocol to a url if it has none.
+
+		Arguments:
+			url (str): The url to check.
+			quiet (bool): Whether or not to swallow the warning issued
+						  when the url has to be modified.
+
+		Returns:
+			The url, starting with a protocol.
+		"""
+		if not self.http.match(url):
+			url = 'http://{0}'.format(url)
+			if not quiet:
+				lnk.errors.warn("Prepending 'http://' to '{0}'".format(url))
+
+		return url
 
 	def expand_urls(self, copy, urls):
 		"""
@@ -112,66 +196,75 @@ class Link(Command):
 		Returns:
 			A list of lines for output.
 		"""
-		lines = []
-		threads = []
-		for url in urls:
-			self.queue.put(url)
-			threads.append(self.new_thread(self.expand, lines, copy))
-		self.join(threads)
+		return self.map(self.expand, urls, copy)
 
-		return lines
-
-	def shorten(self, lines, copy):
+	def shorten(self, url, copy):
 		"""
-		Requests a shortend link and appends it to a given list.
+		Requests a shortend link and returns a line for it.
 
 		A shortened link is retrieved via get_short(), then (possibly)
-		copied to the clipboard via copy(), then appended to the given
-		list in a thread-safe (locked) way.
+		copied to the clipboard via copy(). This method is run on the
+		command's executor for each url.
 
 		Arguments:
-			lines (list): The list of lines to append the url to.
+			url (str): The long url to shorten.
 			copy (bool): Whether or not to copy the link to the clipboard
+						 (if no other link has already been copied).
+
+		Returns:
+			A line of the schema '<url> => <short>'.
 		"""
-		url = self.queue.get()
 		short = self.get_short(url)
 		formatted = self.copy(copy, short)
-		with self.lock:
-			lines.append('{0} => {1}'.format(url, formatted))
 
-	def expand(self, lines, copy):
+		return '{0} => {1}'.format(url, formatted)
+
+	def expand(self, url, copy):
 		"""
-		Requests an expanded link and appends it to a given list.
+		Requests an expanded link and returns a line for it.
 
 		An expanded link is retrieved via get_long(), then (possibly)
-		copied to the clipboard via copy(), then appended to the given
-		list in a thread-safe (locked) way.
+		copied to the clipboard via copy(). This method is run on the
+		command's executor for each url.
 
 		Arguments:
-			lines (list): The list of lines to append the url to.
+			url (str): The short url to expand.
 			copy (bool): Whether or not to copy the link to the clipboard
 						 (if no other link has already been copied).
+
+		Returns:
+			A line of the schema '<url> => <expanded>'.
 		"""
-		url = self.queue.get()
 		expanded = self.get_long(url)
 		formatted = self.copy(copy, expanded)
-		with self.lock:
-			lines.append('{0} => {1}'.format(url, formatted))
+
+		return '{0} => {1}'.format(url, formatted)
 
 	def get_short(self, url):
 		"""
 		Requests and returns a short url for a long one.
 
+		The url is first looked up in the cache (if enabled), such that urls
+		shortened before are not requested again.
+
 		Arguments:
 			url (str): The long url to shorten.
 
 		Returns:
 			The shortened link.
 		"""
-		api = self.get_api()
-		request = api.insert(body=dict(longUrl=url))
+		if self.shortened:
+			short = self.shortened.get(url)
+			if short is not None:
+				return short
+		request = self.get_api().insert(body=dict(longUrl=url))
 		what = "shorten url '{0}'".format(url)
-		response = self.execute(request, what)
+		response = self.coalesce(('url.insert', url),
+								 self.execute,
+								 request,
+								 what)
+		if self.shortened:
+			self.shortened.put(url, response['id'])
 
 		return response['id']
 
@@ -179,13 +272,23 @@ class Link(Command):
 		"""
 		Requests and returns an expanded url for a short one.
 
+		If the cache is enabled, short urls expanded before are not
+		requested again. Only links whose status is 'OK' are cached, such
+		that warnings about malware and removed links are never missed.
+
 		Arguments:
 			url (str): The short goo.gl link (bitlink) to expand.
 
 		Returns:
 			The expanded link.
 		"""
+		if self.expanded:
+			expanded = self.expanded.get(url)
+			if expanded is not None:
+				return expanded
 		response = self.get(url, what="expand url '{0}'".format(url))
+		if self.expanded and response['status'] == 'OK':
+			self.expanded.put(url, response['longUrl'])
 
 		if response['status'] in ['MALWARE', 'PHISHING']:
 			what = "Careful! goo.gl believes the url '{0}' is {1}!"
@@ -216,9 +319,11 @@ class Link(Command):
 			to fetch(), else the url, formatted with ecstasy to appear bold
 			in the terminal.
 		"""
-		if copy and not self.already_copied:
+		with self.lock:
+			if not copy or self.already_copied:
+				return url
 			self.already_copied = True
-			pyperclip.copy(url)
-			url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
+		pyperclip.copy(url)
+		url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
 
 		return url
@@ -14,15 +14,17 @@ import lnk.countries
 
 from lnk.googl.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a stats command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to a
 						 Stats instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Stats constructor (e.g. 'failures').
 	"""
-	click.echo(Stats().fetch(*args))
+	click.echo(Stats(**kwargs).fetch(*args))
 
 class Stats(Command):
 	"""
@@ -44,9 +46,19 @@ class Stats(Command):
 		raw (bool): Whether to return the output in raw format for internal use,
 					or in a pretty string-representation for outside-display.
 	"""
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, failures=None):
+		"""
+		Constructs a new Stats command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Stats, self).__init__('stats')
 		self.raw = raw
+		self.failures = failures
 
 	def fetch(self, only, hide, times, forever, limit, add_info, full, urls):
 		"""
@@ -76,27 +88,21 @@ class Stats(Command):
 		sets = lnk.abstract.filter_sets(self.sets, only, hide)
 		timespans = self.get_timespans(times, forever)
 
-		results = []
-		threads = []
-		for url in urls:
-			self.queue.put(url)
-			args = (results, sets, timespans, add_info, full, limit)
-			thread = self.new_thread(self.get_stats, *args)
-			threads.append(thread)
-		self.join(threads)
+		args = (sets, timespans, add_info, full, limit)
+		results = self.map(self.get_stats, urls, *args)
 
 		return results if self.raw else lnk.beauty.boxify(results)
 
-	def get_stats(self, results, sets, timespans, add_info, full, limit):
+	def get_stats(self, url, sets, timespans, add_info, full, limit):
 		"""
 		Retrieves the statistics for a single url.
 
 		The statistics returned are for all timespans supplied, filtered
-		according to the sets of statistics wanted.
+		according to the sets of statistics wanted. This method is run on
+		the command's executor for each url.
 
 		Arguments:
-			results (list): The list of results to which to append the
-							retreived data.
+			url (str): The goo.gl link to retrieve statistics for.
 			sets (tuple): The sets of statistics wanted in the response
 						 (others are discarded).
 			timespans (tuple): A tuple of tuples of the schema (<span>, <unit>),
@@ -108,20 +114,20 @@ class Stats(Command):
 						 abbreviations.
 			limit (int): A limit to the number of data-points selected for each
 						 timespan.
+
+		Returns:
+			The list of lines for the url (see lineify()).
 		"""
-		data = self.request(add_info)
-		lines = self.lineify(data, sets, timespans, full, limit)
-		with self.lock:
-			results.append(lines)
+		data = self.request(url, add_info)
 
-	def request(self, add_info):
+		return self.lineify(data, sets, timespans, full, limit)
+
+	def request(self, url, add_info):
 		"""
 		Requests statistics for a given configuration.
 
-		The url for which to retrieve statistics is fetched from the queue
-		attribute (thread-safe).
-
 		Arguments:
+			url (str): The goo.gl link to request statistics for.
 			add_info (bool): Whether to add information about the URL as well.
 
 		Returns:
@@ -137,7 +143,6 @@ class Stats(Command):
 			found with the 'count' key.
 
 		"""
-		url = self.queue.get()
 		what = "get information for '{0}'".format(url)
 		data = self.get(url, 'FULL', what)
 
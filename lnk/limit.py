@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Rate-limiting of the requests made to the APIs of the services."""
+
+import os.path
+import threading
+import time
+
+try:
+	import fcntl
+except ImportError:
+	# Not available on Windows, where limits are per process only
+	fcntl = None
+
+import lnk.config
+
+# Not affected by changes of the system time (Python 3.3+)
+monotonic = getattr(time, 'monotonic', time.time)
+
+class Limiter(object):
+	"""
+	A token bucket, limiting the rate of requests to an API.
+
+	The APIs of bit.ly and goo.gl limit the number of requests per access
+	token (e.g. per minute). Rather than firing requests as fast as threads
+	can make them and being rejected once the limit is reached, each request
+	takes a token from a bucket first. The bucket holds at most 'burst'
+	tokens and is refilled at 'rate' tokens per second, so that short bursts
+	are served at once while the sustained rate never exceeds the limit.
+
+	A request finding the bucket empty reserves the next token nonetheless
+	(the bucket goes into debt) and sleeps until the token is due, such that
+	requests are served in the order in which they arrived and each takes
+	the lock only once. The state of the bucket can optionally be kept in a
+	file, locked while it is updated, which the requests of all concurrent
+	lnk processes then share.
+
+	Attributes:
+		rate (float): The number of tokens added per second.
+		burst (float): The maximum number of tokens in the bucket.
+		path (str|None): The path to the file holding the shared state of the
+						 bucket, or None if it is kept in this process only.
+		tokens (float): The number of tokens in the bucket (negative while
+						tokens are reserved in advance).
+		updated (float): The time at which the tokens were counted.
+		lock (threading.Lock): The lock under which the bucket is updated.
+		clock (func): The clock to measure time with (in seconds). The
+					  wall-clock if the state is shared between processes
+					  (as it is the only clock they share), else a monotonic
+					  clock where available.
+		limiters (dict): Class-attribute holding the limiters returned by
+						 shared(), by their names.
+	"""
+
+	limiters = {}
+	limiters_lock = threading.Lock()
+
+	def __init__(self, rate, burst=1, path=None):
+		"""
+		Constructs a new Limiter, with a full bucket.
+
+		Arguments:
+			rate (float): The number of requests allowed per second.
+			burst (float): The number of requests allowed at once.
+			path (str): Optionally, the path to a file holding the state of
+						the bucket, to share it with other processes.
+		"""
+		self.rate = float(rate)
+		self.burst = float(burst)
+		self.path = path if fcntl else None
+		self.clock = time.time if self.path else monotonic
+		self.tokens = self.burst
+		self.updated = self.clock()
+		self.lock = threading.Lock()
+
+	@classmethod
+	def shared(cls, name, settings):
+		"""
+		Returns the process-wide limiter of a service and account.
+
+		Arguments:
+			name (str): The name of the limiter, e.g. made of the service
+						and the account (see lnk.cache.account()).
+			settings (dict): The 'limit' settings of the service, with the
+							 'rate' (per second) and 'burst' and whether the
+							 limit is shared with other processes ('shared').
+
+		Returns:
+			The one Limiter for the name, constructed on the first call.
+		"""
+		with cls.limiters_lock:
+			if name not in cls.limiters:
+				path = None
+				if settings.get('shared'):
+					filename = '.limit-{0}'.format(name.replace('/', '-'))
+					path = os.path.join(lnk.config.CONFIG_PATH, filename)
+				cls.limiters[name] = cls(settings['rate'],
+										 settings.get('burst', 1),
+										 path)
+
+		return cls.limiters[name]
+
+	def acquire(self):
+		"""
+		Waits until the next request is allowed.
+
+		Returns:
+			The number of seconds waited.
+		"""
+		delay = self.reserve()
+		if delay > 0:
+			time.sleep(delay)
+
+		return delay
+
+	def reserve(self):
+		"""
+		Takes a token from the bucket, without waiting for it.
+
+		Returns:
+			The number of seconds until the token is due (zero if the bucket
+			was not empty).
+		"""
+		with self.lock:
+			if self.path:
+				return self.reserve_shared()
+			now = self.clock()
+			self.tokens = self.take(self.tokens, self.updated, now)
+			self.updated = now
+
+			return max(0.0, -self.tokens / self.rate)
+
+	def reserve_shared(self):
+		"""
+		Takes a token from the bucket whose state is kept in the file.
+
+		Returns:
+			The number of seconds until the token is due.
+		"""
+		with open(self.path, 'a+') as state:
+			fcntl.flock(state, fcntl.LOCK_EX)
+			try:
+				state.seek(0)
+				fields = state.read().split()
+				now = self.clock()
+				if len(fields) == 2:
+					tokens = self.take(float(fields[0]), float(fields[1]), now)
+				else:
+					tokens = self.take(self.burst, now, now)
+				state.seek(0)
+				state.truncate()
+				state.write('{0!r} {1!r}'.format(tokens, now))
+				state.flush()
+			finally:
+				fcntl.flock(state, fcntl.LOCK_UN)
+
+		return max(0.0, -tokens / self.rate)
+
+	def take(self, tokens, updated, now):
+		"""
+		Refills a bucket for the time passed and takes one token from it.
+
+		Arguments:
+			tokens (float): The number of tokens counted last.
+			updated (float): The time at which they were counted.
+			now (float): The current time.
+
+		Returns:
+			The number of tokens left (negative if the token is not yet due).
+		"""
+		tokens += max(0.0, now - updated) * self.rate
+
+		return min(tokens, self.burst) - 1
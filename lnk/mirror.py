@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""A local (SQLite) mirror of the link-histories of the services."""
+
+import os.path
+import sqlite3
+
+from collections import namedtuple
+
+import lnk.config
+
+class Mirror(object):
+	"""
+	A local copy of a service's link-history, kept in an SQLite database.
+
+	Rather than downloading the whole link-history for every history
+	command, the history commands can (if the 'mirror' setting is set)
+	keep a mirror of it. Besides the links, the mirror stores a high-water
+	mark per service and account: the time of creation of the newest link
+	mirrored. The histories of different accounts are kept apart, since
+	switching accounts (e.g. with 'lnk bitly key') switches histories.
+	Each command then only fetches the links created since (see
+	synchronize() of the history commands) and answers all time-ranges
+	from an index on the time of creation. Links are never removed from
+	the mirror (the APIs do not tell which links were removed).
+
+	The mirror is a drop-in replacement for a lnk.timeline.Timeline, in
+	that its between() method takes the same arguments and returns the
+	same records (see Mirror.Url).
+
+	Attributes:
+		service (str): The name of the service whose history is mirrored.
+		account (str): The name of the account whose history is mirrored
+					   (see lnk.cache.account()).
+		key (str): The key of the history in the database, made of the
+				   names of the service and the account.
+		path (str): The path to the database file.
+		encode (func): Converts a time of creation to the value stored in
+					   the database, which must sort chronologically.
+		decode (func): Converts a stored value back to a time of creation.
+		connection (sqlite3.Connection): The connection to the database.
+		Url (namedtuple): Class-attribute namedtuple to represent a link
+						  with a short, long/expanded url and a creation
+						  date.
+	"""
+
+	Url = namedtuple('Url', ['short', 'long', 'created'])
+
+	schema = '''
+		CREATE TABLE IF NOT EXISTS links (
+			service TEXT NOT NULL,
+			short TEXT NOT NULL,
+			long TEXT,
+			created NOT NULL,
+			PRIMARY KEY (service, short)
+		);
+		CREATE INDEX IF NOT EXISTS links_created ON links (service, created);
+		CREATE TABLE IF NOT EXISTS marks (
+			service TEXT PRIMARY KEY,
+			created NOT NULL
+		);
+	'''
+
+	def __init__(self,
+				 service,
+				 path=None,
+				 encode=None,
+				 decode=None,
+				 account='anonymous'):
+		"""
+		Opens (and, if necessary, creates) the mirror of a service.
+
+		Arguments:
+			service (str): The name of the service (e.g. 'bitly').
+			path (str): Optionally, the path to the database file. The one
+						at lnk/config/.mirror will be chosen by default.
+			encode (func): Optionally, a function converting times of
+						   creation for storage (e.g. datetime objects to
+						   strings). By default, they are stored as they are.
+			decode (func): Optionally, the inverse of encode.
+			account (str): The name of the account (see lnk.cache.account()),
+						   'anonymous' by default.
+		"""
+		self.service = service
+		self.account = account
+		self.key = '{0}/{1}'.format(service, account)
+		self.path = path or os.path.join(lnk.config.CONFIG_PATH, '.mirror')
+		self.encode = encode or (lambda created: created)
+		self.decode = decode or (lambda created: created)
+		self.connection = sqlite3.connect(self.path)
+		with self.connection:
+			self.connection.executescript(Mirror.schema)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def mark(self):
+		"""
+		Returns the high-water mark of the mirror.
+
+		Returns:
+			The time of creation of the newest link mirrored, or None if
+			no link was mirrored yet.
+		"""
+		row = self.connection.execute('SELECT created FROM marks '
+									  'WHERE service = ?',
+									  (self.key,)).fetchone()
+
+		return self.decode(row[0]) if row else None
+
+	def update(self, urls):
+		"""
+		Adds links to the mirror and advances its high-water mark.
+
+		Both happen in one transaction, such that the mark never claims
+		links that were not stored (e.g. if a synchronization is aborted).
+		Links already mirrored are replaced.
+
+		Arguments:
+			urls (iterable): The links, as records with 'short', 'long'
+							 and 'created' attributes.
+		"""
+		rows = [(self.key, url.short, url.long, self.encode(url.created))
+				for url in urls]
+		if not rows:
+			return
+		newest = max(row[3] for row in rows)
+		with self.connection:
+			self.connection.executemany('INSERT OR REPLACE INTO links '
+										'VALUES (?, ?, ?, ?)', rows)
+			self.connection.execute('INSERT OR IGNORE INTO marks '
+									'VALUES (?, ?)', (self.key, newest))
+			self.connection.execute('UPDATE marks SET created = MAX(created, ?) '
+									'WHERE service = ?', (newest, self.key))
+
+	def between(self, begin=None, end=None, limit=None):
+		"""
+		Returns the mirrored links created within a time-range.
+
+		Arguments:
+			begin (?): The lower bound of the time-range (inclusive), or
+					   None if the time-range has no lower bound.
+			end (?): The upper bound of the time-range (inclusive), or
+					 None if the time-range has no upper bound.
+			limit (int): Optionally, the maximum number of links to return
+						 (the newest ones are kept).
+
+		Returns:
+			A list of Mirror.Url records, from newest to oldest.
+		"""
+		query = 'SELECT short, long, created FROM links WHERE service = ?'
+		parameters = [self.key]
+		if begin is not None:
+			query += ' AND created >= ?'
+			parameters.append(self.encode(begin))
+		if end is not None:
+			query += ' AND created <= ?'
+			parameters.append(self.encode(end))
+		# A negative limit means no limit for SQLite
+		query += ' ORDER BY created DESC LIMIT ?'
+		parameters.append(-1 if limit is None else limit)
+		rows = self.connection.execute(query, parameters)
+
+		return [Mirror.Url(short, expanded, self.decode(created))
+				for short, expanded, created in rows]
+
+	def close(self):
+		"""Closes the connection to the database."""
+		self.connection.close()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Retrying of requests that failed for transient reasons."""
+
+import click
+import ecstasy
+import email.utils
+import random
+import requests
+import socket
+import threading
+import time
+
+from collections import namedtuple
+
+# Errors for which a request can be made again as it is
+TRANSIENT = (requests.exceptions.ConnectionError,
+			 requests.exceptions.Timeout,
+			 socket.timeout)
+
+# Not affected by changes of the system time (Python 3.3+)
+monotonic = getattr(time, 'monotonic', time.time)
+
+def status(outcome):
+	"""
+	Returns the HTTP status of the outcome of a request.
+
+	Arguments:
+		outcome (?): The response to the request (e.g. a requests.Response)
+					 or the exception it raised (e.g. an HttpError of the
+					 goo.gl API client, holding the response as 'resp').
+
+	Returns:
+		The HTTP status code, or None if the outcome has none.
+	"""
+	code = getattr(outcome, 'status_code', None)
+	if code is None:
+		code = getattr(getattr(outcome, 'resp', None), 'status', None)
+
+	return int(code) if code is not None else None
+
+def retry_after(outcome):
+	"""
+	Returns the delay a server asked for with a 'Retry-After' header.
+
+	Arguments:
+		outcome (?): The response to the request, or the exception it raised
+					 (see status()).
+
+	Returns:
+		The number of seconds to wait, or None if there was no (valid) header.
+	"""
+	headers = getattr(outcome, 'headers', None)
+	if headers is None:
+		# httplib2 responses are dictionaries of lowercase headers
+		headers = getattr(outcome, 'resp', None)
+	if not hasattr(headers, 'get'):
+		return None
+	value = headers.get('Retry-After') or headers.get('retry-after')
+	if not value:
+		return None
+	value = value.strip()
+	if value.isdigit():
+		return float(value)
+	parsed = email.utils.parsedate_tz(value)
+	if parsed is None:
+		return None
+
+	return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+def summary():
+	"""
+	Returns the retry counters of all shared policies.
+
+	Returns:
+		A dictionary mapping the name of each policy returned by
+		Policy.shared() (so far) to its Policy.Statistics.
+	"""
+	with Policy.policies_lock:
+		policies = dict(Policy.policies)
+	summary = {}
+	for name, policy in policies.items():
+		summary[name] = policy.statistics()
+
+	return summary
+
+def report():
+	"""
+	Outputs the retry counters of all services for which requests had to
+	be retried (to stderr, so as not to mix with the output of commands).
+	"""
+	# Only the label is styled, as ecstasy would parse the parentheses
+	label = ecstasy.beautify('<Retries>', ecstasy.Color.Yellow)
+	for name, statistics in sorted(summary().items()):
+		if not statistics.retries:
+			continue
+		what = '{0}: {1.retries} for {1.retried} of {1.requests} {2} requests'
+		what = what.format(label, statistics, name)
+		if statistics.failures:
+			what += ' ({0} failed nonetheless)'.format(statistics.failures)
+		click.echo(what, err=True)
+
+class Policy(object):
+	"""
+	A policy for retrying requests that failed for transient reasons.
+
+	A single failed request (e.g. a rate-limit that was hit or a gateway
+	timing out) would otherwise abort a whole batch of requests. Instead,
+	requests failing with a retryable HTTP status or a transient error
+	(e.g. a dropped connection) are made again, up to a maximum number of
+	attempts. Between attempts, the policy waits exponentially longer
+	(starting at 'base' seconds, at most 'cap' seconds), with random
+	(full) jitter so that concurrent requests do not retry in lockstep.
+	If the server tells how long to wait (via a 'Retry-After' header),
+	this is honored instead. No attempt is made once a request would
+	exceed its deadline. The last response (or error) is then handed to
+	the caller as if it had not been retried.
+
+	Attributes:
+		attempts (int): The maximum number of attempts per request.
+		base (float): The delay before the first retry, in seconds.
+		cap (float): The maximum delay between attempts, in seconds.
+		jitter (bool): Whether to randomize delays (between zero and the
+					   exponential delay).
+		statuses (set): The HTTP statuses for which to retry.
+		deadline (float): The maximum number of seconds a request (with all
+						  its attempts) may take.
+		errors (tuple): The exception classes for which to retry.
+		requests (int): The number of requests made (counted once each).
+		retried (int): The number of requests that were retried.
+		retries (int): The number of retries (further attempts) made.
+		failures (int): The number of retried requests that failed anyway.
+		lock (threading.Lock): A lock for thread-safe counting.
+		defaults (dict): Class-attribute holding the default settings.
+		Statistics (namedtuple): Class-attribute namedtuple holding the
+								 counters of a policy.
+	"""
+
+	Statistics = namedtuple('Statistics', ['requests',
+										   'retried',
+										   'retries',
+										   'failures'])
+
+	defaults = {
+		'attempts': 4,
+		'base': 0.5,
+		'cap': 30,
+		'jitter': True,
+		# Too many requests and server-side errors
+		'statuses': [429, 500, 502, 503, 504],
+		'deadline': 120
+	}
+
+	policies = {}
+	policies_lock = threading.Lock()
+
+	def __init__(self, settings=None, errors=TRANSIENT):
+		"""
+		Constructs a new Policy.
+
+		Arguments:
+			settings (dict): Optionally, settings following the schema of the
+							 'defaults' class attribute (the default is used
+							 for any setting missing).
+			errors (tuple): The exception classes for which to retry.
+		"""
+		config = dict(Policy.defaults)
+		config.update(settings or {})
+		self.attempts = max(1, int(config['attempts']))
+		self.base = float(config['base'])
+		self.cap = float(config['cap'])
+		self.jitter = config['jitter']
+		self.statuses = set(config['statuses'])
+		self.deadline = float(config['deadline'])
+		self.errors = tuple(errors)
+		self.requests = 0
+		self.retried = 0
+		self.retries = 0
+		self.failures = 0
+		self.lock = threading.Lock()
+
+	@classmethod
+	def shared(cls, name, settings=None, errors=TRANSIENT):
+		"""
+		Returns the process-wide policy of a service.
+
+		Arguments:
+			name (str): The name of the service (e.g. 'bitly').
+			settings (dict): Optionally, the 'retry' settings of the service
+							 (only used when the policy is constructed).
+			errors (tuple): The exception classes for which to retry (only
+							used when the policy is constructed).
+
+		Returns:
+			The one Policy for the name, constructed on the first call.
+		"""
+		with cls.policies_lock:
+			if name not in cls.policies:
+				cls.policies[name] = cls(settings, errors)
+
+		return cls.policies[name]
+
+	def call(self, function, args=(), kwargs=None, status=status):
+		"""
+		Calls a function making a request, retrying as the policy allows.
+
+		Arguments:
+			function (func): The function making the request.
+			args (tuple): The positional arguments to pass to the function.
+			kwargs (dict): The keyword arguments to pass to the function.
+			status (func): A function returning the HTTP status of a response
+						   or exception (see lnk.retry.status()).
+
+		Returns:
+			The return value of the last attempt.
+
+		Raises:
+			The exception raised by the last attempt, if any.
+		"""
+		kwargs = kwargs or {}
+		start = monotonic()
+		attempt = 1
+		while True:
+			try:
+				outcome = function(*args, **kwargs)
+				failed = status(outcome) in self.statuses
+			except self.errors as error:
+				outcome, failed = error, True
+			except Exception as error:
+				outcome, failed = error, status(error) in self.statuses
+				if not failed:
+					raise
+			delay = self.decide(attempt, outcome, failed, monotonic() - start)
+			if delay is None:
+				if isinstance(outcome, Exception):
+					raise outcome
+				return outcome
+			time.sleep(delay)
+			attempt += 1
+
+	def decide(self, attempt, outcome, failed, elapsed):
+		"""
+		Decides whether to make another attempt at a request.
+
+		Shared by call() and the asyncio backend (see lnk.aio), which makes
+		its attempts on an event loop rather than by calling a function.
+
+		Arguments:
+			attempt (int): The number of the attempt just made (from 1).
+			outcome (?): The response of that attempt (or its exception).
+			failed (bool): Whether the attempt failed (retryably).
+			elapsed (float): The number of seconds since the first attempt.
+
+		Returns:
+			The number of seconds to wait before the next attempt, or None if
+			the request is done (in which case it is counted).
+		"""
+		if failed:
+			delay = self.delay(attempt, outcome)
+			if attempt < self.attempts and elapsed + delay <= self.deadline:
+				return delay
+		self.count(attempt, failed)
+
+		return None
+
+	def delay(self, attempt, outcome=None):
+		"""
+		Returns the number of seconds to wait before the next attempt.
+
+		Arguments:
+			attempt (int): The number of the attempt that failed (from 1).
+			outcome (?): The response of that attempt (or its exception),
+						 whose 'Retry-After' header is honored, if any.
+
+		Returns:
+			The delay, in seconds.
+		"""
+		requested = retry_after(outcome)
+		if requested is not None:
+			return requested
+		delay = min(self.cap, self.base * 2 ** (attempt - 1))
+		if self.jitter:
+			delay = random.uniform(0, delay)
+
+		return delay
+
+	def count(self, attempts, failed):
+		"""
+		Counts a request once it was answered (or given up on).
+
+		Arguments:
+			attempts (int): The number of attempts made for the request.
+			failed (bool): Whether the last attempt failed.
+		"""
+		with self.lock:
+			self.requests += 1
+			if attempts > 1:
+				self.retried += 1
+				self.retries += attempts - 1
+				if failed:
+					self.failures += 1
+
+	def statistics(self):
+		"""Returns the counters of the policy as Policy.Statistics."""
+		with self.lock:
+			return Policy.Statistics(self.requests,
+									 self.retried,
+									 self.retries,
+									 self.failures)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""Shared HTTP connection-pooling for the commands of a service."""
+
+import requests
+import requests.adapters
+import threading
+
+class Session(object):
+	"""
+	A lazily-constructed, thread-safe pool of keep-alive HTTP connections.
+
+	Every call to requests.get() or requests.post() sets up (and tears down)
+	a new TCP connection, plus a TLS handshake for HTTPS APIs such as bit.ly.
+	A Session instead owns a single requests.Session whose connection pools
+	are shared by every command of a service and by all the threads those
+	commands start, such that connections are re-used across requests. The
+	underlying requests.Session is only constructed when the first request
+	is made, with the settings passed at that point (usually the 'connections'
+	settings from the service's configuration file).
+
+	Attributes:
+		lock (threading.Lock): A lock to construct the session only once,
+							   even when many threads request it at once.
+		session (requests.Session|None): The underlying session, or None if
+										 no request was made yet.
+		defaults (dict): The default connection settings, used for any
+						 setting not specified in the configuration file.
+	"""
+
+	defaults = {
+		# The number of (host) connection pools to cache
+		'pools': 10,
+		# The maximum number of connections kept alive per host
+		'size': 10,
+		# Whether to keep connections alive in-between requests
+		'keep-alive': True,
+		# Whether to wait for a free connection rather than open a new one
+		# once 'size' connections to a host are in use (per-host limit)
+		'block': False
+	}
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.session = None
+
+	def get(self, settings=None):
+		"""
+		Returns the underlying requests.Session, constructing it if necessary.
+
+		Arguments:
+			settings (dict): Optionally, connection settings following the
+							 schema of the 'defaults' class attribute. Only
+							 used if the session was not yet constructed.
+
+		Returns:
+			The shared requests.Session object.
+		"""
+		# Double-checked so that the lock is only
+		# acquired while the session is being set up
+		if self.session is None:
+			with self.lock:
+				if self.session is None:
+					self.session = self.create(settings)
+
+		return self.session
+
+	def request(self, method, url, settings=None, **kwargs):
+		"""
+		Performs an HTTP request over a pooled connection.
+
+		Arguments:
+			method (str): The HTTP method (e.g. 'GET').
+			url (str): The full URL of the request.
+			settings (dict): Optionally, connection settings (see get()).
+			kwargs (variadic): Any keyword arguments accepted by
+							   requests.Session.request().
+
+		Returns:
+			The requests.Response object resulting from the request.
+		"""
+		return self.get(settings).request(method, url, **kwargs)
+
+	def close(self):
+		"""Closes all pooled connections (a new session is made on demand)."""
+		with self.lock:
+			if self.session is not None:
+				self.session.close()
+				self.session = None
+
+	@staticmethod
+	def create(settings=None):
+		"""
+		Constructs a new requests.Session with the given connection settings.
+
+		Arguments:
+			settings (dict): Connection settings, falling back to the 'defaults'
+							 class attribute for any missing setting.
+
+		Returns:
+			A requests.Session with HTTP and HTTPS adapters mounted.
+		"""
+		config = dict(Session.defaults)
+		config.update(settings or {})
+
+		session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_connections=config['pools'],
+												pool_maxsize=config['size'],
+												pool_block=config['block'])
+		session.mount('http://', adapter)
+		session.mount('https://', adapter)
+		if not config['keep-alive']:
+			session.headers['Connection'] = 'close'
+
+		return session
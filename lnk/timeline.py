@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#! -*- coding: utf-8 -*-
+
+"""A sorted in-memory index of links, for answering time-ranges locally."""
+
+import bisect
+import operator
+
+class Timeline(object):
+	"""
+	Links (or other records) indexed by their time of creation.
+
+	The link-histories of the APIs list links from newest to oldest. Rather
+	than requesting the history once per time-range wanted, or scanning all
+	links for each range, a history can be fetched once and added to a
+	Timeline, which keeps its records sorted by time of creation and
+	answers each time-range by bisection (in logarithmic time). Records may
+	be added in batches (e.g. page by page), in which case they are only
+	re-sorted once the next query is made.
+
+	Attributes:
+		key (func): The function returning the time of creation of a record
+					(any comparable value, e.g. an int or a datetime).
+		records (list): The records, sorted from oldest to newest.
+		keys (list): The times of creation of the records, in the same order.
+		pending (list): Records added since the records were last sorted.
+	"""
+	def __init__(self, records=None, key=operator.attrgetter('created')):
+		self.key = key
+		self.records = []
+		self.keys = []
+		self.pending = []
+		if records:
+			self.add(records)
+
+	def __len__(self):
+		return len(self.records) + len(self.pending)
+
+	def add(self, records):
+		"""
+		Adds records to the timeline.
+
+		Arguments:
+			records (iterable): The records, usually ordered from newest
+								to oldest (as listed by the APIs).
+		"""
+		self.pending += records
+
+	def between(self, begin=None, end=None, limit=None):
+		"""
+		Returns the records created within a time-range.
+
+		Arguments:
+			begin (?): The lower bound of the time-range (inclusive), or
+					   None if the time-range has no lower bound.
+			end (?): The upper bound of the time-range (inclusive), or
+					 None if the time-range has no upper bound.
+			limit (int): Optionally, the maximum number of records to return
+						 (the newest ones are kept).
+
+		Returns:
+			A list of the records within the time-range, from newest to
+			oldest. Records created at the same time keep the order in
+			which they were added.
+		"""
+		low, high = self.bounds(begin, end)
+		if limit is not None:
+			low = max(low, high - limit)
+
+		return list(reversed(self.records[low:high]))
+
+	def count(self, begin=None, end=None):
+		"""Returns the number of records within a time-range (see between())."""
+		low, high = self.bounds(begin, end)
+
+		return high - low
+
+	def oldest(self):
+		"""Returns the time of creation of the oldest record (None if empty)."""
+		self.sort()
+
+		return self.keys[0] if self.keys else None
+
+	def bounds(self, begin, end):
+		"""
+		Returns the indices of the records within a time-range.
+
+		Arguments:
+			begin (?): The inclusive lower bound, or None.
+			end (?): The inclusive upper bound, or None.
+
+		Returns:
+			A (<low>, <high>) tuple, such that self.records[low:high]
+			are the records within the time-range.
+		"""
+		self.sort()
+		low = 0 if begin is None else bisect.bisect_left(self.keys, begin)
+		high = len(self.keys)
+		if end is not None:
+			high = bisect.bisect_right(self.keys, end)
+
+		return low, max(low, high)
+
+	def sort(self):
+		"""Sorts any pending records into the timeline."""
+		if self.pending:
+			# Records are reversed (and put first) before the stable sort,
+			# such that records created at the same time end up in reverse
+			# order of addition, and thus in order of addition when returned
+			self.records = list(reversed(self.pending)) + self.records
+			self.records.sort(key=self.key)
+			self.keys = [self.key(record) for record in self.records]
+			self.pending = []
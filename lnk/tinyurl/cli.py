@@ -4,10 +4,12 @@
 """The command-line interface to the bit.ly client."""
 
 import click
+import itertools
 
 import lnk.cli
 import lnk.config
 import lnk.errors
+import lnk.failures
 
 import lnk.tinyurl.link
 
@@ -66,9 +68,53 @@ def main(context, verbose, level, args):
 @click.option('--pretty/--plain',
 			  default=link_config['settings']['pretty'],
 			  help='Whether to show the links in a pretty box or as a plain list.')
+@click.option('-i',
+			  '--input',
+			  'source',
+			  type=click.File('r'),
+			  metavar='FILE',
+			  help="Stream urls to shorten from a file ('-' for stdin).")
+@click.option('--ordered/--unordered',
+			  default=True,
+			  help='Whether to stream results in input or completion order.')
+@click.option('--cache/--no-cache',
+			  default=lnk_config['cache'],
+			  help='Whether to look up short urls in (and add them to) the '
+				   'local cache, rather than always requesting them.')
+@click.option('--partial/--strict',
+			  default=False,
+			  help='Whether to output the links that succeeded (as plain '
+				   'lines, as they complete) and report the urls that '
+				   'failed separately, or to abort at the first failure.')
+@click.option('--errors',
+			  type=click.Path(dir_okay=False, writable=True),
+			  metavar='FILE',
+			  help='Write the urls that failed to this JSON file (implies '
+				   '--partial).')
 @click.argument('urls', nargs=-1)
-def link(copy, quiet, shorten, urls, pretty):
+def link(copy, quiet, shorten, source, ordered, urls, pretty, cache, partial,
+		 errors):
 	"""Link shortening."""
-	if not urls and not shorten:
+	if not urls and not shorten and source is None:
 		raise lnk.errors.UsageError('Please supply at least one URL.')
-	lnk.tinyurl.link.echo(copy, quiet, shorten + urls, pretty)
+	failures = None
+	if partial or errors:
+		failures = lnk.failures.Failures(errors)
+	# In partial mode, the links that succeeded are output as they
+	# complete, rather than once all urls were (or failed to be) requested
+	if source is None and failures is None:
+		lnk.tinyurl.link.echo(copy,
+							  quiet,
+							  shorten + urls,
+							  pretty,
+							  cache=cache)
+	else:
+		urls = itertools.chain(shorten + urls, source or ())
+		lnk.tinyurl.link.stream(copy,
+								quiet,
+								urls,
+								ordered,
+								cache=cache,
+								failures=failures)
+	if failures is not None:
+		failures.report()
@@ -5,6 +5,7 @@
 
 import lnk.config
 import lnk.errors
+import lnk.session
 
 from lnk.abstract import AbstractCommand
 
@@ -16,11 +17,17 @@ class Command(AbstractCommand):
 	entire application, which needs information about the service being
 	used. Moreover sets up the necessary parameters needed for any request
 	to the bit.ly API (the api-key, the response-format and the provider).
+	All tinyurl commands are replayable (see AbstractCommand.replayable).
 
 	Attributes:
+		session (lnk.session.Session): Class-attribute holding the connection
+									   pool shared by all tinyurl commands.
 		parameters (dict): The necessary parameters for any request to the
 						   tinyurl API.
 	"""
+
+	session = lnk.session.Session()
+
 	def __init__(self, which):
 		super(Command, self).__init__('tinyurl', which)
 		with lnk.config.Manager('tinyurl') as manager:
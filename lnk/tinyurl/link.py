@@ -9,25 +9,45 @@ import pyperclip
 import re
 
 import lnk.beauty
+import lnk.cache
+import lnk.config
 import lnk.errors
 
 from lnk.tinyurl.command import Command
 
-def echo(*args):
+def echo(*args, **kwargs):
 	"""
 	Executes a link command and echoes its output.
 
 	Arguments:
 		args (variadic): The arguments to pass to an
 						 Link instance's fetch() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
 	"""
-	click.echo(Link().fetch(*args))
+	click.echo(Link(**kwargs).fetch(*args))
+
+def stream(*args, **kwargs):
+	"""
+	Executes a link command in streaming mode, echoing lines as they come.
+
+	Arguments:
+		args (variadic): The arguments to pass to a
+						 Link instance's stream() method.
+		kwargs (variadic): The keyword arguments to pass to the
+						   Link constructor (e.g. 'cache' or 'failures').
+	"""
+	for line in Link(**kwargs).stream(*args):
+		click.echo(line)
 
 class Link(Command):
 	"""
 	Class to shorten or expand a url using tinyurl.
 
-	This class can shorten a long url to a shortened tinyurl url.
+	This class can shorten a long url to a shortened tinyurl url. On the
+	asyncio backend, shorten() is called again until its request is
+	answered, so it warns about a prepended protocol, copies the url and
+	stores it in the cache only afterwards.
 
 	Attributes:
 		raw (bool): Whether to prettify the output or
@@ -37,12 +57,31 @@ class Link(Command):
 							   is copied.
 		http (regex): A compiled regular-expression object matching a
 					  HTTP(S) protocol, for URL-checking.
+		shortened (lnk.cache.Cache|None): The persistent cache of short urls
+										  for long urls, if enabled.
 	"""
-	def __init__(self, raw=False):
+	def __init__(self, raw=False, cache=None, failures=None):
+		"""
+		Constructs a new Link command.
+
+		Arguments:
+			raw (bool): Whether to return the output raw, for internal use.
+			cache (bool): Whether to look up (and store) short urls in the
+						  persistent cache. Defaults to the 'cache' setting
+						  of lnk.
+			failures (lnk.failures.Failures): Optionally, where to record the
+											  urls that failed, rather than
+											  aborting (partial mode).
+		"""
 		super(Link, self).__init__('link')
 		self.raw = raw
+		self.failures = failures
 		self.already_copied = False
 		self.http = re.compile(r'https?://')
+		if cache is None:
+			cache = lnk.config.get('lnk', 'settings')['cache']
+		# tinyurl has no accounts
+		self.shortened = lnk.cache.Cache.shared('tinyurl/shorten') if cache else None
 
 	def fetch(self, copy, quiet, urls, pretty):
 		"""
@@ -62,55 +101,96 @@ class Link(Command):
 			else a pretty list in a box if pretty is True, else the same
 			list as in the first case, but joined to a string for output.
 		"""
-		result = []
-		threads = []
-		for url in urls:
-			t = self.new_thread(self.shorten, result, copy, quiet, pretty, url)
-			threads.append(t)
-		self.join(threads)
+		result = self.map(self.shorten, urls, copy, quiet, pretty)
 
 		if self.raw:
 			return result
 		return lnk.beauty.boxify([result]) if pretty else '\n'.join(result)
 
-	def shorten(self, result, copy, quiet, pretty, url):
+	def stream(self, copy, quiet, urls, ordered=True):
+		"""
+		Shortens urls as they are read, yielding each line once it is ready.
+
+		Unlike fetch(), this method does not collect all results before
+		returning, but consumes the urls lazily and yields their lines as
+		soon as they were shortened, with only a bounded number of requests
+		in flight. Since lines may be yielded out of order, each line names
+		its long url.
+
+		Arguments:
+			copy (bool): Whether or not to copy the first url to the clipboard.
+			quiet (bool): Whether or not to swallow warnings about urls
+						  having to be modified because they do not have
+						  a protocol specified (i.e. no 'http://').
+			urls (iterable): The long urls to shorten (e.g. an open file).
+							 Surrounding whitespace and blank lines are
+							 ignored.
+			ordered (bool): Whether to yield the lines in the order of the
+							urls or in the order in which they finish.
+
+		Returns:
+			A generator over lines of the schema '<long> => <url>'.
+		"""
+		self.already_copied = False
+		urls = (url.strip() for url in urls if url.strip())
+
+		return self.imap(self.shorten, urls, (copy, quiet, True), ordered)
+
+	def shorten(self, url, copy, quiet, pretty):
 		"""
 		Shortens a long url.
 
+		This method is run on the command's executor for each url.
+
 		Arguments:
-			result (list): The list to which to append the shortened url.
+			url (str): The long url to shorten.
 			copy (bool): Whether or not to copy the first url to the clipboard.
 			quiet (bool): Whether or not to swallow warnings about urls
 						  having to be modified because they do not have
 						  a protocol specified (i.e. no 'http://').
 			pretty (bool): Whether or not to make the url pretty. If yes,
-						   the formatted string appended to the result list
-						   follows the schema '<long> => <url>'.
-			urls (tuple): The tuple of long urls to shorten.
+						   the formatted string returned follows the
+						   schema '<long> => <url>'.
+
+		Returns:
+			The shortened url, formatted as described for 'pretty'.
 		"""
+		prepended = url
 		if not self.http.match(url):
-			url = 'http://{0}'.format(url)
-			if not quiet:
-				lnk.errors.warn("Prepending 'http://' to '{0}'".format(url))
-		short = self.request(url)
+			prepended = 'http://{0}'.format(url)
+		short = self.request(prepended)
+		# Only warned once the request is answered, as the asyncio backend
+		# calls this method again until it is (see lnk.aio.Executor)
+		if prepended != url and not quiet:
+			lnk.errors.warn("Prepending 'http://' to '{0}'".format(prepended))
+		url = prepended
 		formatted = self.copy(copy, short)
 		if pretty:
 			formatted = '{0} => {1}'.format(url, formatted)
-		with self.lock:
-			result.append(formatted)
+
+		return formatted
 
 	def request(self, url):
 		"""
 		Requests and returns a short url for a long one.
 
+		The url is first looked up in the cache (if enabled), such that urls
+		shortened before are not requested again.
+
 		Arguments:
 			url (str): The long url to shorten.
 
 		Returns:
 			The shortened link.
 		"""
+		if self.shortened:
+			short = self.shortened.get(url)
+			if short is not None:
+				return short
 		response = self.get(self.endpoints['create'], dict(url=url))
 		response = self.verify(response, "shorten url '{0}'".format(url))
+		if self.shortened:
+			self.shortened.put(url, response['shorturl'])
 
 		return response['shorturl']
 
@@ -134,9 +214,11 @@ class Link(Command):
 			to fetch(), else the url, formatted with ecstasy to appear bold
 			in the terminal.
 		"""
-		if copy and not self.already_copied:
+		with self.lock:
+			if not copy or self.already_copied:
+				return url
 			self.already_copied = True
-			pyperclip.copy(url)
-			url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
+		pyperclip.copy(url)
+		url = ecstasy.beautify('<{0}>'.format(url), ecstasy.Style.Bold)
 
 		return url
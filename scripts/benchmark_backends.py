@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the threaded and the asyncio backend of commands.
+
+A local fake API (an asyncio server in a separate process, answering each
+request after a fixed latency over keep-alive connections) is asked for
+(by default) 2,000 distinct urls by a command, once on worker threads
+(lnk.executor.Executor, with as many workers as the concurrency) and once
+on the asyncio backend (lnk.aio.Engine, with a semaphore of the same
+size), for concurrencies of 10, 100 and 1000. For each, the wall-clock
+time, the throughput and the number of threads the process ran with are
+reported.
+
+Usage: python -m scripts.benchmark_backends [requests] [latency (ms)]
+"""
+
+from __future__ import print_function
+
+import asyncio
+import json
+import multiprocessing
+import os.path
+import sys
+import threading
+import time
+
+CONCURRENCIES = (10, 100, 1000)
+
+async def answer(reader, writer, latency):
+	"""Answers the requests of one (keep-alive) connection."""
+	try:
+		while True:
+			line = await reader.readline()
+			if not line:
+				break
+			target = line.split()[1].decode('ascii')
+			while (await reader.readline()) not in (b'\r\n', b''):
+				pass
+			await asyncio.sleep(latency)
+			content = json.dumps(dict(url=target)).encode('utf-8')
+			writer.write(b'HTTP/1.1 200 OK\r\n'
+						 b'Content-Type: application/json\r\n'
+						 b'Content-Length: ' + str(len(content)).encode() +
+						 b'\r\n\r\n' + content)
+			await writer.drain()
+	except ConnectionError:
+		pass
+	finally:
+		writer.close()
+
+def serve(port, latency):
+	"""Runs the fake API (in a separate process) until terminated."""
+	async def start():
+		server = await asyncio.start_server(lambda r, w: answer(r, w, latency),
+											'127.0.0.1',
+											0,
+											backlog=2048)
+		port.put(server.sockets[0].getsockname()[1])
+		await server.serve_forever()
+	asyncio.run(start())
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	sys.path.insert(0, root)
+	import lnk.abstract
+	import lnk.aio
+	import lnk.config
+	import lnk.executor
+	import lnk.session
+
+	port = multiprocessing.Queue()
+	server = multiprocessing.Process(target=serve, args=(port, latency))
+	server.daemon = True
+	server.start()
+	url = 'http://127.0.0.1:{0}'.format(port.get(timeout=10))
+
+	config = dict(url=url,
+				  version=1,
+				  commands=dict(echo=dict(endpoints=dict(echo='echo'))))
+	path = os.path.join(lnk.config.CONFIG_PATH, 'benchmark.json')
+	with open(path, 'wt') as destination:
+		json.dump(config, destination)
+
+	class Echo(lnk.abstract.AbstractCommand):
+		"""Requests each url from the fake API."""
+		def __init__(self):
+			super(Echo, self).__init__('benchmark', 'echo')
+		def fetch(self, urls):
+			return self.map(self.echo, urls)
+		def echo(self, url):
+			return self.get(self.endpoints['echo'], dict(url=url)).json()
+
+	def threads(concurrency):
+		command = Echo()
+		command.session = lnk.session.Session()
+		command.connections = dict(size=concurrency, block=True)
+		command.executor = lnk.executor.Executor(concurrency)
+		return command
+
+	def engine(concurrency):
+		command = Echo()
+		command.engine = lnk.aio.Engine(concurrency)
+		command.executor = command.engine.executor()
+		return command
+
+	urls = ['http://example.com/{0}'.format(i) for i in range(count)]
+	print('{0} requests, {1:.0f} ms latency\n'.format(count, latency * 1000))
+	print('{0:<14}{1:<10}{2:>10}{3:>12}{4:>10}'.format('concurrency',
+													   'backend',
+													   'time (s)',
+													   'requests/s',
+													   'threads'))
+	try:
+		for concurrency in CONCURRENCIES:
+			for name, build in (('threads', threads), ('asyncio', engine)):
+				command = build(concurrency)
+				# Warms up the connections (and, for threads, the workers)
+				command.fetch(urls[:concurrency])
+				start = time.time()
+				results = command.fetch(urls)
+				elapsed = time.time() - start
+				assert len(results) == count
+				print('{0:<14}{1:<10}{2:>10.2f}{3:>12.0f}{4:>10}'.format(
+					concurrency,
+					name,
+					elapsed,
+					count / elapsed,
+					threading.active_count()))
+				command.executor.shutdown()
+				if command.engine:
+					command.engine.close()
+	finally:
+		os.remove(path)
+		server.terminate()
+
+if __name__ == '__main__':
+	main()
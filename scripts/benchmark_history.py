@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for filtering the goo.gl link-history by time-ranges.
+
+A synthetic history of (by default) 100,000 links, one per minute and
+listed from newest to oldest (as the API does), is filtered by 50 random
+time-ranges, once by scanning all links for each range (as History.filter
+did before the history was kept in a lnk.timeline.Timeline) and once by
+bisecting the timeline, with and without a limit. The time to build the
+timeline (i.e. to sort the history) is reported separately. Lastly, the
+history is stored in a (temporary) lnk.mirror.Mirror, which then answers
+the same ranges from its index.
+
+Usage: python -m scripts.benchmark_history [links] [ranges] [limit]
+"""
+
+from __future__ import print_function
+
+import os.path
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+def scan(urls, begin, end, limit):
+	"""Filters the urls linearly and only then applies the limit."""
+	filtered = []
+	for url in urls:
+		if url.created >= begin and url.created <= end:
+			filtered.append(url)
+
+	return filtered[:limit]
+
+def measure(function, *args):
+	"""Returns the result and time (in ms) of a function call."""
+	start = time.time()
+	result = function(*args)
+
+	return result, (time.time() - start) * 1000
+
+def main():
+	size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+	limit = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	sys.path.insert(0, root)
+	import lnk.googl.history
+	import lnk.mirror
+	import lnk.timeline
+	import lnk.timestamps
+
+	Url = lnk.googl.history.History.Url
+	now = datetime.now()
+	urls = [Url('http://goo.gl/{0}'.format(i),
+				'http://example.com/{0}'.format(i),
+				now - timedelta(minutes=i)) for i in range(size)]
+
+	random.seed(0)
+	ranges = []
+	for _ in range(count):
+		bounds = sorted(random.randint(0, size) for _ in range(2))
+		ranges.append((now - timedelta(minutes=bounds[1]),
+					   now - timedelta(minutes=bounds[0])))
+
+	timeline = lnk.timeline.Timeline(urls)
+	build = measure(timeline.sort)[1]
+
+	print('{0} links, {1} ranges\n'.format(size, count))
+	print('{0:<24}{1:>12}{2:>12}{3:>10}'.format('', 'scan (ms)',
+												'bisect (ms)', 'speedup'))
+	for name, bound in (('no limit', None), ('limit {0}'.format(limit), limit)):
+		def linear():
+			return [scan(urls, begin, end, bound) for begin, end in ranges]
+		def bisect():
+			return [lnk.googl.history.History.filter(timeline, begin, end, bound)
+					for begin, end in ranges]
+		expected, slow = measure(linear)
+		result, fast = measure(bisect)
+		assert result == expected
+		print('{0:<24}{1:>12.1f}{2:>12.1f}{3:>9.1f}x'.format(name,
+															 slow,
+															 fast,
+															 slow / fast))
+
+	print('\nBuilding the timeline: {0:.1f} ms'.format(build))
+
+	directory = tempfile.mkdtemp()
+	try:
+		path = os.path.join(directory, 'mirror')
+		def open_mirror():
+			return lnk.mirror.Mirror('googl',
+									 path,
+									 lnk.timestamps.isoformat,
+									 lnk.timestamps.parse)
+		with open_mirror() as mirror:
+			sync = measure(mirror.update, urls)[1]
+		def query():
+			with open_mirror() as mirror:
+				return [mirror.between(begin, end, limit)
+						for begin, end in ranges]
+		result, load = measure(query)
+		expected = [lnk.googl.history.History.filter(timeline, begin, end, limit)
+					for begin, end in ranges]
+		assert [[url.short for url in i] for i in result] == \
+			   [[url.short for url in i] for i in expected]
+	finally:
+		shutil.rmtree(directory)
+
+	print('Mirroring the history: {0:.1f} ms'.format(sync))
+	print('Opening the mirror and answering all ranges '
+		  '(limit {0}): {1:.1f} ms'.format(limit, load))
+
+if __name__ == '__main__':
+	main()
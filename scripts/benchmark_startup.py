@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cold-start benchmark for the lnk command-line entry-point.
+
+For each service, a fresh interpreter constructs lnk.cli.Main and resolves
+the service's command, once loading only that service (as lnk does) and
+once loading every service (as lnk did before commands were loaded lazily).
+The median wall-clock time of several runs is reported for both. The time
+to import lnk.beauty (but not its dependencies) and compute the width of a
+box is reported as well.
+
+Each interpreter's stdin is attached to a pseudo-terminal (where available),
+such that work only done when connected to a terminal is measured too.
+
+Usage: python -m scripts.benchmark_startup [runs]
+"""
+
+from __future__ import print_function
+
+import os.path
+import subprocess
+import sys
+
+try:
+	import pty
+except ImportError:
+	pty = None
+
+COMMANDS = '''
+import time
+start = time.time()
+import lnk.cli
+main = lnk.cli.Main()
+for name in {names}:
+	main.get_command(None, name)
+print(time.time() - start)
+'''
+
+BEAUTY = '''
+import time
+import lnk.errors
+start = time.time()
+import lnk.beauty
+lnk.beauty.get_max_width()
+print(time.time() - start)
+'''
+
+def measure(root, code, runs):
+	"""Returns the median time (in ms) printed by a snippet of code."""
+	times = []
+	for _ in range(runs):
+		terminal = pty.openpty() if pty else None
+		try:
+			output = subprocess.check_output([sys.executable, '-c', code],
+											 stdin=terminal[1] if pty else None,
+											 cwd=root)
+		finally:
+			if terminal:
+				os.close(terminal[0])
+				os.close(terminal[1])
+		times.append(float(output.decode().strip().splitlines()[-1]) * 1000)
+	times.sort()
+
+	return times[len(times) // 2]
+
+def main():
+	runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	sys.path.insert(0, root)
+	import lnk.cli
+	services = lnk.cli.Main().names
+
+	print('{0:<10}{1:>12}{2:>12}{3:>10}'.format('service',
+												'eager (ms)',
+												'lazy (ms)',
+												'speedup'))
+	for service in services:
+		eager = measure(root, COMMANDS.format(names=services), runs)
+		lazy = measure(root, COMMANDS.format(names=[service]), runs)
+		print('{0:<10}{1:>12.1f}{2:>12.1f}{3:>9.1f}x'.format(service,
+															 eager,
+															 lazy,
+															 eager / lazy))
+
+	beauty = measure(root, BEAUTY, runs)
+	print('\nlnk.beauty (import + box width): {0:.1f} ms'.format(beauty))
+
+if __name__ == '__main__':
+	main()
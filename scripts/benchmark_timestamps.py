@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Microbenchmark for parsing the timestamps of link-histories.
+
+Parses (by default) a million goo.gl-style timestamps, once with
+datetime.strptime() (as History.process did before, cutting off the
+fraction and offset first), once with lnk.timestamps.parse() and once
+with its fallback for older Pythons, lnk.timestamps.fields(), and reports
+the throughput of each.
+
+Usage: python -m scripts.benchmark_timestamps [timestamps]
+"""
+
+from __future__ import print_function
+
+import os.path
+import sys
+import time
+
+from datetime import datetime, timedelta
+
+def strptime(value):
+	"""Parses a timestamp the way History.process used to."""
+	relevant = value.split('.')[0]
+
+	return datetime.strptime(relevant, '%Y-%m-%dT%H:%M:%S')
+
+def measure(function, values):
+	"""Returns the number of values parsed per second."""
+	start = time.time()
+	for value in values:
+		function(value)
+
+	return len(values) / (time.time() - start)
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	sys.path.insert(0, root)
+	import lnk.timestamps
+
+	now = datetime(2015, 9, 15, 12, 34, 56, 789000)
+	values = []
+	for i in range(count):
+		created = now - timedelta(seconds=i * 37)
+		values.append(created.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+00:00')
+
+	slow = measure(strptime, values)
+	fast = measure(lnk.timestamps.parse, values)
+	fallback = measure(lnk.timestamps.fields, values)
+
+	print('{0} timestamps\n'.format(count))
+	print('{0:<24}{1:>16}'.format('', 'timestamps/s'))
+	print('{0:<24}{1:>16,.0f}'.format('datetime.strptime', slow))
+	print('{0:<24}{1:>16,.0f}'.format('lnk.timestamps.parse', fast))
+	print('{0:<24}{1:>16,.0f}'.format('lnk.timestamps.fields', fallback))
+	print('\nSpeedup: {0:.1f}x'.format(fast / slow))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import click
+import threading
+
+import tests.paths
+import lnk.bitly.cli
+import lnk.bitly.info
+import lnk.bitly.link
+import lnk.errors
+
+def record(monkeypatch, printed=None):
+	"""Records what is echoed as (message, err) pairs, setting the printed
+	event (if any) once a line about a 'fast' url was output."""
+	echoed = []
+	def echo(message=None, err=False, **kwargs):
+		echoed.append((message, err))
+		if printed and not err and 'fast' in message:
+			printed.set()
+	monkeypatch.setattr(click, 'echo', echo)
+
+	return echoed
+
+
+def test_link_streams_successes_in_partial_mode(monkeypatch):
+	printed = threading.Event()
+	echoed = record(monkeypatch, printed)
+	def get_short(url):
+		if 'bad' in url:
+			raise lnk.errors.HTTPError('Could not shorten.')
+		# Only succeeds if the line of the fast url was output before
+		if 'slow' in url and not printed.wait(5):
+			raise lnk.errors.HTTPError('Nothing was output.')
+		return url.replace('example.com', 'bit.ly')
+	monkeypatch.setattr(lnk.bitly.link.Link,
+						'get_short',
+						staticmethod(get_short))
+
+	lnk.bitly.cli.link.main(['--partial',
+							 '--no-cache',
+							 '--no-copy',
+							 'http://example.com/fast',
+							 'http://example.com/bad',
+							 'http://example.com/slow'],
+							standalone_mode=False)
+
+	lines = [message for message, err in echoed if not err]
+	assert lines == ['http://example.com/fast => http://bit.ly/fast',
+					 'http://example.com/slow => http://bit.ly/slow']
+
+
+def test_info_reports_failures_in_partial_mode(monkeypatch):
+	echoed = record(monkeypatch)
+	def request(self, url, sets, hide_empty):
+		if 'bad' in url:
+			raise lnk.errors.HTTPError('Could not get information.')
+		return ['URL: {0}'.format(url)]
+	monkeypatch.setattr(lnk.bitly.info.Info,
+						'prefetch',
+						lambda self, urls: None)
+	monkeypatch.setattr(lnk.bitly.info.Info, 'request', request)
+
+	lnk.bitly.cli.info.main(['--partial',
+							 'http://bit.ly/bad',
+							 'http://bit.ly/good'],
+							standalone_mode=False)
+
+	output = [message for message, err in echoed if not err]
+	errors = [message for message, err in echoed if err]
+	assert len(output) == 1
+	assert 'http://bit.ly/good' in output[0]
+	assert 'http://bit.ly/bad' not in output[0]
+	# The failure, then the count of failures
+	assert len(errors) == 2
+	assert 'http://bit.ly/bad' in errors[0]
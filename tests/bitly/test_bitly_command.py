@@ -11,6 +11,8 @@ import lnk.bitly.command
 import lnk.config
 import lnk.errors
 
+from tests.fakes import bitly_response
+
 VERSION = 3
 API = 'https://api-ssl.bitly.com'
 with open(os.path.join(tests.paths.TEST_PATH, 'bitly', 'token')) as source:
@@ -70,3 +72,29 @@ def test_verify_throws_for_api_error(fixture):
 
 	with pytest.raises(lnk.errors.APIError):
 		fixture.verify(response, 'even', 'expand')
+
+
+def test_status_is_taken_from_data():
+	response = bitly_response(status_code=503,
+							  status_txt='TEMPORARILY_UNAVAILABLE')
+
+	assert lnk.bitly.command.Command.status(response) == 503
+
+
+def test_status_maps_rate_limit_to_too_many_requests():
+	response = bitly_response(status_code=403,
+							  status_txt='RATE_LIMIT_EXCEEDED')
+
+	assert lnk.bitly.command.Command.status(response) == 429
+
+
+def test_status_maps_bad_arguments_to_bad_request():
+	response = bitly_response(status_code=500, status_txt='INVALID_URI')
+
+	assert lnk.bitly.command.Command.status(response) == 400
+
+
+def test_status_keeps_http_errors():
+	response = bitly_response(http=502)
+
+	assert lnk.bitly.command.Command.status(response) == 502
@@ -13,6 +13,11 @@ from collections import namedtuple
 
 import tests.paths
 import lnk.bitly.history
+import lnk.cache
+import lnk.config
+import lnk.mirror
+
+from tests.fakes import bitly_response
 
 VERSION = 3
 API = 'https://api-ssl.bitly.com/v{0}'.format(VERSION)
@@ -98,7 +103,6 @@ def fixture():
 
 def test_initializes_well(fixture):
 	assert hasattr(fixture.history, 'raw')
-	assert hasattr(fixture.history, 'link')
 	assert hasattr(fixture.history, 'seconds')
 	assert isinstance(fixture.history.seconds, dict)
 
@@ -108,31 +112,44 @@ def test_request_works(fixture):
 
 	print(result, expected)
 
-	assert sorted(result) == sorted(expected)
+	assert sorted(i.short for i in result) == sorted(expected)
+	assert all(isinstance(i, lnk.bitly.history.History.Url) for i in result)
+
+
+def test_request_includes_long_urls(fixture):
+	result = fixture.history.request()
+	urls = [i for i in result if i.short == fixture.url]
+
+	assert urls
+	assert urls[0].long == fixture.expanded
 
 
 def test_lineify_does_nothing_if_pretty_false(fixture):
-	result = fixture.history.lineify('cat', False, False, False)
+	url = lnk.bitly.history.History.Url('cat', 'dog', 0)
+	result = fixture.history.lineify(url, False, False, False)
 
 	assert result == 'cat'
 
 
 def test_lineify_prettifies_if_pretty_true(fixture):
-	result = fixture.history.lineify('cat', False, False, True)
+	url = lnk.bitly.history.History.Url('cat', 'dog', 0)
+	result = fixture.history.lineify(url, False, False, True)
 	expected = fixture.template.format('cat')
 
 	assert result == expected
 
 
 def test_lineify_returns_only_expanded_if_expanded_true(fixture):
-	result = fixture.history.lineify(fixture.url, True, False, False)
+	url = lnk.bitly.history.History.Url('cat', 'dog', 0)
+	result = fixture.history.lineify(url, True, False, False)
 
-	assert result == fixture.expanded
+	assert result == 'dog'
 
 
 def test_lineify_returns_both_if_both_true(fixture):
-	result = fixture.history.lineify(fixture.url, False, True, False)
-	expected = '{0} => {1}'.format(fixture.url, fixture.expanded)
+	url = lnk.bitly.history.History.Url('cat', 'dog', 0)
+	result = fixture.history.lineify(url, False, True, False)
+	expected = 'cat => dog'
 
 	assert result == expected
 
@@ -283,3 +300,193 @@ def test_fetch_limits_well(fixture):
 
 	assert len(result) <= 3
 	assert result == expected
+
+
+class FakeHistory(object):
+	"""Serves a fake link-history (one link per hour), page by page."""
+	def __init__(self, size):
+		now = int(time.time())
+		self.links = [dict(link='http://bit.ly/{0}'.format(i),
+						   long_url='http://example.com/{0}'.format(i),
+						   created_at=now - i * 3600 - 1800)
+					  for i in range(size)]
+		self.requested = []
+
+	def get(self, endpoint, parameters=None):
+		self.requested.append(parameters)
+		after = parameters.get('created_after')
+		before = parameters.get('created_before')
+		links = [i for i in self.links
+				 if (after is None or i['created_at'] >= after) and
+				    (before is None or i['created_at'] <= before)]
+		offset = parameters['offset']
+		page = links[offset:offset + parameters['limit']]
+		data = dict(link_history=page, result_count=len(links))
+
+		return bitly_response(data)
+
+@pytest.fixture()
+def fake():
+	fake = FakeHistory(237)
+	history = lnk.bitly.history.History(raw=True)
+	history.get = fake.get
+
+	return history, fake
+
+
+def test_fetch_both_needs_no_expansion_requests(fake):
+	history, server = fake
+	result = history.fetch(None, None, True, 3, False, True, False)
+
+	assert len(server.requested) == 1
+	assert result == ['http://bit.ly/{0} => http://example.com/{0}'.format(i)
+					  for i in range(3)]
+
+
+def test_fetch_pages_through_whole_history(fake):
+	history, server = fake
+	result = history.fetch(None, None, True, None, False, False, False)
+
+	assert result == ['http://bit.ly/{0}'.format(i) for i in range(237)]
+	assert sorted(i['offset'] for i in server.requested) == [0, 50, 100, 150, 200]
+
+
+def test_fetch_pages_up_to_limit(fake):
+	history, server = fake
+	result = history.fetch(None, None, True, 120, False, False, False)
+
+	assert result == ['http://bit.ly/{0}'.format(i) for i in range(120)]
+
+
+def test_lines_are_generated_lazily(fake):
+	history, server = fake
+	lines = history.lines(None, None, True, None, False, False, False)
+
+	assert server.requested == []
+	assert next(lines) == 'http://bit.ly/0'
+
+
+def test_links_are_yielded_as_their_pages_arrive(fake):
+	history, server = fake
+	lines = history.lines(None, None, True, None, False, False, False)
+
+	assert [next(lines) for _ in range(50)] == ['http://bit.ly/{0}'.format(i)
+												for i in range(50)]
+	# Only the first of the five pages was needed so far
+	assert len(server.requested) == 1
+	assert len(list(lines)) == 187
+
+
+def test_pages_beyond_the_limit_are_not_requested(fake):
+	history, server = fake
+	history.fetch(None, None, True, 60, False, False, False)
+
+	assert sorted(i['offset'] for i in server.requested) == [0, 50]
+	assert [i['limit'] for i in server.requested] == [50, 10]
+
+
+def test_windows_are_answered_from_one_request(fake):
+	history, server = fake
+	result = history.fetch([(1, 'day'), (2, 'days')],
+						   [(3, 'days', 1, 'day')],
+						   True,
+						   10,
+						   False,
+						   False,
+						   False)
+	newest = ['http://bit.ly/{0}'.format(i) for i in range(10)]
+	# Links are one hour apart, starting half an hour ago
+	between = ['http://bit.ly/{0}'.format(i) for i in range(24, 34)]
+
+	assert len(server.requested) == 1
+	assert result[:10] == newest
+	assert between in [result[10:20], result[20:30], result[30:]]
+	assert result.count(newest[0]) == 3
+
+
+def test_windows_stop_paging_once_complete(fake):
+	history, server = fake
+	result = history.fetch([(1, 'day')], None, False, None, False, False, False)
+
+	assert len(server.requested) == 1
+	assert len(result) == 24
+
+
+def test_windows_without_limit_get_all_links(fake):
+	history, server = fake
+	result = history.fetch([(2, 'days')], [(8, 'days', 1, 'day')],
+						   True,
+						   None,
+						   False,
+						   False,
+						   True)
+
+	assert len([i for i in result if i.startswith('Last')]) == 1
+	# Three headers and two empty lines in-between
+	assert len(result) == 237 + 48 + (8 * 24 - 24) + 5
+
+
+@pytest.fixture()
+def mirrored(request, fake, tmpdir):
+	history, server = fake
+	history.mirror = lnk.mirror.Mirror('bitly', str(tmpdir.join('mirror')))
+	request.addfinalizer(history.mirror.close)
+
+	return history, server
+
+
+def test_mirror_is_synchronized_from_scratch(mirrored):
+	history, server = mirrored
+	result = history.fetch(None, None, True, 10, False, False, False)
+
+	assert result == ['http://bit.ly/{0}'.format(i) for i in range(10)]
+	assert len(history.mirror.between()) == 237
+	assert history.mirror.mark() == server.links[0]['created_at']
+
+
+def test_mirror_only_fetches_new_links(mirrored):
+	history, server = mirrored
+	history.fetch(None, None, True, None, False, False, False)
+	mark = history.mirror.mark()
+	server.links.insert(0, dict(link='http://bit.ly/new',
+								long_url='http://example.com/new',
+								created_at=mark + 60))
+	del server.requested[:]
+
+	result = history.fetch([(1, 'day')], None, False, 3, False, False, False)
+
+	assert result == ['http://bit.ly/new', 'http://bit.ly/0', 'http://bit.ly/1']
+	assert len(server.requested) == 1
+	assert server.requested[0]['created_after'] == mark - 1
+	assert history.mirror.mark() == mark + 60
+
+
+def test_mirror_is_kept_per_account(monkeypatch, tmpdir):
+	monkeypatch.setattr(lnk.config, 'CONFIG_PATH', str(tmpdir))
+
+	def login(account, server):
+		monkeypatch.setattr(lnk.cache, 'account', lambda secret: account)
+		history = lnk.bitly.history.History(raw=True, mirror=True)
+		history.get = server.get
+
+		return history
+
+	mine = FakeHistory(237)
+	history = login('mine', mine)
+	history.fetch(None, None, True, None, False, False, False)
+	history.mirror.close()
+
+	theirs = FakeHistory(3)
+	for link in theirs.links:
+		link['link'] = link['link'].replace('bit.ly', 'j.mp')
+	history = login('theirs', theirs)
+	result = history.fetch(None, None, True, None, False, False, False)
+	history.mirror.close()
+
+	assert result == ['http://j.mp/{0}'.format(i) for i in range(3)]
+	assert theirs.requested[0].get('created_after') is None
+
+	history = login('mine', mine)
+	assert history.mirror.mark() == mine.links[0]['created_at']
+	assert len(history.mirror.between()) == 237
+	history.mirror.close()
@@ -175,13 +175,13 @@ def test_lineify_hides_empty_if_wanted(fixture):
 	assert result == [fixture.formatted[0]]
 
 def test_requests_well(fixture):
-	fixture.info.queue.put(fixture.urls[0])
-	result = []
-	fixture.info.request(fixture.sets.values(), result, False)
+	result = fixture.info.request(fixture.urls[0],
+								  fixture.sets.values(),
+								  False)
 
 	print(result, fixture.formatted)
 
-	assert result[0] == fixture.formatted
+	assert result == fixture.formatted
 
 def test_fetches_well(fixture):
 	result = fixture.info.fetch(fixture.only,
@@ -17,6 +17,11 @@ from collections import namedtuple
 
 import tests.paths
 import lnk.bitly.link
+import lnk.cache
+import lnk.errors
+import lnk.failures
+
+from tests.fakes import bitly_response
 
 VERSION = 3
 API = 'https://api-ssl.bitly.com/v{0}'.format(VERSION)
@@ -117,11 +122,9 @@ def test_get_short_shortens_well(fixture):
 
 
 def test_shorten_formats_well(fixture):
-	result = []
-	fixture.link.queue.put(fixture.long)
-	fixture.link.shorten(result, False)
+	result = fixture.link.shorten(fixture.long, False)
 
-	assert result[0] == fixture.long_to_short
+	assert result == fixture.long_to_short
 
 
 def test_get_long_expands_well(fixture):
@@ -131,11 +134,9 @@ def test_get_long_expands_well(fixture):
 
 
 def test_expand_formats_well(fixture):
-	result = []
-	fixture.link.queue.put(fixture.short)
-	fixture.link.expand(result, False)
+	result = fixture.link.expand(fixture.short, False)
 
-	assert result[0] == fixture.short_to_long
+	assert result == fixture.short_to_long
 
 
 def test_shorten_urls_works_for_single_url(fixture):
@@ -226,3 +227,103 @@ def test_fetch_correct_output_if_raw_false_pretty_false(fixture):
 	expected = '\n'.join([fixture.short_to_long, fixture.long_to_short])
 
 	return result == expected
+
+
+def test_stream_yields_lines_in_order(fixture):
+	urls = iter([fixture.long + '\n', '\n', fixture.long + '\n'])
+	result = list(fixture.link.stream(False, True, urls))
+
+	assert result == [fixture.long_to_short, fixture.long_to_short]
+
+
+def test_stream_yields_all_lines_unordered(fixture):
+	urls = iter([fixture.long, fixture.long])
+	result = list(fixture.link.stream(False, True, urls, False))
+
+	assert result == [fixture.long_to_short, fixture.long_to_short]
+
+
+@pytest.fixture()
+def cached(request, tmpdir):
+	link = lnk.bitly.link.Link(raw=True, cache=False)
+	link.shortened = lnk.cache.Cache('bitly/shorten/test',
+									 str(tmpdir.join('cache')))
+	link.expanded = lnk.cache.Cache('bitly/expand',
+									str(tmpdir.join('cache')))
+	request.addfinalizer(link.shortened.close)
+	request.addfinalizer(link.expanded.close)
+	link.requested = []
+	def get(endpoint, parameters=None):
+		link.requested.append(parameters)
+		return bitly_response(dict(url='http://bit.ly/fresh',
+								   expand=[dict(long_url='http://example.com/fresh')]))
+	link.get = get
+
+	return link
+
+
+def test_get_short_uses_cache(cached):
+	cached.shortened.put('http://example.com/', 'http://bit.ly/cached')
+	result = cached.get_short('http://example.com/')
+
+	assert result == 'http://bit.ly/cached'
+	assert cached.requested == []
+
+
+def test_get_short_caches_requested_urls(cached):
+	first = cached.get_short('http://example.com/')
+	second = cached.get_short('http://example.com/')
+
+	assert first == second == 'http://bit.ly/fresh'
+	assert len(cached.requested) == 1
+	assert cached.shortened.get('http://example.com/') == 'http://bit.ly/fresh'
+
+
+def test_get_long_uses_cache(cached):
+	cached.expanded.put('http://bit.ly/short', 'http://example.com/cached')
+	result = cached.get_long('http://bit.ly/short')
+
+	assert result == 'http://example.com/cached'
+	assert cached.requested == []
+
+
+def test_get_long_caches_requested_urls(cached):
+	first = cached.get_long('http://bit.ly/short')
+	second = cached.get_long('http://bit.ly/short')
+
+	assert first == second == 'http://example.com/fresh'
+	assert len(cached.requested) == 1
+	assert cached.expanded.statistics() == (1, 1)
+
+
+def test_fetch_keeps_successes_in_partial_mode(cached, capsys):
+	cached.failures = lnk.failures.Failures()
+	def get_short(url):
+		if 'bad' in url:
+			raise lnk.errors.HTTPError('Could not shorten.')
+		return 'http://bit.ly/short'
+	cached.get_short = get_short
+	urls = ('http://bad.com', 'http://good.com')
+	result = cached.fetch(False, True, (), urls, False)
+
+	assert result == ['http://good.com => http://bit.ly/short']
+	assert [failure.item for failure in cached.failures.failures] == \
+		   ['http://bad.com']
+
+
+def test_expand_urls_batches_requests(cached):
+	def get(endpoint, parameters=None):
+		cached.requested.append(parameters)
+		urls = parameters['shortUrl']
+		expand = [dict(short_url=url, long_url=url.replace('bit.ly', 'long'))
+				  for url in urls]
+		return bitly_response(dict(expand=expand))
+	cached.get = get
+	cached.expanded.put('http://bit.ly/cached', 'http://long/cached')
+	urls = ['http://bit.ly/{0}'.format(i) for i in range(20)]
+	result = cached.expand_urls(False, urls + ['http://bit.ly/cached'])
+
+	assert [len(i['shortUrl']) for i in cached.requested] == [15, 5]
+	assert result[0] == 'http://bit.ly/0 => http://long/0'
+	assert result[-1] == 'http://bit.ly/cached => http://long/cached'
+	assert cached.expanded.get('http://bit.ly/19') == 'http://long/19'
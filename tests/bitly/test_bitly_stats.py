@@ -5,9 +5,20 @@ from __future__ import unicode_literals
 
 import copy
 import ecstasy
+import json
 import os
 import pytest
 import requests
+import threading
+
+try:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+	from urlparse import urlparse, parse_qs
+except ImportError:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+	from urllib.parse import urlparse, parse_qs
 
 from collections import namedtuple
 
@@ -15,6 +26,10 @@ import tests.paths
 import lnk.bitly.stats
 import lnk.bitly.info
 import lnk.config
+import lnk.errors
+import lnk.executor
+import lnk.failures
+import lnk.session
 
 VERSION = 3
 API = 'https://api-ssl.bitly.com/v{0}'.format(VERSION)
@@ -33,6 +48,73 @@ def request_stats(url, endpoint, timespan):
 
 	return {'timespan': timespan, 'data': data}
 
+class FakeBitly(ThreadingMixIn, HTTPServer):
+	"""
+	A local stand-in for the bit.ly statistics endpoints.
+
+	Each response echoes the parameters it was requested with, and is only
+	sent once 'concurrency' requests are in flight at the same time (or
+	after a timeout), such that the peak number of concurrent requests is
+	observable.
+	"""
+	daemon_threads = True
+	request_queue_size = 256
+
+	def __init__(self, concurrency):
+		HTTPServer.__init__(self, ('127.0.0.1', 0), FakeBitlyHandler)
+		self.concurrency = concurrency
+		self.lock = threading.Lock()
+		self.everyone = threading.Event()
+		self.active = 0
+		self.peak = 0
+
+class FakeBitlyHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		url = urlparse(self.path)
+		query = parse_qs(url.query)
+		server = self.server
+		with server.lock:
+			server.active += 1
+			server.peak = max(server.peak, server.active)
+			if server.active >= server.concurrency:
+				server.everyone.set()
+		server.everyone.wait(10)
+
+		endpoint = url.path.split('/')[-1]
+		key = 'link_clicks' if endpoint == 'clicks' else endpoint
+		echoed = '{0} {1} {2}'.format(query['link'][0],
+									  query['unit'][0],
+									  query['units'][0])
+		body = json.dumps(dict(status_code=200,
+							   status_txt='OK',
+							   data={key: echoed})).encode('utf-8')
+		with server.lock:
+			server.active -= 1
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+@pytest.fixture()
+def fake_bitly(request):
+	server = FakeBitly(64)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.daemon = True
+	thread.start()
+
+	def finalize():
+		server.shutdown()
+		server.server_close()
+
+	request.addfinalizer(finalize)
+
+	return server
+
 @pytest.fixture(scope='module')
 def fixture(request):
 	Fixture = namedtuple('Fixture', [
@@ -126,18 +208,8 @@ def test_format_title_cases_direct(fixture):
 	assert result == expected
 
 def test_request_format_is_correct(fixture):
-	fixture.stats.queue.put((
-		fixture.url,
-		'countries',
-		fixture.forever,
-		{
-		'unit': fixture.forever.unit,
-		'units': fixture.forever.span,
-		'link': fixture.url
-		}))
-	results = {fixture.endpoint: []}
-	fixture.stats.request(results)
-	result = results[fixture.endpoint][0]
+	spec = fixture.stats.Request(fixture.url, 'countries', fixture.forever)
+	result = fixture.stats.request(spec)
 
 	assert isinstance(result, dict)
 	assert 'timespan' in result
@@ -147,69 +219,32 @@ def test_request_format_is_correct(fixture):
 
 
 def test_requests_countries_well(fixture):
-	fixture.stats.queue.put((
-		fixture.url,
-		'countries',
-		fixture.forever,
-		{
-		'unit': fixture.forever.unit,
-		'units': fixture.forever.span,
-		'link': fixture.url
-		}))
-	result = {fixture.endpoint: []}
-	fixture.stats.request(result)
-	result = result[fixture.endpoint][0]
+	spec = fixture.stats.Request(fixture.url, 'countries', fixture.forever)
+	result = fixture.stats.request(spec)
 
 	assert result == fixture.forever_data
 
 def test_requests_referrers_well(fixture):
-	fixture.stats.queue.put((
-		fixture.url,
-		'referrers',
-		fixture.forever,
-		{
-		'unit': fixture.forever.unit,
-		'units': fixture.forever.span,
-		'link': fixture.url
-		}))
-	result = {'referrers': []}
-	fixture.stats.request(result)
-	result = result['referrers'][0]
+	spec = fixture.stats.Request(fixture.url, 'referrers', fixture.forever)
+	result = fixture.stats.request(spec)
 	expected = request_stats(fixture.url, 'referrers', fixture.forever)
 
 	assert result == expected
 
 def test_requests_clicks_well(fixture):
-	fixture.stats.queue.put((
-		fixture.url,
-		'clicks',
-		fixture.forever,
-		{
-		'unit': fixture.forever.unit,
-		'units': fixture.forever.span,
-		'link': fixture.url
-		}))
-	result = {'clicks': []}
-	fixture.stats.request(result)
-	result = result['clicks'][0]
+	spec = fixture.stats.Request(fixture.url, 'clicks', fixture.forever)
+	result = fixture.stats.request(spec)
 	expected = request_stats(fixture.url, 'clicks', fixture.forever)
 
 	assert result == expected
 
 def test_requests_timespan_well(fixture):
-	fixture.stats.queue.put((
-		fixture.url,
-		fixture.endpoint,
-		fixture.timespans[0],
-		{
-		'unit': fixture.timespans[0].unit,
-		'units': fixture.timespans[0].span,
-		'link': fixture.url
-		}))
-	results = {fixture.endpoint: []}
-	fixture.stats.request(results)
+	spec = fixture.stats.Request(fixture.url,
+								 fixture.endpoint,
+								 fixture.timespans[0])
+	result = fixture.stats.request(spec)
 
-	assert results[fixture.endpoint][0] == fixture.timespans_data[0]
+	assert result == fixture.timespans_data[0]
 
 
 def test_listify_sets_None_if_no_items(fixture):
@@ -465,3 +500,68 @@ def test_fetch_adds_info_well(fixture):
 
 	assert len(result) == 1
 	assert sorted(result[0]) == sorted(expected)
+
+
+def test_fetch_requests_all_urls_concurrently():
+	stats = lnk.bitly.stats.Stats(raw=True)
+	urls = ['http://bit.ly/{0}'.format(i) for i in range(4)]
+	lock = threading.Lock()
+	everyone = threading.Event()
+	started = []
+	def request(spec):
+		with lock:
+			started.append(spec.url)
+			if len(started) == len(urls):
+				everyone.set()
+		# Only returns data if all urls are requested at the same time
+		everyone.wait(5)
+		return {'timespan': spec.timespan, 'data': len(started)}
+	stats.request = request
+
+	result = stats.fetch(['clicks'], [], [], True, None, False, False, urls)
+
+	assert len(result) == len(urls)
+	assert all(i[-1].endswith(str(len(urls))) for i in result)
+
+
+def test_fetch_keeps_successes_in_partial_mode(capsys):
+	stats = lnk.bitly.stats.Stats(raw=True, failures=lnk.failures.Failures())
+	def request(spec):
+		if 'bad' in spec.url:
+			raise lnk.errors.HTTPError('Could not get statistics.')
+		return {'timespan': spec.timespan, 'data': 1}
+	stats.request = request
+	urls = ['http://bit.ly/bad', 'http://bit.ly/good']
+
+	result = stats.fetch(['clicks'], [], [], True, None, False, False, urls)
+
+	assert [lines[0] for lines in result] == ['URL: http://bit.ly/good']
+	assert [failure.item for failure in stats.failures.failures] == \
+		   ['http://bit.ly/bad']
+
+def test_requests_are_correct_under_high_concurrency(fake_bitly):
+	stats = lnk.bitly.stats.Stats(raw=True)
+	stats.api = 'http://127.0.0.1:{0}'.format(fake_bitly.server_port)
+	stats.executor = lnk.executor.Executor(96)
+	stats.session = lnk.session.Session()
+	stats.connections = {'size': 96, 'block': False}
+
+	urls = ['http://bit.ly/{0}'.format(i) for i in range(8)]
+	units = ['minutes', 'hour', 'days', 'week', 'month', 'months']
+	timespans = [lnk.bitly.stats.Stats.Timespan(span, unit)
+				 for span in (1, 2) for unit in units]
+	sets = ['clicks', 'countries']
+	batch = [stats.submit_stats(url, timespans, sets) for url in urls]
+	results = [stats.collect(tasks) for tasks in batch]
+	stats.session.close()
+
+	# 8 urls * 12 timespans * 2 sets = 192 requests
+	assert fake_bitly.peak >= 64
+	for url, result in zip(urls, results):
+		for endpoint in sets:
+			assert len(result[endpoint]) == len(timespans)
+			for timespan, item in zip(timespans, result[endpoint]):
+				unit = timespan.unit.rstrip('s')
+				expected = '{0} {1} {2}'.format(url, unit, timespan.span)
+				assert item['timespan'] == timespan
+				assert item['data'] == expected
@@ -127,3 +127,42 @@ def test_throws_for_write_when_no_file_open(fixture):
 def test_throws_for_close_when_no_file_open(fixture):
 	with pytest.raises(lnk.errors.InternalError):
 		fixture.manager.close()
+
+
+def test_caches_parsed_config(fixture, monkeypatch):
+	first = lnk.config.Manager(fixture.which).config
+	def fail(*args, **kwargs):
+		raise AssertionError('Cached configuration was parsed again.')
+	monkeypatch.setattr(json, 'load', fail)
+	second = lnk.config.Manager(fixture.which).config
+
+	assert first == second
+
+
+def test_cached_config_is_a_copy(fixture):
+	manager = lnk.config.Manager(fixture.which)
+	original = manager['animal']
+	manager.config['animal'] = 'dragon'
+
+	assert lnk.config.Manager(fixture.which)['animal'] == original
+
+
+def test_cache_is_invalidated_when_file_changes(fixture):
+	manager = lnk.config.Manager(fixture.which)
+	config = dict(manager.config)
+	config['animal'] = 'a much longer animal name'
+	with open(fixture.file, 'w') as destination:
+		json.dump(config, destination)
+
+	assert lnk.config.Manager(fixture.which)['animal'] == config['animal']
+
+
+def test_writes_atomically(fixture):
+	before = set(os.listdir(os.path.dirname(fixture.file)))
+	with lnk.config.Manager(fixture.which, write=True) as manager:
+		manager['animal'] = 'lion'
+	after = set(os.listdir(os.path.dirname(fixture.file)))
+
+	assert before == after
+	assert fixture.file not in lnk.config.Manager.cache
+	assert lnk.config.Manager(fixture.which)['animal'] == 'lion'
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fake responses and APIs shared by the tests."""
+
+import datetime
+
+class FakeResponse(object):
+	"""Stands in for a requests.Response."""
+	def __init__(self, status_code=200, headers=None, data=None):
+		self.status_code = status_code
+		self.headers = headers or {}
+		self.data = data
+
+	def json(self):
+		return self.data
+
+
+def bitly_response(data=None, status_code=200, status_txt='OK', http=200):
+	"""Returns a fake response of bit.ly, which wraps data in a status."""
+	wrapped = dict(status_code=status_code, status_txt=status_txt, data=data)
+
+	return FakeResponse(http, data=wrapped)
+
+
+class FakeApi(object):
+	"""Stands in for the goo.gl API, serving a fake link-history (one link
+	per hour) page by page."""
+	def __init__(self, size=0, page_size=10):
+		now = datetime.datetime.now()
+		self.items = []
+		for i in range(size):
+			created = now - datetime.timedelta(hours=i, minutes=30)
+			self.items.append({'id': 'http://goo.gl/{0}'.format(i),
+							   'longUrl': 'http://example.com/{0}'.format(i),
+							   'created': created.isoformat()})
+		self.page_size = page_size
+		self.requested = []
+
+	def insert(self, body):
+		return body
+
+	def list(self, start_token=None):
+		self.requested.append(start_token)
+		offset = start_token or 0
+		response = {'items': self.items[offset:offset + self.page_size]}
+		if offset + self.page_size < len(self.items):
+			response['nextPageToken'] = offset + self.page_size
+
+		return response
@@ -5,6 +5,7 @@ import apiclient.discovery
 import datetime
 import googleapiclient.discovery
 import httplib2
+import json
 import oauth2client.file
 import os
 import pytest
@@ -128,3 +129,61 @@ def test_authorize_throws_if_no_credentials(fixture):
 		fixture.command.authorize()
 
 	storage.put(credentials)
+
+
+DISCOVERY = {
+	'kind': 'discovery#restDescription',
+	'name': 'urlshortener',
+	'version': 'v1',
+	'rootUrl': 'https://www.googleapis.com/',
+	'servicePath': 'urlshortener/v1/',
+	'resources': {
+		'url': {
+			'methods': {
+				'get': {
+					'id': 'urlshortener.url.get',
+					'path': 'url',
+					'httpMethod': 'GET',
+					'parameters': {
+						'shortUrl': {
+							'type': 'string',
+							'required': True,
+							'location': 'query'
+						}
+					}
+				}
+			}
+		}
+	}
+}
+
+
+@pytest.fixture()
+def cached(request, tmpdir):
+	command = lnk.googl.command.Command('link', tests.paths.CREDENTIALS_PATH)
+	command.discovery_path = str(tmpdir.join('.discovery'))
+	with open(command.discovery_path, 'wt') as destination:
+		json.dump({'urlshortener-v1': json.dumps(DISCOVERY)}, destination)
+
+	return command
+
+
+def test_get_discovery_uses_cached_document(cached):
+	document = json.loads(cached.get_discovery())
+
+	assert document == DISCOVERY
+
+
+def test_get_discovery_is_keyed_by_version(cached):
+	with open(cached.discovery_path) as source:
+		cache = json.load(source)
+
+	assert 'urlshortener-{0}'.format(cached.version) in cache
+
+
+def test_get_api_is_built_only_once(cached):
+	first = cached.get_api()
+	second = cached.get_api()
+
+	assert first is second
+	assert hasattr(first, 'get')
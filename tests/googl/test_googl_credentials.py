@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import oauth2client.client
+import oauth2client.file
+import os
+import pytest
+import threading
+import time
+
+import tests.paths
+
+import lnk.errors
+
+from lnk.googl.credentials import Credentials
+
+def make_credentials(expiry):
+	return oauth2client.client.OAuth2Credentials('token',
+												 'client',
+												 'secret',
+												 'refresh',
+												 expiry,
+												 'https://example.com/token',
+												 'lnk')
+
+@pytest.fixture()
+def fixture(tmpdir, monkeypatch):
+	path = str(tmpdir.join('.credentials'))
+	expired = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+	oauth2client.file.Storage(path).put(make_credentials(expired))
+
+	refreshes = []
+	def refresh(self, http):
+		# Slow enough for all threads to pile up behind the lock
+		time.sleep(0.1)
+		refreshes.append(self)
+		self.access_token = 'refreshed'
+		self.token_expiry = (datetime.datetime.utcnow() +
+							 datetime.timedelta(hours=1))
+	monkeypatch.setattr(oauth2client.client.OAuth2Credentials,
+						'refresh',
+						refresh)
+
+	holder = Credentials(path)
+	writes = []
+	put = holder.storage.put
+	def counting_put(credentials):
+		writes.append(credentials)
+		put(credentials)
+	monkeypatch.setattr(holder.storage, 'put', counting_put)
+
+	return holder, refreshes, writes
+
+
+def test_shared_returns_one_holder_per_path():
+	first = Credentials.shared(tests.paths.CREDENTIALS_PATH)
+	second = Credentials.shared(tests.paths.CREDENTIALS_PATH)
+
+	assert first is second
+
+
+def test_get_refreshes_expired_credentials(fixture):
+	holder, refreshes, writes = fixture
+	credentials = holder.get()
+
+	assert not credentials.access_token_expired
+	assert credentials.access_token == 'refreshed'
+	assert len(refreshes) == 1
+	assert len(writes) == 1
+
+
+def test_get_refreshes_only_once_for_many_threads(fixture):
+	holder, refreshes, writes = fixture
+	results = []
+	def get():
+		results.append(holder.get())
+	threads = [threading.Thread(target=get) for _ in range(16)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert len(results) == 16
+	assert all(i is results[0] for i in results)
+	assert len(refreshes) == 1
+	assert len(writes) == 1
+
+
+def test_get_does_not_reread_unchanged_file(fixture, monkeypatch):
+	holder, _, _ = fixture
+	first = holder.get()
+	def fail():
+		pytest.fail('Credentials were re-read from disk.')
+	monkeypatch.setattr(holder.storage, 'get', fail)
+
+	assert holder.get() is first
+
+
+def test_get_rereads_modified_file(fixture):
+	holder, _, _ = fixture
+	first = holder.get()
+	valid = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+	oauth2client.file.Storage(holder.path).put(make_credentials(valid))
+	# Make sure the modification time differs on coarse-grained filesystems
+	os.utime(holder.path, (time.time(), holder.modified + 10))
+
+	second = holder.get()
+
+	assert second is not first
+	assert second.access_token == 'token'
+
+
+def test_get_throws_if_no_credentials(fixture):
+	holder, _, _ = fixture
+	os.remove(holder.path)
+
+	with pytest.raises(lnk.errors.AuthorizationError):
+		holder.get()
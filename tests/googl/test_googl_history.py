@@ -16,6 +16,12 @@ from collections import namedtuple
 import lnk.errors
 import tests.paths
 import lnk.googl.history
+import lnk.mirror
+import lnk.timeline
+import lnk.timestamps
+
+from lnk.googl.credentials import Credentials
+from tests.fakes import FakeApi
 
 VERSION = 1
 API = 'https://www.googleapis.com/urlshortener'
@@ -103,7 +109,7 @@ def fixture():
 
 	history = lnk.googl.history.History(raw=True)
 
-	history.credentials = oauth2client.file.Storage(tests.paths.CREDENTIALS_PATH)
+	history.credentials = Credentials.shared(tests.paths.CREDENTIALS_PATH)
 
 	last = [(4, 'week'), (5, 'month')]
 	last_urls = [filter_urls(urls, i) for i in last]
@@ -203,8 +209,17 @@ def test_listify_limits_well(fixture):
 def test_filter_works(fixture):
 	begin = datetime.datetime(2008, 1, 3)
 	end = datetime.datetime(2013, 4, 7)
-	result = fixture.history.filter(fixture.dummies, begin, end)
-	expected = fixture.dummies[1:3]
+	urls = lnk.timeline.Timeline(fixture.dummies)
+	result = fixture.history.filter(urls, begin, end)
+	expected = fixture.dummies[2:0:-1]
+
+	assert result == expected
+
+
+def test_filter_limits_to_most_recent(fixture):
+	urls = lnk.timeline.Timeline(fixture.dummies)
+	result = fixture.history.filter(urls, None, None, 2)
+	expected = fixture.dummies[:2:-1]
 
 	assert result == expected
 
@@ -243,30 +258,30 @@ def test_get_boundaries_throws_for_invalid_range(fixture):
 
 
 def test_last_works_for_single_range(fixture):
-	result = fixture.history.last(fixture.dummies,
+	result = fixture.history.last(lnk.timeline.Timeline(fixture.dummies),
 								  [fixture.last[1]],
 								  None,
 								  False,
 								  False,
 								  False)
-	expected = fixture.short_dummies[3:]
+	expected = fixture.short_dummies[:2:-1]
 
 	assert result == expected
 
 def test_last_works_for_many_ranges(fixture):
-	result = fixture.history.last(fixture.dummies,
+	result = fixture.history.last(lnk.timeline.Timeline(fixture.dummies),
 								  fixture.last,
 								  None,
 								  False,
 								  False,
 								  False)
 	expected = [fixture.short_dummies[4]]
-	expected += fixture.short_dummies[3:]
+	expected += fixture.short_dummies[:2:-1]
 
 	assert result == expected
 
 def test_ranges_works_for_single_range(fixture):
-	result = fixture.history.ranges(fixture.dummies,
+	result = fixture.history.ranges(lnk.timeline.Timeline(fixture.dummies),
 									[fixture.ranges[0]],
 									None,
 									False,
@@ -277,42 +292,43 @@ def test_ranges_works_for_single_range(fixture):
 	assert result == expected
 
 def test_ranges_works_for_many_ranges(fixture):
-	result = fixture.history.ranges(fixture.dummies,
+	result = fixture.history.ranges(lnk.timeline.Timeline(fixture.dummies),
 									fixture.ranges,
 									None,
 									False,
 									False,
 									False)
 	expected = [fixture.dummies[3].short]
-	expected += fixture.short_dummies[1:]
+	expected += fixture.short_dummies[:0:-1]
 
 	assert result == expected
 
 
 def test_forever_works(fixture):
-	result = fixture.history.forever(fixture.dummies,
+	result = fixture.history.forever(lnk.timeline.Timeline(fixture.dummies),
 									 None,
 									 False,
 									 False,
 									 False)
-	expected = fixture.short_dummies
+	expected = fixture.short_dummies[::-1]
 
 	assert result == expected
 
 
 def test_pretty_works_for_forever(fixture):
-	result = fixture.history.forever(fixture.dummies,
+	result = fixture.history.forever(lnk.timeline.Timeline(fixture.dummies),
 									 None,
 									 False,
 									 False,
 									 True)
 	expected = ['Since forever:']
-	expected += [fixture.template.format(i) for i in fixture.short_dummies]
+	expected += [fixture.template.format(i)
+				 for i in fixture.short_dummies[::-1]]
 
 	assert result == expected + ['']
 
 def test_pretty_works_for_last(fixture):
-	result = fixture.history.last(fixture.all_urls,
+	result = fixture.history.last(lnk.timeline.Timeline(fixture.all_urls),
 								  fixture.last,
 								  None,
 								  False,
@@ -332,7 +348,7 @@ def test_pretty_works_for_last(fixture):
 	assert result == expected
 
 def test_pretty_works_for_ranges(fixture):
-	result = fixture.history.ranges(fixture.all_urls,
+	result = fixture.history.ranges(lnk.timeline.Timeline(fixture.all_urls),
 									fixture.ranges,
 									None,
 									False,
@@ -362,7 +378,7 @@ def test_ranges_header_removes_unit_if_both_equal(fixture):
 
 def test_ranges_handles_empty_results_well(fixture):
 	timespan = fixture.ranges[0]
-	result = fixture.history.ranges([],
+	result = fixture.history.ranges(lnk.timeline.Timeline(),
 									[timespan],
 									None,
 									False,
@@ -412,3 +428,90 @@ def test_fetch_limits_well(fixture):
 
 	assert len(result) <= 3
 	assert sorted(result) == sorted(expected)
+
+
+@pytest.fixture()
+def fake():
+	api = FakeApi(100)
+	history = lnk.googl.history.History(raw=True)
+	history.get_api = lambda: api
+	history.execute = lambda request, what=None: request
+
+	return history, api
+
+
+def test_pages_are_requested_lazily(fake):
+	history, api = fake
+	pages = history.pages()
+	first = next(pages)
+
+	assert first == api.items[:10]
+	# The current and (at most) the next page
+	assert len(api.requested) <= 2
+
+
+def test_request_follows_all_pages(fake):
+	history, api = fake
+
+	assert history.request() == api.items
+	assert len(api.requested) == 10
+
+
+def test_fetch_stops_paging_once_limit_reached(fake):
+	history, api = fake
+	result = history.fetch(None, None, True, 5, False, False, False)
+
+	assert result == ['http://goo.gl/{0}'.format(i) for i in range(5)]
+	assert len(api.requested) <= 2
+
+
+def test_fetch_stops_paging_below_earliest_boundary(fake):
+	history, api = fake
+	result = history.fetch([(1, 'day')], None, False, None, False, False, False)
+
+	assert result == ['http://goo.gl/{0}'.format(i) for i in range(24)]
+	# Pages with links 0-9, 10-19 and 20-29, plus the one prefetched
+	assert len(api.requested) <= 4
+
+
+def test_fetch_without_limit_gets_all_pages(fake):
+	history, api = fake
+	result = history.fetch(None, None, True, None, False, False, False)
+
+	assert len(result) == 100
+	assert len(api.requested) == 10
+
+
+@pytest.fixture()
+def mirrored(request, fake, tmpdir):
+	history, api = fake
+	history.mirror = lnk.mirror.Mirror('googl',
+									   str(tmpdir.join('mirror')),
+									   lnk.timestamps.isoformat,
+									   lnk.timestamps.parse)
+	request.addfinalizer(history.mirror.close)
+
+	return history, api
+
+
+def test_mirror_is_synchronized_from_scratch(mirrored):
+	history, api = mirrored
+	result = history.fetch(None, None, True, 10, False, False, False)
+
+	assert result == ['http://goo.gl/{0}'.format(i) for i in range(10)]
+	assert len(history.mirror.between()) == 100
+
+
+def test_mirror_only_fetches_new_pages(mirrored):
+	history, api = mirrored
+	history.fetch(None, None, True, None, False, False, False)
+	api.items.insert(0, {'id': 'http://goo.gl/new',
+						 'longUrl': 'http://example.com/new',
+						 'created': datetime.datetime.now().isoformat()})
+	del api.requested[:]
+
+	result = history.fetch(None, None, True, 3, False, False, False)
+
+	assert result == ['http://goo.gl/new', 'http://goo.gl/0', 'http://goo.gl/1']
+	# The first page, plus the one prefetched
+	assert len(api.requested) <= 2
@@ -5,14 +5,19 @@ import json
 import os
 import pytest
 import requests
-import threading
+import subprocess
+import sys
+import time
 
 from collections import namedtuple
 
 import tests.paths
 
+import lnk.config
 import lnk.errors
 import lnk.abstract
+import lnk.executor
+import lnk.failures
 
 class Command(lnk.abstract.AbstractCommand):
 	def __init__(self):
@@ -102,64 +107,163 @@ def test_default_POST_works_well(fixture):
 	assert response.request.body == 'cats=awesome'
 
 
-def test_new_thread_sets_up_thread_well(fixture):
-	def endless():
-		while True:
-			pass
-	thread = fixture.command.new_thread(endless)
+def test_fetch_not_implemented(fixture):
+	with pytest.raises(NotImplementedError):
+		fixture.command.fetch()
 
-	assert isinstance(thread, threading.Thread)
-	assert thread.is_alive()
-	assert thread.daemon
 
-	thread.join(0.1)
+def test_workers_default_for_configurations_without_them(fixture,
+														monkeypatch):
+	settings = dict(lnk.config.get('lnk', 'settings'))
+	del settings['workers']
+	get = lnk.config.get
+	def without_workers(which, key):
+		if (which, key) == ('lnk', 'settings'):
+			return settings
+		return get(which, key)
+	monkeypatch.setattr(lnk.config, 'get', without_workers)
+
+	assert Command().executor.workers == 16
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_limit_sections_must_be_enabled(fixture, monkeypatch, enabled):
+	load = lnk.config.Manager.load
+	def with_limit(path):
+		config = load(path)
+		config['limit'] = dict(rate=5, burst=10, enabled=enabled)
+		return config
+	monkeypatch.setattr(lnk.config.Manager, 'load', staticmethod(with_limit))
+	command = Command()
+	command.limit('account')
+
+	assert (command.limiter is not None) == enabled
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='requires Python 3.7+')
+@pytest.mark.parametrize('proxy', [None, 'http://127.0.0.1:3128'])
+def test_asyncio_backend_falls_back_to_threads_behind_proxies(fixture,
+															   monkeypatch,
+															   proxy):
+	settings = dict(lnk.config.get('lnk', 'settings'), backend='asyncio')
+	get = lnk.config.get
+	def with_asyncio(which, key):
+		if (which, key) == ('lnk', 'settings'):
+			return settings
+		return get(which, key)
+	monkeypatch.setattr(lnk.config, 'get', with_asyncio)
+	for variable in ('HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY'):
+		monkeypatch.delenv(variable, raising=False)
+		monkeypatch.delenv(variable.lower(), raising=False)
+	if proxy:
+		monkeypatch.setenv('HTTPS_PROXY', proxy)
+	command = Command()
+
+	assert (command.engine is None) == bool(proxy)
+	assert isinstance(command.executor, lnk.executor.Executor) == bool(proxy)
+
+class FakeSession(object):
+	def __init__(self):
+		self.requests = []
 
+	def request(self, method, url, settings=None, **kwargs):
+		self.requests.append((method, url, kwargs))
+		return object()
 
-def test_exception_handling_for_threads_works(fixture):
-	def throws():
-		raise RuntimeError('Meh')
-	thread = fixture.command.new_thread(throws)
 
-	assert isinstance(thread, threading.Thread)
-	
-	thread.join()
+class Requester(lnk.abstract.AbstractCommand):
+	def __init__(self):
+		super(Requester, self).__init__('test', 'do')
+		self.session = FakeSession()
+
+	def request(self, url):
+		self.get('create', dict(url=url))
+		self.post('destroy', ('user', 'secret'), dict(url=url))
 
-	assert fixture.command.error is not None
-	assert isinstance(fixture.command.error, RuntimeError)
-	assert str(fixture.command.error) == 'Meh'
 
-	fixture.command.error = None
+def test_commands_may_define_their_own_request_method(fixture):
+	command = Requester()
+	command.request('http://python.org')
+	methods = [method for method, _, _ in command.session.requests]
 
+	assert methods == ['GET', 'POST']
+	assert command.session.requests[0][2]['params'] == \
+		   dict(url='http://python.org')
+	assert command.session.requests[1][2]['auth'] == ('user', 'secret')
 
-def test_join_method_works(fixture):
-	threads = [fixture.command.new_thread(lambda: 1) for _ in range(10)]
-	fixture.command.join(threads)
 
-	assert not any(thread.is_alive() for thread in threads)
+def test_coalesce_shares_requests_in_flight(fixture):
+	calls = []
+	def request(url):
+		calls.append(url)
+		time.sleep(0.2)
+		return object()
+	def coalesce(_):
+		return fixture.command.coalesce(('GET', 'url'), request, 'url')
+	results = lnk.executor.Executor(8).map(coalesce, range(8))
 
+	assert calls == ['url']
+	assert all(result is results[0] for result in results)
+	assert fixture.command.flights == {}
 
-def test_join_method_throws_if_unjoinable(fixture):
-	def blocks():
-		while True:
-			pass
-	thread = fixture.command.new_thread(blocks)
 
-	with pytest.raises(lnk.errors.InternalError):
-		fixture.command.join([thread], timeout=0.1)
+def test_coalesce_repeats_finished_requests(fixture):
+	calls = []
+	for _ in range(2):
+		fixture.command.coalesce('key', calls.append, 'url')
 
+	assert calls == ['url', 'url']
 
-def test_join_method_re_raises_thread_exceptions(fixture):
+
+def test_coalesce_keeps_different_keys_apart(fixture):
+	def coalesce(key):
+		return fixture.command.coalesce(key, lambda: key)
+
+	assert fixture.command.map(coalesce, ['a', 'b', 'a']) == ['a', 'b', 'a']
+
+
+def test_coalesce_re_raises_exceptions_for_all_threads(fixture):
 	def throws():
+		time.sleep(0.2)
 		raise RuntimeError
-	thread = fixture.command.new_thread(throws)
+	def coalesce(_):
+		with pytest.raises(RuntimeError):
+			fixture.command.coalesce('key', throws)
+	lnk.executor.Executor(4).map(coalesce, range(4))
 
-	with pytest.raises(RuntimeError):
-		fixture.command.join([thread])
+	assert fixture.command.flights == {}
 
 
-def test_fetch_not_implemented(fixture):
-	with pytest.raises(NotImplementedError):
-		fixture.command.fetch()
+def half(number):
+	if number % 2:
+		raise lnk.errors.HTTPError('Odd number.')
+	return number // 2
+
+
+def test_map_raises_first_failure_by_default(fixture):
+	with pytest.raises(lnk.errors.HTTPError):
+		fixture.command.map(half, range(4))
+
+
+def test_map_keeps_successes_in_partial_mode(fixture, capsys):
+	fixture.command.failures = lnk.failures.Failures()
+	try:
+		results = fixture.command.map(half, range(6))
+	finally:
+		failures, fixture.command.failures = fixture.command.failures, None
+
+	assert results == [0, 1, 2]
+	assert [failure.item for failure in failures.failures] == [1, 3, 5]
+
+
+def test_imap_keeps_successes_in_partial_mode(fixture, capsys):
+	fixture.command.failures = lnk.failures.Failures()
+	try:
+		results = list(fixture.command.imap(half, range(6)))
+	finally:
+		failures, fixture.command.failures = fixture.command.failures, None
+
+	assert results == [0, 1, 2]
+	assert len(failures) == 3
 
 
 def test_filter_sets_filters_well(fixture):
@@ -176,3 +280,11 @@ def test_filter_sets_hides_well(fixture):
 	result = lnk.abstract.filter_sets(base, [], hide)
 
 	assert sorted(result.keys()) == ['b', 'd']
+
+
+def test_asyncio_backend_is_imported_only_when_used(fixture):
+	code = 'import sys, lnk.abstract; print("lnk.aio" in sys.modules)'
+	output = subprocess.check_output([sys.executable, '-c', code],
+									 cwd=tests.paths.ROOT_PATH)
+
+	assert output.strip() == b'False'
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import os
+import pytest
+import requests
+import socket
+import sys
+import threading
+import time
+
+from collections import namedtuple
+
+import tests.paths
+
+import lnk.abstract
+import lnk.bitly.history
+import lnk.bitly.info
+import lnk.bitly.link
+import lnk.bitly.stats
+import lnk.cache
+import lnk.failures
+import lnk.retry
+import lnk.tinyurl.link
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+								reason='requires Python 3.7+')
+
+if sys.version_info >= (3, 7):
+	import http.server
+	import urllib.parse
+
+	import lnk.aio
+
+	# The link-history of the fake bit.ly API, from newest to oldest
+	HISTORY = [dict(link='http://bit.ly/{0}'.format(i),
+					long_url='http://example.com/{0}'.format(i),
+					created_at=1400000000 - i * 3600) for i in range(5)]
+
+	class Handler(http.server.BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		def log_message(self, *args):
+			pass
+
+		def do_GET(self):
+			self.answer()
+
+		def do_POST(self):
+			self.answer()
+
+		def answer(self):
+			server = self.server
+			parts = urllib.parse.urlsplit(self.path)
+			with server.lock:
+				server.requests.append(self.path)
+				count = server.requests.count(self.path)
+			length = int(self.headers.get('Content-Length', 0))
+			body = self.rfile.read(length).decode('utf-8')
+			if parts.path.startswith('/api/'):
+				query = urllib.parse.parse_qs(parts.query)
+				content = json.dumps(self.api(parts.path[5:], query))
+				self.reply(200, content.encode('utf-8'))
+				return
+			if parts.path == '/slow':
+				time.sleep(0.2)
+			if parts.path == '/flaky' and count < 3:
+				self.reply(503, b'{}')
+				return
+			content = json.dumps(dict(method=self.command,
+									  path=parts.path,
+									  query=urllib.parse.parse_qs(parts.query),
+									  body=urllib.parse.parse_qs(body),
+									  authorization=self.headers.get('Authorization')))
+			self.reply(200, content.encode('utf-8'), parts.path == '/chunked')
+
+		def api(self, endpoint, query):
+			"""Answers like the tinyurl ('create') or the bit.ly API."""
+			if endpoint == 'create':
+				short = 'http://tinyurl.com/{0}'.format(query['url'][0][7:])
+				return dict(state='ok', shorturl=short)
+			if endpoint == 'shorten':
+				long_url = query['longUrl'][0]
+				data = dict(url='http://bit.ly/{0}'.format(long_url[7:]))
+			elif endpoint == 'expand':
+				data = dict(expand=[dict(short_url=i,
+										 long_url='http://example.com/' + i[14:])
+									for i in query['shortUrl']])
+			elif endpoint == 'info':
+				data = dict(info=[dict(short_url=i, title='Title of ' + i)
+								  for i in query['shortUrl']])
+			elif endpoint == 'user/link_history' and 'link' in query:
+				link = dict(link=query['link'][0], archived=False, private=True)
+				data = dict(link_history=[link])
+			elif endpoint == 'user/link_history':
+				offset = int(query['offset'][0])
+				end = offset + int(query['limit'][0])
+				data = dict(link_history=HISTORY[offset:end],
+							result_count=len(HISTORY))
+			elif endpoint == 'link/clicks':
+				data = dict(link_clicks=len(query['link'][0]))
+			else:
+				key = 'country' if endpoint == 'link/countries' else 'referrer'
+				data = {endpoint[5:]: [{key: query['link'][0], 'clicks': 1}]}
+
+			return dict(status_code=200, status_txt='OK', data=data)
+
+		def reply(self, status, content, chunked=False):
+			self.send_response(status)
+			self.send_header('Content-Type', 'application/json; charset=utf-8')
+			if chunked:
+				self.send_header('Transfer-Encoding', 'chunked')
+				self.end_headers()
+				for i in range(0, len(content), 10):
+					chunk = content[i:i + 10]
+					self.wfile.write('{0:x}\r\n'.format(len(chunk)).encode('ascii'))
+					self.wfile.write(chunk + b'\r\n')
+				self.wfile.write(b'0\r\n\r\n')
+			else:
+				self.send_header('Content-Length', str(len(content)))
+				self.end_headers()
+				self.wfile.write(content)
+
+
+class Command(lnk.abstract.AbstractCommand):
+	def __init__(self):
+		super(Command, self).__init__('test', 'do')
+
+	def fetch(self, paths):
+		return self.map(self.request_path, paths)
+
+	def request_path(self, path):
+		return self.get(path, dict(path=path)).json()
+
+
+@pytest.fixture(scope='module')
+def server():
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	server.daemon_threads = True
+	server.requests = []
+	server.lock = threading.Lock()
+	server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+	thread = threading.Thread(target=server.serve_forever)
+	thread.daemon = True
+	thread.start()
+
+	yield server
+
+	server.shutdown()
+	server.server_close()
+
+
+@pytest.fixture()
+def engine(server):
+	with server.lock:
+		del server.requests[:]
+	engine = lnk.aio.Engine(32)
+
+	yield engine
+
+	engine.close()
+
+
+def point(command, server, engine=None):
+	command.api = '{0}/api'.format(server.url)
+	if engine is not None:
+		command.engine = engine
+		command.executor = engine.executor()
+	# The stats command fetches additional info with an info command
+	info = getattr(command, 'info', None)
+	if isinstance(info, lnk.abstract.AbstractCommand):
+		point(info, server, engine)
+
+	return command
+
+
+def on_both_backends(build, fetch, engine, server):
+	threaded = point(build(), server)
+	expected = fetch(threaded)
+	with server.lock:
+		del server.requests[:]
+	replayed = point(build(), server, engine)
+
+	return expected, fetch(replayed)
+
+
+@pytest.fixture()
+def owner():
+	Owner = namedtuple('Owner', ['retry', 'limiter', 'status'])
+	retry = lnk.retry.Policy(dict(base=0.01, jitter=False))
+
+	return Owner(retry, None, lnk.retry.status)
+
+
+@pytest.fixture()
+def command(request, engine, server):
+	directory = os.path.dirname(os.path.abspath(__file__))
+	path = os.path.join(tests.paths.CONFIG_PATH, 'test.json')
+	with open(os.path.join(directory, 'test.json'), 'rt') as source:
+		config = json.load(source)
+		with open(path, 'wt') as destination:
+			json.dump(config, destination)
+
+	def finalize():
+		os.remove(path)
+
+	request.addfinalizer(finalize)
+
+	command = Command()
+	command.api = server.url
+	command.engine = engine
+	command.executor = engine.executor()
+
+	return command
+
+
+def test_client_sends_parameters(engine, owner, server):
+	url = '{0}/get'.format(server.url)
+	response = engine.perform(owner, 'GET', url, params=dict(a='1 2'))
+
+	assert response.status_code == 200
+	assert response.json()['query'] == dict(a=['1 2'])
+
+
+def test_client_sends_data_and_authorization(engine, owner, server):
+	url = '{0}/post'.format(server.url)
+	response = engine.perform(owner,
+							  'POST',
+							  url,
+							  auth=('user', 'secret'),
+							  data=dict(x='y'))
+	data = response.json()
+	expected = base64.b64encode(b'user:secret').decode('ascii')
+
+	assert data['method'] == 'POST'
+	assert data['body'] == dict(x=['y'])
+	assert data['authorization'] == 'Basic {0}'.format(expected)
+
+
+def test_client_reads_chunked_bodies(engine, owner, server):
+	url = '{0}/chunked'.format(server.url)
+	response = engine.perform(owner, 'GET', url)
+
+	assert response.json()['path'] == '/chunked'
+
+
+def test_client_keeps_connections_alive(engine, owner, server):
+	url = '{0}/get'.format(server.url)
+	for _ in range(3):
+		engine.perform(owner, 'GET', url)
+
+	assert sum(len(i) for i in engine.client.idle.values()) == 1
+
+
+def test_client_raises_connection_errors(engine, owner):
+	listener = socket.socket()
+	listener.bind(('127.0.0.1', 0))
+	port = listener.getsockname()[1]
+	listener.close()
+	owner = owner._replace(retry=lnk.retry.Policy(dict(attempts=1)))
+	url = 'http://127.0.0.1:{0}/'.format(port)
+
+	with pytest.raises(requests.exceptions.ConnectionError):
+		engine.perform(owner, 'GET', url)
+
+
+def test_requests_are_retried_on_the_loop(engine, owner, server):
+	url = '{0}/flaky'.format(server.url)
+	response = engine.perform(owner, 'GET', url)
+
+	assert response.status_code == 200
+	assert owner.retry.statistics().retries == 2
+
+
+def test_executor_makes_requests_concurrently(command, server):
+	paths = ['slow?{0}'.format(i) for i in range(20)]
+	start = time.time()
+	results = command.fetch(paths)
+
+	assert [i['query']['path'] for i in results] == [[i] for i in paths]
+	assert time.time() - start < 2
+
+
+def test_executor_makes_identical_requests_once(command, server):
+	results = command.fetch(['get'] * 5)
+
+	assert len(results) == 5
+	assert server.requests.count('/get?path=get') == 1
+	assert command.flights == {}
+
+
+def test_executor_runs_submitted_calls_on_result(command):
+	calls = [command.executor.submit(command.request_path, 'get{0}'.format(i))
+			 for i in range(3)]
+
+	assert calls[1].result()['path'] == '/get1'
+	assert all(call.done.is_set() for call in calls)
+
+
+def test_executor_raises_errors_of_calls(command):
+	def fail(path):
+		command.request_path(path)
+		raise ValueError(path)
+
+	with pytest.raises(ValueError):
+		command.map(fail, ['get'])
+
+
+def test_executor_imap_yields_all_results(command):
+	paths = ['get{0}'.format(i) for i in range(10)]
+	ordered = command.executor.imap(command.request_path, paths, window=3)
+	unordered = command.executor.imap(command.request_path,
+									  paths,
+									  ordered=False,
+									  window=3)
+
+	assert [i['path'] for i in ordered] == ['/' + i for i in paths]
+	assert sorted(i['path'] for i in unordered) == sorted('/' + i for i in paths)
+
+
+def test_calls_doing_something_between_requests_are_replayed(command, server):
+	between = []
+	def follow(path):
+		first = command.request_path(path)
+		# Done again whenever the call is replayed (see lnk.aio)
+		between.append(path)
+		second = command.request_path(first['path'][1:] + 'next')
+		return second['path']
+
+	results = command.map(follow, ['get0', 'get1'])
+
+	assert results == ['/get0next', '/get1next']
+	# Once when the first response is known, once when the second is
+	assert sorted(between) == ['get0', 'get0', 'get1', 'get1']
+	assert server.requests.count('/get0?path=get0') == 1
+	assert server.requests.count('/get0next?path=get0next') == 1
+
+def test_partial_mode_records_failures(command, capsys):
+	def fail(path):
+		result = command.request_path(path)
+		if result['path'] == '/bad':
+			raise ValueError(path)
+		return result
+
+	command.failures = lnk.failures.Failures()
+	results = command.map(fail, ['good', 'bad'])
+
+	assert [i['path'] for i in results] == ['/good']
+	assert [i.item for i in command.failures.failures] == ['bad']
+
+
+def test_tinyurl_link_runs_on_the_engine(engine, server, capsys):
+	urls = ['example.com/{0}'.format(i) for i in range(10)]
+	build = lambda: lnk.tinyurl.link.Link(raw=True, cache=False)
+	fetch = lambda link: link.fetch(False, False, urls, True)
+	expected, result = on_both_backends(build, fetch, engine, server)
+
+	assert result == expected
+	assert result[0] == 'http://example.com/0 => http://tinyurl.com/example.com/0'
+	# Warned once per url (and backend), not once per replay
+	assert capsys.readouterr().out.count('Prepending') == 2 * len(urls)
+
+
+def test_bitly_link_runs_on_the_engine(engine, server):
+	long_urls = ['http://example.com/{0}'.format(i) for i in range(5)]
+	short_urls = ['http://bit.ly/{0}'.format(i) for i in range(20)]
+	build = lambda: lnk.bitly.link.Link(raw=True, cache=False)
+	fetch = lambda link: link.fetch(False, True, short_urls, long_urls, False)
+	expected, result = on_both_backends(build, fetch, engine, server)
+
+	assert result == expected
+	assert len(result) == 25
+	# 20 urls are expanded in two batches of up to 15 urls
+	assert len([i for i in server.requests if i.startswith('/api/expand')]) == 2
+
+
+def test_bitly_info_runs_on_the_engine(engine, server):
+	urls = ['http://bit.ly/{0}'.format(i) for i in range(5)]
+	build = lambda: lnk.bitly.info.Info(raw=True)
+	fetch = lambda info: info.fetch(('title', 'privacy'), (), False, urls)
+	expected, result = on_both_backends(build, fetch, engine, server)
+
+	assert result == expected
+	assert len(result) == len(urls)
+
+
+def test_bitly_stats_runs_on_the_engine(engine, server):
+	urls = ['http://bit.ly/{0}'.format(i) for i in range(3)]
+	times = ((1, 'day'), (2, 'week'))
+	build = lambda: lnk.bitly.stats.Stats(raw=True)
+	fetch = lambda stats: stats.fetch((), (), times, True, 10, True, False, urls)
+	expected, result = on_both_backends(build, fetch, engine, server)
+
+	assert result == expected
+	assert len(result) == len(urls)
+	# Three statistics for each of three timespans, plus info, per url
+	assert len([i for i in server.requests if '/link/' in i]) == 27
+
+
+def test_bitly_history_runs_on_the_engine(engine, server):
+	def build():
+		history = lnk.bitly.history.History(raw=True, mirror=False)
+		# Such that the pages after the first are requested on the executor
+		history.page_size = 2
+		return history
+
+	fetch = lambda history: history.fetch(None, None, True, None,
+										  False, True, False)
+	expected, result = on_both_backends(build, fetch, engine, server)
+
+	assert result == expected
+	assert result == ['{0} => {1}'.format(i['link'], i['long_url'])
+					  for i in HISTORY]
+
+
+def test_cache_lookups_of_replayed_calls_are_counted_once(engine,
+														  server,
+														  tmpdir):
+	urls = ['http://example.com/{0}'.format(i) for i in range(5)]
+	link = point(lnk.tinyurl.link.Link(raw=True, cache=False), server, engine)
+	link.shortened = lnk.cache.Cache('test', str(tmpdir.join('cache')))
+	link.fetch(False, True, urls, False)
+	link.fetch(False, True, urls, False)
+	link.shortened.close()
+
+	assert link.shortened.statistics() == lnk.cache.Cache.Statistics(5, 5)
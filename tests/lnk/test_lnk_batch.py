@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import lnk.batch
+import lnk.errors
+
+@pytest.fixture()
+def batcher():
+	batcher = lnk.batch.Batcher(None, 3)
+	batcher.batches = []
+	def lookup(keys):
+		batcher.batches.append(list(keys))
+		return dict((key, key.upper()) for key in keys if key != 'bad')
+	batcher.lookup = lookup
+
+	return batcher
+
+
+def test_prefetch_requests_batches_of_size(batcher):
+	requests = batcher.prefetch(['a', 'b', 'c', 'd', 'e'], map)
+
+	assert requests == 2
+	assert batcher.batches == [['a', 'b', 'c'], ['d', 'e']]
+	assert [batcher.get(key) for key in 'abcde'] == ['A', 'B', 'C', 'D', 'E']
+
+
+def test_prefetch_requests_keys_once(batcher):
+	batcher.prefetch(['a', 'b', 'a'], map)
+	batcher.prefetch(['b', 'c'], map)
+
+	assert batcher.batches == [['a', 'b'], ['c']]
+
+
+def test_prefetch_skips_known_keys(batcher):
+	batcher.prefetch(['a', 'b'], map, {'a': 'cached'}.get)
+
+	assert batcher.batches == [['b']]
+	assert batcher.get('a') == 'cached'
+
+
+def test_keys_without_result_are_left_out(batcher):
+	batcher.prefetch(['bad', 'good'], map)
+
+	assert batcher.get('bad') is None
+	assert batcher.get('good') == 'GOOD'
+
+
+def test_failed_batches_are_left_out(batcher):
+	def lookup(keys):
+		raise lnk.errors.HTTPError('Could not expand urls.')
+	batcher.lookup = lookup
+	batcher.prefetch(['a', 'b'], map)
+
+	assert batcher.get('a') is None
+
+
+def test_internal_errors_are_raised(batcher):
+	def lookup(keys):
+		raise lnk.errors.InternalError('Could not finish task in time.')
+	batcher.lookup = lookup
+
+	with pytest.raises(lnk.errors.InternalError):
+		batcher.prefetch(['a'], map)
@@ -94,3 +94,25 @@ def test_boxify_works_well(fixture):
 	box = lnk.beauty.boxify(fixture)
 	print(box)
 	assert box == '\n'.join(expected)
+
+
+def test_max_width_falls_back_if_no_terminal():
+	assert lnk.beauty.get_max_width() == lnk.beauty.MAX_WIDTH
+
+
+def test_max_width_follows_terminal_width(monkeypatch):
+	monkeypatch.setattr(lnk.beauty.sys.stdin, 'isatty', lambda: True)
+	monkeypatch.setattr(lnk.beauty, 'get_terminal_width', lambda: 100)
+
+	assert lnk.beauty.get_max_width() == 75
+
+	monkeypatch.setattr(lnk.beauty, 'get_terminal_width', lambda: 40)
+
+	assert lnk.beauty.get_max_width() == 30
+
+
+def test_max_width_falls_back_if_terminal_width_unknown(monkeypatch):
+	monkeypatch.setattr(lnk.beauty.sys.stdin, 'isatty', lambda: True)
+	monkeypatch.setattr(lnk.beauty, 'get_terminal_width', lambda: None)
+
+	assert lnk.beauty.get_max_width() == lnk.beauty.MAX_WIDTH
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import pytest
+
+import lnk.cache
+import lnk.config
+
+@pytest.fixture()
+def path(tmpdir):
+	return str(tmpdir.join('cache'))
+
+@pytest.fixture()
+def cache(request, path):
+	cache = lnk.cache.Cache('service/shorten', path, 3)
+	request.addfinalizer(cache.close)
+
+	return cache
+
+
+def test_account_hides_secret():
+	result = lnk.cache.account('secret')
+
+	assert 'secret' not in result
+	assert result == lnk.cache.account('secret')
+	assert result != lnk.cache.account('other')
+
+
+def test_account_is_anonymous_without_secret():
+	assert lnk.cache.account(None) == 'anonymous'
+
+
+def test_get_returns_none_for_missing_key(cache):
+	assert cache.get('http://example.com') is None
+
+
+def test_get_returns_value_put(cache):
+	cache.put('http://example.com', 'http://short/1')
+
+	assert cache.get('http://example.com') == 'http://short/1'
+
+
+def test_put_replaces_value(cache):
+	cache.put('http://example.com', 'http://short/1')
+	cache.put('http://example.com', 'http://short/2')
+
+	assert cache.get('http://example.com') == 'http://short/2'
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+	for i in range(3):
+		cache.put(str(i), str(i))
+	# Makes '1' the least recently used
+	cache.get('0')
+	cache.put('3', '3')
+
+	assert cache.get('1') is None
+	assert [cache.get(i) for i in '023'] == ['0', '2', '3']
+
+
+def test_entries_survive_reopening(cache, path):
+	cache.put('http://example.com', 'http://short/1')
+	cache.close()
+	with lnk.cache.Cache('service/shorten', path, 3) as reopened:
+		assert reopened.get('http://example.com') == 'http://short/1'
+
+
+def test_size_setting_may_be_a_string(monkeypatch, path):
+	monkeypatch.setattr(lnk.config,
+						'get',
+						lambda *args: {'cache-size': '2'})
+	cache = lnk.cache.Cache('service/shorten', path)
+	try:
+		for i in range(3):
+			cache.put(str(i), str(i))
+
+		assert cache.size == 2
+		assert cache.get('0') is None
+		assert cache.get('2') == '2'
+	finally:
+		cache.close()
+
+
+def test_update_stores_all_entries(cache):
+	cache.update([('a', '1'), ('b', '2')])
+
+	assert [cache.get(i) for i in 'ab'] == ['1', '2']
+
+
+def test_statistics_count_hits_and_misses(cache):
+	cache.put('http://example.com', 'http://short/1')
+	cache.get('http://example.com')
+	cache.get('http://example.com')
+	cache.get('http://other.com')
+
+	assert cache.statistics() == lnk.cache.Cache.Statistics(hits=2, misses=1)
+
+
+def test_shared_returns_one_cache_per_namespace(path):
+	first = lnk.cache.Cache.shared('service/expand', path, 3)
+	second = lnk.cache.Cache.shared('service/expand', path, 3)
+	other = lnk.cache.Cache.shared('other/expand', path, 3)
+
+	assert first is second
+	assert other is not first
+	assert 'service/expand' in lnk.cache.statistics()
+
+
+def test_report_outputs_counters_of_used_caches(path, capsys):
+	used = lnk.cache.Cache.shared('reported/expand', path, 3)
+	lnk.cache.Cache.shared('unused/expand', path, 3)
+	used.get('key')
+	lnk.cache.report()
+	_, err = capsys.readouterr()
+
+	assert '0 hits and 1 misses in reported/expand' in err
+	assert 'unused/expand' not in err
+
+
+def test_namespaces_are_kept_apart(cache, path):
+	cache.put('http://example.com', 'http://short/1')
+	with lnk.cache.Cache('other/shorten', path, 3) as other:
+		assert other.get('http://example.com') is None
+		other.put('http://example.com', 'http://short/2')
+
+	assert cache.get('http://example.com') == 'http://short/1'
+
+
+def test_clear_removes_entries_of_namespace(cache, path):
+	cache.put('http://example.com', 'http://short/1')
+	with lnk.cache.Cache('other/shorten', path, 3) as other:
+		other.put('http://example.com', 'http://short/2')
+		cache.clear()
+
+		assert cache.get('http://example.com') is None
+		assert other.get('http://example.com') == 'http://short/2'
+
+
+def fill(path, offset):
+	with lnk.cache.Cache('service/shorten', path, 1000) as cache:
+		for i in range(offset, offset + 50):
+			cache.put(str(i), str(i))
+
+
+def test_cache_is_safe_for_concurrent_processes(path):
+	processes = [multiprocessing.Process(target=fill, args=(path, i * 50))
+				 for i in range(4)]
+	for process in processes:
+		process.start()
+	for process in processes:
+		process.join(30)
+
+	assert all(process.exitcode == 0 for process in processes)
+	with lnk.cache.Cache('service/shorten', path, 1000) as cache:
+		assert all(cache.get(str(i)) == str(i) for i in range(200))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import lnk.cli
+import lnk.errors
+
+@pytest.fixture()
+def main():
+	return lnk.cli.Main()
+
+
+def test_streams_detects_input_option(main):
+	assert lnk.cli.streams(main, ['bitly', 'link', '-i', '-'])
+	assert lnk.cli.streams(main, ['link', '--input', 'urls.txt'])
+	assert lnk.cli.streams(main, ['--input=urls.txt'])
+	assert lnk.cli.streams(main, ['tinyurl', '-v', '-i', 'urls.txt'])
+	assert lnk.cli.streams(main, ['goo.gl', 'link', '-i-'])
+
+
+def test_streams_detects_combined_short_flags(main):
+	assert lnk.cli.streams(main, ['bitly', 'link', '-qi', '-'])
+	assert lnk.cli.streams(main, ['-qci', 'urls.txt'])
+	assert lnk.cli.streams(main, ['tinyurl', 'link', '-qi-'])
+	assert lnk.cli.streams(main, ['googl', '-vv', 'link', '-nqi', '-'])
+
+
+def test_streams_detects_input_option_given_with_equals_sign(main):
+	assert lnk.cli.streams(main, ['bitly', 'link', '--input=-'])
+	assert lnk.cli.streams(main, ['goo.gl', '-l', '2', 'link', '--input=-'])
+
+
+def test_streams_false_without_input_option(main):
+	assert not lnk.cli.streams(main, [])
+	assert not lnk.cli.streams(main, ['bitly', 'link', 'http://python.org'])
+	assert not lnk.cli.streams(main, ['bitly', 'link', '-q', 'http://i.org'])
+	# The value of another option
+	assert not lnk.cli.streams(main, ['bitly', 'link', '-s', '-i'])
+
+
+def test_streams_false_for_info_option_of_stats(main):
+	assert not lnk.cli.streams(main, ['bitly', 'stats', '-i'])
+	assert not lnk.cli.streams(main, ['googl', '-v', 'stats', '-i'])
+	assert not lnk.cli.streams(main, ['stats', '-i', 'http://bit.ly/1'])
+
+
+def test_streams_false_for_invalid_arguments(main):
+	assert not lnk.cli.streams(main, ['bitly', 'link', '--no-such-option'])
+	assert not lnk.cli.streams(main, ['bitly', 'link', '-i'])
+
+
+def test_main_loads_no_commands_up_front():
+	main = lnk.cli.Main()
+
+	assert main.commands == {}
+	assert 'tinyurl' in main.list_commands(None)
+
+
+def test_main_loads_only_requested_command():
+	main = lnk.cli.Main()
+	command = main.get_command(None, 'tinyurl')
+
+	assert list(main.commands.keys()) == ['tinyurl']
+	assert main.get_command(None, 'tinyurl') is command
+
+
+def test_main_throws_for_unknown_command():
+	main = lnk.cli.Main()
+
+	with pytest.raises(lnk.errors.UsageError):
+		main.get_command(None, 'foo')
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+import threading
+import time
+
+import lnk.errors
+import lnk.executor
+
+@pytest.fixture()
+def executor(request):
+	executor = lnk.executor.Executor(4)
+	request.addfinalizer(executor.shutdown)
+
+	return executor
+
+
+def test_task_returns_value():
+	task = lnk.executor.Task(lambda x, y=0: x + y, (1,), {'y': 2})
+	task.run()
+
+	assert task.result() == 3
+
+
+def test_task_reraises_error():
+	def fail():
+		raise lnk.errors.HTTPError('oops')
+	task = lnk.executor.Task(fail, (), {})
+	task.run()
+
+	with pytest.raises(lnk.errors.HTTPError):
+		task.result()
+
+
+def test_task_throws_if_not_done_in_time():
+	task = lnk.executor.Task(lambda: None, (), {})
+
+	with pytest.raises(lnk.errors.InternalError):
+		task.result(0.01)
+
+
+def test_workers_are_started_lazily(executor):
+	assert executor.threads == []
+
+	executor.submit(lambda: None).result()
+
+	assert len(executor.threads) == 1
+
+
+def test_number_of_workers_is_bounded(executor):
+	lock = threading.Lock()
+	state = {'now': 0, 'max': 0}
+	def work(_):
+		with lock:
+			state['now'] += 1
+			state['max'] = max(state['max'], state['now'])
+		time.sleep(0.01)
+		with lock:
+			state['now'] -= 1
+
+	executor.map(work, range(32))
+
+	assert len(executor.threads) == executor.workers
+	assert state['max'] <= executor.workers
+
+
+def test_map_returns_results_in_order(executor):
+	def work(item, factor):
+		# Later items finish first
+		time.sleep((10 - item) * 0.001)
+		return item * factor
+
+	result = executor.map(work, range(10), 2)
+
+	assert result == [i * 2 for i in range(10)]
+
+
+def test_map_reraises_first_error(executor):
+	def work(item):
+		if item % 2:
+			raise lnk.errors.HTTPError(str(item))
+		return item
+
+	with pytest.raises(lnk.errors.HTTPError) as error:
+		executor.map(work, range(10))
+
+	assert '1' in str(error.value)
+
+
+def test_shutdown_stops_workers(executor):
+	executor.map(lambda x: x, range(8))
+	threads = executor.threads
+	executor.shutdown()
+	for thread in threads:
+		thread.join(1)
+
+	assert not any(thread.is_alive() for thread in threads)
+	assert executor.threads == []
+
+
+def test_imap_yields_results_in_order(executor):
+	def work(item, factor):
+		time.sleep((10 - item) * 0.001)
+		return item * factor
+
+	result = list(executor.imap(work, range(10), (2,)))
+
+	assert result == [i * 2 for i in range(10)]
+
+
+def test_imap_yields_all_results_unordered(executor):
+	def work(item):
+		time.sleep((10 - item) * 0.001)
+		return item
+
+	result = list(executor.imap(work, range(10), ordered=False))
+
+	assert sorted(result) == list(range(10))
+
+
+def test_imap_unordered_yields_in_completion_order(executor):
+	release = threading.Event()
+	def work(item):
+		if item == 0:
+			release.wait(1)
+		return item
+
+	results = executor.imap(work, range(3), ordered=False)
+	first = next(results)
+	release.set()
+
+	assert first != 0
+	assert sorted([first] + list(results)) == [0, 1, 2]
+
+
+def test_imap_consumes_items_lazily(executor):
+	consumed = []
+	def items():
+		for i in range(1000):
+			consumed.append(i)
+			yield i
+
+	results = executor.imap(lambda x: x, items(), window=8)
+	first = next(results)
+
+	assert first == 0
+	assert len(consumed) <= 9
+
+
+def test_imap_reraises_error(executor):
+	def work(item):
+		if item == 3:
+			raise lnk.errors.HTTPError('oops')
+		return item
+
+	results = executor.imap(work, range(10))
+
+	assert [next(results) for _ in range(3)] == [0, 1, 2]
+	with pytest.raises(lnk.errors.HTTPError):
+		next(results)
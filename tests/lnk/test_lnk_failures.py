@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import pytest
+
+import lnk.errors
+import lnk.failures
+
+@pytest.fixture()
+def path(tmpdir):
+	return str(tmpdir.join('errors.json'))
+
+
+def test_add_records_error_details():
+	failures = lnk.failures.Failures()
+	error = lnk.errors.HTTPError('Could not shorten.', 503, 'Unavailable')
+	failure = failures.add('http://example.com', error)
+
+	assert failure == lnk.failures.Failures.Failure('http://example.com',
+													'HTTPError',
+													'Could not shorten.',
+													503,
+													'Unavailable')
+	assert len(failures) == 1
+
+
+def test_add_records_plain_exceptions():
+	failures = lnk.failures.Failures()
+	failure = failures.add('http://example.com', RuntimeError('Meh'))
+
+	assert failure.error == 'RuntimeError'
+	assert failure.message == 'Meh'
+	assert failure.code is None
+
+
+def test_failures_are_output_to_stderr_at_once(capsys):
+	failures = lnk.failures.Failures()
+	failures.add('http://example.com', RuntimeError('Meh'))
+	out, err = capsys.readouterr()
+
+	assert out == ''
+	assert 'http://example.com' in err
+	assert 'Meh' in err
+
+
+def test_report_writes_json_file(path, capsys):
+	failures = lnk.failures.Failures(path)
+	failures.add('http://example.com', RuntimeError('Meh'))
+
+	assert capsys.readouterr()[1] == ''
+
+	failures.report()
+	with open(path) as source:
+		written = json.load(source)
+
+	assert written == [dict(item='http://example.com',
+							error='RuntimeError',
+							message='Meh',
+							code=None,
+							status=None)]
+	assert path in capsys.readouterr()[1]
+
+
+def test_report_writes_empty_file_without_failures(path, capsys):
+	lnk.failures.Failures(path).report()
+
+	with open(path) as source:
+		assert json.load(source) == []
+	assert capsys.readouterr()[1] == ''
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import pytest
+import time
+
+import lnk.limit
+
+@pytest.fixture()
+def path(tmpdir):
+	return str(tmpdir.join('limit'))
+
+
+def test_burst_is_served_at_once():
+	limiter = lnk.limit.Limiter(rate=1, burst=3)
+
+	assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+
+
+def test_requests_beyond_burst_wait_for_tokens():
+	limiter = lnk.limit.Limiter(rate=1, burst=1)
+	delays = [limiter.reserve() for _ in range(3)]
+
+	assert delays[0] == 0
+	assert delays[1] == pytest.approx(1, abs=0.05)
+	assert delays[2] == pytest.approx(2, abs=0.05)
+
+
+def test_acquire_sleeps_until_token_is_due():
+	limiter = lnk.limit.Limiter(rate=20, burst=1)
+	start = time.time()
+	for _ in range(5):
+		limiter.acquire()
+
+	assert time.time() - start >= 0.19
+
+
+def test_bucket_is_refilled_over_time():
+	limiter = lnk.limit.Limiter(rate=20, burst=1)
+	limiter.reserve()
+	time.sleep(0.1)
+
+	assert limiter.reserve() == 0
+
+
+def test_shared_returns_one_limiter_per_name():
+	settings = dict(rate=1, burst=1)
+	first = lnk.limit.Limiter.shared('service/first', settings)
+
+	assert lnk.limit.Limiter.shared('service/first', settings) is first
+	assert lnk.limit.Limiter.shared('service/second', settings) is not first
+
+
+def test_shared_state_is_kept_in_file(path):
+	first = lnk.limit.Limiter(rate=1, burst=2, path=path)
+	second = lnk.limit.Limiter(rate=1, burst=2, path=path)
+
+	assert first.reserve() == 0
+	assert second.reserve() == 0
+	assert first.reserve() == pytest.approx(1, abs=0.05)
+
+
+def acquire(path, count):
+	limiter = lnk.limit.Limiter(rate=50, burst=1, path=path)
+	for _ in range(count):
+		limiter.acquire()
+
+
+@pytest.mark.skipif(lnk.limit.fcntl is None, reason='requires fcntl')
+def test_limit_is_shared_by_concurrent_processes(path):
+	processes = [multiprocessing.Process(target=acquire, args=(path, 5))
+				 for _ in range(4)]
+	start = time.time()
+	for process in processes:
+		process.start()
+	for process in processes:
+		process.join(30)
+
+	assert all(process.exitcode == 0 for process in processes)
+	# 20 requests at 50 per second, of which the first is free
+	assert time.time() - start >= 0.38
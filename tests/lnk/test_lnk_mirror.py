@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import pytest
+
+import lnk.mirror
+import lnk.timestamps
+
+@pytest.fixture()
+def mirror(request, tmpdir):
+	mirror = lnk.mirror.Mirror('service', str(tmpdir.join('mirror')))
+	request.addfinalizer(mirror.close)
+
+	return mirror
+
+@pytest.fixture(scope='module')
+def urls():
+	Url = lnk.mirror.Mirror.Url
+	# Newest first, like the link-histories of the APIs
+	return [Url('s{0}'.format(i), 'l{0}'.format(i), 100 - i)
+			for i in range(100)]
+
+
+def test_mark_is_none_when_empty(mirror):
+	assert mirror.mark() is None
+
+
+def test_update_advances_mark(mirror, urls):
+	mirror.update(urls[50:])
+	assert mirror.mark() == urls[50].created
+
+	mirror.update(urls[:50])
+	assert mirror.mark() == urls[0].created
+
+
+def test_mark_never_goes_back(mirror, urls):
+	mirror.update(urls[:10])
+	mirror.update(urls[90:])
+
+	assert mirror.mark() == urls[0].created
+
+
+def test_between_returns_all_links_newest_first(mirror, urls):
+	mirror.update(urls[::-1])
+
+	assert mirror.between() == urls
+
+
+def test_between_includes_bounds(mirror, urls):
+	mirror.update(urls)
+
+	assert mirror.between(10, 20) == urls[80:91]
+	assert mirror.between(end=5) == urls[95:]
+	assert mirror.between(begin=96) == urls[:5]
+
+
+def test_between_keeps_newest_links_up_to_limit(mirror, urls):
+	mirror.update(urls)
+
+	assert mirror.between(10, 20, 3) == urls[80:83]
+
+
+def test_update_replaces_links(mirror, urls):
+	mirror.update(urls)
+	mirror.update(urls[:10])
+
+	assert mirror.between() == urls
+
+
+def test_services_are_kept_apart(mirror, urls):
+	mirror.update(urls)
+	other = lnk.mirror.Mirror('other', mirror.path)
+
+	assert other.mark() is None
+	assert other.between() == []
+
+
+def test_accounts_are_kept_apart(mirror, urls):
+	mine = lnk.mirror.Mirror('service', mirror.path, account='mine')
+	mine.update(urls[:10])
+	theirs = lnk.mirror.Mirror('service', mirror.path, account='theirs')
+
+	assert theirs.mark() is None
+	assert theirs.between() == []
+	assert mine.between() == urls[:10]
+	assert mirror.between() == []
+
+
+def test_links_persist(mirror, urls):
+	mirror.update(urls)
+	mirror.close()
+
+	with lnk.mirror.Mirror('service', mirror.path) as reopened:
+		assert reopened.mark() == urls[0].created
+		assert reopened.between() == urls
+
+
+def test_encode_and_decode_times_of_creation(tmpdir):
+	now = datetime.datetime.now()
+	url = lnk.mirror.Mirror.Url('short', 'long', now)
+	with lnk.mirror.Mirror('service',
+						   str(tmpdir.join('mirror')),
+						   lnk.timestamps.isoformat,
+						   lnk.timestamps.parse) as mirror:
+		mirror.update([url])
+
+		assert mirror.mark() == now
+		assert mirror.between(now, now) == [url]
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import email.utils
+import pytest
+import requests
+import time
+
+import lnk.retry
+
+from tests.fakes import FakeResponse
+
+
+class FakeHttpResponse(dict):
+	def __init__(self, status, headers=None):
+		super(FakeHttpResponse, self).__init__(headers or {})
+		self.status = status
+
+
+class FakeHttpError(Exception):
+	def __init__(self, status, headers=None):
+		super(FakeHttpError, self).__init__(status)
+		self.resp = FakeHttpResponse(status, headers)
+
+
+@pytest.fixture()
+def policy():
+	return lnk.retry.Policy(dict(base=0, jitter=False, deadline=10))
+
+
+def responses(*outcomes):
+	outcomes = list(outcomes)
+	def request():
+		outcome = outcomes.pop(0)
+		if isinstance(outcome, Exception):
+			raise outcome
+		return outcome
+	return request
+
+
+def test_successful_requests_are_not_retried(policy):
+	response = policy.call(responses(FakeResponse(200)))
+
+	assert response.status_code == 200
+	assert policy.statistics() == (1, 0, 0, 0)
+
+
+def test_retryable_statuses_are_retried(policy):
+	request = responses(FakeResponse(503), FakeResponse(429), FakeResponse(200))
+	response = policy.call(request)
+
+	assert response.status_code == 200
+	assert policy.statistics() == (1, 1, 2, 0)
+
+
+def test_other_statuses_are_not_retried(policy):
+	request = responses(FakeResponse(404), FakeResponse(200))
+
+	assert policy.call(request).status_code == 404
+
+
+def test_last_response_is_returned_after_all_attempts(policy):
+	request = responses(*[FakeResponse(500) for _ in range(4)])
+
+	assert policy.call(request).status_code == 500
+	assert policy.statistics() == (1, 1, 3, 1)
+
+
+def test_transient_errors_are_retried(policy):
+	error = requests.exceptions.ConnectionError()
+	response = policy.call(responses(error, FakeResponse(200)))
+
+	assert response.status_code == 200
+
+
+def test_last_error_is_raised_after_all_attempts(policy):
+	errors = [requests.exceptions.Timeout() for _ in range(4)]
+
+	with pytest.raises(requests.exceptions.Timeout):
+		policy.call(responses(*errors))
+
+
+def test_other_errors_are_raised_at_once(policy):
+	with pytest.raises(RuntimeError):
+		policy.call(responses(RuntimeError(), FakeResponse(200)))
+	assert policy.statistics() == (0, 0, 0, 0)
+
+
+def test_errors_with_retryable_statuses_are_retried(policy):
+	response = policy.call(responses(FakeHttpError(503), FakeResponse(200)))
+
+	assert response.status_code == 200
+
+
+def test_status_function_decides_what_is_retried(policy):
+	request = responses(FakeResponse(200), FakeResponse(201))
+	def status(response):
+		return 503 if response.status_code == 200 else 200
+	response = policy.call(request, status=status)
+
+	assert response.status_code == 201
+
+
+def test_delays_grow_exponentially_up_to_cap():
+	policy = lnk.retry.Policy(dict(base=1, cap=5, jitter=False))
+
+	assert [policy.delay(i) for i in range(1, 6)] == [1, 2, 4, 5, 5]
+
+
+def test_jitter_randomizes_delays():
+	policy = lnk.retry.Policy(dict(base=1, cap=5, jitter=True))
+	delays = [policy.delay(3) for _ in range(100)]
+
+	assert all(0 <= delay <= 4 for delay in delays)
+	assert len(set(delays)) > 1
+
+
+def test_retry_after_seconds_are_honored():
+	policy = lnk.retry.Policy(dict(base=1, jitter=False))
+	response = FakeResponse(429, {'Retry-After': '7'})
+
+	assert policy.delay(1, response) == 7
+
+
+def test_retry_after_dates_are_honored():
+	date = email.utils.formatdate(time.time() + 60, usegmt=True)
+
+	assert lnk.retry.retry_after(FakeResponse(503, {'Retry-After': date})) == \
+		   pytest.approx(60, abs=2)
+
+
+def test_retry_after_of_http_errors_is_honored():
+	error = FakeHttpError(429, {'retry-after': '3'})
+
+	assert lnk.retry.retry_after(error) == 3
+
+
+def test_deadline_stops_retrying():
+	policy = lnk.retry.Policy(dict(base=5, jitter=False, deadline=1))
+	start = time.time()
+	response = policy.call(responses(FakeResponse(503), FakeResponse(200)))
+
+	assert response.status_code == 503
+	assert time.time() - start < 1
+
+
+def test_shared_returns_one_policy_per_service():
+	policy = lnk.retry.Policy.shared('service')
+
+	assert lnk.retry.Policy.shared('service') is policy
+	assert 'service' in lnk.retry.summary()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+import requests
+import threading
+
+import tests.paths
+
+import lnk.bitly.command
+import lnk.session
+import lnk.tinyurl.command
+
+@pytest.fixture()
+def session(request):
+	session = lnk.session.Session()
+	request.addfinalizer(session.close)
+
+	return session
+
+
+def test_session_is_created_lazily(session):
+	assert session.session is None
+
+	result = session.get()
+
+	assert isinstance(result, requests.Session)
+	assert session.session is result
+
+
+def test_session_is_reused(session):
+	assert session.get() is session.get()
+
+
+def test_session_is_created_once_across_threads(session):
+	results = []
+	def get():
+		results.append(session.get())
+	threads = [threading.Thread(target=get) for _ in range(32)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert len(results) == 32
+	assert all(i is results[0] for i in results)
+
+
+def test_settings_configure_adapters(session):
+	settings = {'pools': 3, 'size': 7, 'block': True}
+	adapter = session.get(settings).get_adapter('https://bit.ly')
+
+	assert adapter._pool_connections == 3
+	assert adapter._pool_maxsize == 7
+	assert adapter._pool_block
+
+
+def test_defaults_are_used_for_missing_settings(session):
+	adapter = session.get({}).get_adapter('http://tiny-url.info')
+
+	assert adapter._pool_connections == lnk.session.Session.defaults['pools']
+	assert adapter._pool_maxsize == lnk.session.Session.defaults['size']
+
+
+def test_keep_alive_can_be_disabled(session):
+	result = session.get({'keep-alive': False})
+
+	assert result.headers['Connection'] == 'close'
+
+
+def test_close_resets_session(session):
+	first = session.get()
+	session.close()
+
+	assert session.session is None
+	assert session.get() is not first
+
+
+def test_each_service_owns_its_session():
+	bitly = lnk.bitly.command.Command.session
+	tinyurl = lnk.tinyurl.command.Command.session
+
+	assert isinstance(bitly, lnk.session.Session)
+	assert isinstance(tinyurl, lnk.session.Session)
+	assert bitly is not tinyurl
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import pytest
+
+import lnk.timeline
+
+Record = collections.namedtuple('Record', ['name', 'created'])
+
+@pytest.fixture(scope='module')
+def records():
+	# Newest first, like the link-histories of the APIs
+	return [Record(str(i), 100 - i) for i in range(100)]
+
+@pytest.fixture()
+def timeline(records):
+	return lnk.timeline.Timeline(records)
+
+
+def test_between_returns_all_records_newest_first(timeline, records):
+	assert timeline.between() == records
+
+
+def test_between_includes_bounds(timeline, records):
+	result = timeline.between(10, 20)
+
+	assert result == records[80:91]
+
+
+def test_between_without_lower_bound(timeline, records):
+	assert timeline.between(end=5) == records[95:]
+
+
+def test_between_without_upper_bound(timeline, records):
+	assert timeline.between(begin=96) == records[:5]
+
+
+def test_between_outside_records_is_empty(timeline):
+	assert timeline.between(200, 300) == []
+	assert timeline.between(-10, 0) == []
+
+
+def test_between_keeps_newest_records_up_to_limit(timeline, records):
+	result = timeline.between(10, 20, limit=3)
+
+	assert result == records[80:83]
+
+
+def test_count(timeline):
+	assert timeline.count() == 100
+	assert timeline.count(10, 20) == 11
+	assert timeline.count(20, 10) == 0
+
+
+def test_records_can_be_added_in_batches(records):
+	timeline = lnk.timeline.Timeline()
+	timeline.add(records[50:])
+	assert timeline.between(40, 60) == records[50:61]
+
+	timeline.add(records[:50])
+
+	assert len(timeline) == 100
+	assert timeline.between(40, 60) == records[40:61]
+
+
+def test_records_created_at_same_time_keep_order_of_addition():
+	records = [Record(name, 1) for name in 'abc']
+	timeline = lnk.timeline.Timeline(records[:2])
+	timeline.add(records[2:])
+
+	assert timeline.between() == records
+
+
+def test_oldest_returns_time_of_oldest_record(timeline):
+	timeline.add([Record('old', -5)])
+
+	assert timeline.oldest() == -5
+	assert lnk.timeline.Timeline().oldest() is None
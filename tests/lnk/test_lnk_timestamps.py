@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import pytest
+
+import lnk.errors
+import lnk.timestamps
+
+@pytest.fixture(params=[lnk.timestamps.parse, lnk.timestamps.fields])
+def parse(request):
+	return request.param
+
+
+def test_parse_works_without_fraction_and_offset(parse):
+	result = parse('2015-09-15T12:34:56')
+	expected = datetime.datetime(2015, 9, 15, 12, 34, 56)
+
+	assert result == expected
+
+
+def test_parse_keeps_fraction_to_microseconds(parse):
+	result = parse('2015-09-15T12:34:56.789')
+
+	assert result.microsecond == 789000
+
+
+def test_parse_truncates_long_fractions(parse):
+	result = parse('2015-09-15T12:34:56.123456789')
+
+	assert result.microsecond == 123456
+
+
+@pytest.mark.parametrize('value', [
+	'2015-09-15T12:34:56Z',
+	'2015-09-15T12:34:56+00:00',
+	'2015-09-15T14:34:56+0200',
+	'2015-09-15T14:34:56+02',
+	'2015-09-15T10:04:56-02:30'
+])
+def test_parse_converts_offsets_to_utc(parse, value):
+	result = parse(value)
+	expected = datetime.datetime(2015, 9, 15, 12, 34, 56)
+
+	assert result == expected
+
+
+def test_parse_handles_goo_gl_format(parse):
+	result = parse('2015-09-15T12:34:56.789+00:00')
+	expected = datetime.datetime(2015, 9, 15, 12, 34, 56, 789000)
+
+	assert result == expected
+
+
+def test_parse_agrees_with_isoformat(parse):
+	now = datetime.datetime.now()
+
+	assert parse(now.isoformat()) == now
+
+
+@pytest.mark.parametrize('value', [
+	'',
+	'2015-09-15',
+	'2015-09-15 12:34:56',
+	'2015-13-15T12:34:56',
+	'2015-09-15T12:34:56.',
+	'2015-09-15T12:34:56+2'
+])
+def test_parse_throws_for_malformed_timestamps(parse, value):
+	with pytest.raises(lnk.errors.APIError):
+		parse(value)
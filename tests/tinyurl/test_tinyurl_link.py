@@ -10,8 +10,11 @@ import threading
 from collections import namedtuple
 
 import tests.paths
+import lnk.cache
 import lnk.tinyurl.link
 
+from tests.fakes import FakeResponse
+
 def shorten(url):
 	response = requests.get('http://tiny-url.info/api/v1/create',
 							params=dict(apikey='0BFA4A7B5BDD5BE7780C',
@@ -108,3 +111,43 @@ def test_fetch_correct_output_if_raw_false_pretty_false(fixture):
 	expected = '\n'.join([fixture.short, shorten(urls[1])])
 
 	return result == expected
+
+def test_stream_yields_lines_in_order(fixture):
+	urls = iter([fixture.long + '\n', '\n', 'http://python.org\n'])
+	result = list(fixture.link.stream(False, True, urls))
+	expected = [
+		'{0} => {1}'.format(fixture.long, fixture.short),
+		'http://python.org => {0}'.format(shorten('http://python.org'))
+	]
+
+	assert result == expected
+
+@pytest.fixture()
+def cached(request, tmpdir):
+	link = lnk.tinyurl.link.Link(raw=True, cache=False)
+	link.shortened = lnk.cache.Cache('tinyurl/shorten',
+									 str(tmpdir.join('cache')))
+	request.addfinalizer(link.shortened.close)
+	link.requested = []
+	def get(endpoint, parameters=None):
+		link.requested.append(parameters)
+		return FakeResponse(data=dict(state='ok',
+									   shorturl='http://tinyurl.com/fresh'))
+	link.get = get
+
+	return link
+
+def test_request_uses_cache(cached):
+	cached.shortened.put('http://example.com/', 'http://tinyurl.com/cached')
+	result = cached.request('http://example.com/')
+
+	assert result == 'http://tinyurl.com/cached'
+	assert cached.requested == []
+
+def test_request_caches_requested_urls(cached):
+	first = cached.request('http://example.com/')
+	second = cached.request('http://example.com/')
+
+	assert first == second == 'http://tinyurl.com/fresh'
+	assert len(cached.requested) == 1
+	assert cached.shortened.get('http://example.com/') == 'http://tinyurl.com/fresh'